@@ -9,6 +9,7 @@ import dailychange_p
 import neardevil
 import afterdevil
 import afterFFT
+import batchFFT
 from Dispersion_Relation import Params
 
 def after_AS(data):
@@ -22,26 +23,8 @@ def after_AS(data):
     sampling_freq = 1 / np.mean(np.diff(data['timecount']))
     fs = 1 / sampling_freq
 
-    # フーリエ変換
-    Y = scipy.fft.fft(data['residual'].to_numpy(), norm='forward')
-    
-    # データ数の取得
-    N = len(data['residual'])
-
-    # 周波数軸の計算
-    AS_x = scipy.fft.fftfreq(len(data['residual']), d=sampling_freq)
-
-    # 対称性を利用した調整
-    Y = Y[:N//2]
-    AS_x = AS_x[:N//2]
-    Y = 2*Y
-
-    # 過大評価を防ぐための操作(データ長が奇数である場合のみ)
-    if N % 2 == 1:
-        Y[0] = Y[0]/2
-
-    # 振幅スペクトルの算出
-    AS_y = np.abs(Y) 
+    # 実FFT による振幅スペクトルの算出
+    AS_x, AS_y = batchFFT.AS_batch(data['residual'].to_numpy(), sampling_freq)
 
     return AS_x, AS_y
 
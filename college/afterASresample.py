@@ -13,7 +13,7 @@ import afterAS
 import meanFFT_sortedseason
 from Dispersion_Relation import Params
 
-def process_afterAS_resample(ID, timerange, interval):
+def process_afterAS_resample(ID, timerange, interval, method='mean'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データ(0.5秒間隔でリサンプリング済)における気圧残差を求め、
@@ -22,6 +22,7 @@ def process_afterAS_resample(ID, timerange, interval):
     ID : ダストデビルの識別番号 (int)
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    method : resample の方法 ('mean' : 区間平均, 'polyphase' : polyphase FIR による間引き) (str)
     '''
     try:
         # ID に対応する sol および MUTC を取得
@@ -38,7 +39,7 @@ def process_afterAS_resample(ID, timerange, interval):
             raise ValueError("No data available after filtering.")
 
         #0.5秒間隔でresample
-        after_devildata = meanFFT_sortedseason.data_resample(after_devildata, 0.5)
+        after_devildata = meanFFT_sortedseason.data_resample(after_devildata, 0.5, method)
         
         # 残差計算の実施
         after_devildata = afterFFT.calculate_afterresidual(after_devildata)
@@ -59,7 +60,7 @@ def process_afterAS_resample(ID, timerange, interval):
         return None
 
 
-def plot_afterAS_resample(ID, timerange, interval):
+def plot_afterAS_resample(ID, timerange, interval, method='mean'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データ(0.5秒間隔でresample)における気圧残差を求め、
@@ -71,10 +72,11 @@ def plot_afterAS_resample(ID, timerange, interval):
     ID : ダストデビルの識別番号 (int)
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    method : resample の方法 ('mean' : 区間平均, 'polyphase' : polyphase FIR による間引き) (str)
     '''
     try:
         # 振幅スペクトルの導出
-        AS_x, AS_y, sol = process_afterAS_resample(ID, timerange, interval)
+        AS_x, AS_y, sol = process_afterAS_resample(ID, timerange, interval, method)
         
         # 音波と重力波の境界に該当する周波数
         params = Params()
@@ -112,5 +114,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('ID', type=int, help="ID") # IDの指定
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    parser.add_argument('--method', type=str, default='mean', choices=['mean', 'polyphase'],
+                        help="Resampling method") # resampleの方法
     args = parser.parse_args()
-    plot_afterAS_resample(args.ID, args.timerange, 20)
\ No newline at end of file
+    plot_afterAS_resample(args.ID, args.timerange, 20, args.method)
\ No newline at end of file
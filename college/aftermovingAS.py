@@ -10,6 +10,7 @@ import neardevil
 import afterdevil
 import afterFFT
 import afterAS
+import movingave
 from Dispersion_Relation import Params
 
 def after_movingAS(data, windowsize_FFT):
@@ -30,25 +31,10 @@ def after_movingAS(data, windowsize_FFT):
     # 振幅スペクトルの導出
     AS_x, AS_y = afterAS.after_AS(data)
     
-    # スペクトル強度の常用対数を算出
-    log10_AS_y = np.log10(AS_y)
-
-    # 移動平均用のフィルターを作成
-    filter_frame = np.ones(windowsize_FFT) / windowsize_FFT
-
-    # 欠損が発生する要素数の計算
-    pad_size = (windowsize_FFT - 1) // 2
-    
-    # 形状を維持するため、全ての要素をNanに変更(初期化)
-    moving_AS_x = np.full(AS_x.shape, np.nan)
-    log10_moving_AS_y = np.full(AS_y.shape, np.nan)
-    
-    # 有効な範囲の抽出及び計算
-    moving_AS_x[pad_size:-pad_size] = AS_x[pad_size:-pad_size]
-    log10_moving_AS_y[pad_size:-pad_size] = np.convolve(log10_AS_y, filter_frame, mode="valid") 
-
-    # スペクトル強度を元に戻す
-    moving_AS_y = 10**(log10_moving_AS_y)  
+    # 常用対数を累積和により移動平均し、逆変換
+    # (移動平均が計算できない範囲は NaN として形状を維持)
+    moving_AS_x = movingave.pad_like(AS_x, windowsize_FFT)
+    moving_AS_y = movingave.log_moving_average(AS_y, windowsize_FFT)
     
     return AS_x, AS_y ,moving_AS_x, moving_AS_y
 
@@ -0,0 +1,299 @@
+import numpy as np
+import pandas as pd
+import datetime as datetime
+import os
+import argparse as argparse
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+import DATACATALOG
+import dailychange_p
+import focuschange_p
+import nearFFT
+import meanFFT_sortedseason
+import batchFFT
+
+# 背景スペクトルライブラリの既定の保存先
+LIBRARY_DIR = os.path.expanduser('~/.cache/explore/background')
+
+def library_path(timerange, estimator='periodogram'):
+    '''
+    背景スペクトルライブラリの既定の保存先のパスを返す関数。
+
+    timerange : 窓の長さ (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    '''
+    return os.path.join(LIBRARY_DIR, f"{timerange}s_{estimator}.npz")
+
+def available_sols():
+    '''
+    時系列データのファイルが存在する sol のリストを返す関数
+    '''
+    return [sol for sol in range(1219 + 1) if os.path.exists(dailychange_p.get_file_path(sol))]
+
+def window_starts(sol, MUTC_hlist):
+    '''
+    指定された sol における各時刻 MUTC_h の窓の開始時刻 (datetime64) を返す関数。
+    (focuschange_p.filter_focusdata と同じ基準)
+
+    sol : 火星日(探査機到着後からの経過日数)(int)
+    MUTC_hlist : 火星地方時のリスト (0 ≦ MUTC_h < 24)
+    '''
+    date = pd.Timestamp(datetime.date(2018, 11, 26) + datetime.timedelta(days=int(sol)))
+    return (date + pd.to_timedelta(np.asarray(MUTC_hlist, dtype=np.float64), unit='h')).values
+
+def process_solbackground(sol, timerange, MUTC_hlist, estimator='periodogram'):
+    '''
+    指定された sol の時系列データを1度だけ読み込み、MUTC_hlist の各時刻から
+    timerange 秒間の気圧残差のパワースペクトルを一括で算出する関数。
+    返り値は (窓が得られた時刻の番号, 各窓の疑似的な ls, 周波数軸のリスト, パワースペクトルのリスト)。
+    ※並列処理のワーカーから呼び出すため、DataFrame ではなく配列で返す。
+
+    sol : 火星日(探査機到着後からの経過日数)(int)
+    timerange : 窓の長さ (秒) (int)
+    MUTC_hlist : 火星地方時のリスト (0 ≦ MUTC_h < 24)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    '''
+    data = dailychange_p.process_surround_dailydata(sol)
+    if data is None or data.empty:
+        return np.array([], dtype=np.int64), np.array([]), [], []
+
+    hourlist, lslist, residuallist, sampling_freqlist = [], [], [], []
+    for i, focus_data in enumerate(focuschange_p.filter_focuswindows(data, sol, MUTC_hlist, timerange)):
+        if focus_data.empty:
+            continue
+
+        # 窓の先頭の UTC から疑似的な ls を算出
+        ls = DATACATALOG.UTC_to_ls(focus_data['UTC'].iloc[0]) if 'UTC' in focus_data else None
+
+        # 0.5秒間隔でresampleし、残差計算を実施
+        focus_data = meanFFT_sortedseason.data_resample(focus_data, 0.5)
+        focus_data = nearFFT.calculate_residual(focus_data)
+
+        hourlist.append(i)
+        lslist.append(np.nan if ls is None else ls)
+        residuallist.append(focus_data['residual'].values)
+        sampling_freqlist.append(1 / np.mean(np.diff(focus_data['countdown'])))
+
+    # 周波数軸が一致する窓ごとに、パワースペクトルを一括で導出
+    fft_xlist, fft_ylist = batchFFT.FFT_stack(residuallist, sampling_freqlist, estimator)
+
+    return np.array(hourlist, dtype=np.int64), np.array(lslist, dtype=np.float64), fft_xlist, fft_ylist
+
+def _process_solbackground(job):
+    '''
+    ProcessPoolExecutor.map 用に、引数をまとめて受け取る process_solbackground。
+
+    job : (sol, timerange, MUTC_hlist, estimator)
+    '''
+    return process_solbackground(*job)
+
+class BackgroundLibrary:
+    '''
+    全ての (sol, 時刻) の窓について、気圧残差のパワースペクトルをまとめて保持する
+    背景スペクトルのライブラリ。
+    各窓にはダストデビルのカタログに載る事象が窓内に含まれるかの情報と、
+    同じ sol の事象の平均気温・平均風速 (事象の無い sol は NaN) を持たせる。
+    ※sol・時刻・季節・カタログから作成した条件による選択は、配列の比較のみで行う。
+
+    fft_x : 周波数軸 (array)
+    fft_y : パワースペクトル (ndarray, 窓数 × 周波数)
+    sol : 各窓の sol (array of int)
+    MUTC_h : 各窓の開始時刻 (火星地方時) (array)
+    ls : 各窓の疑似的な ls (array)
+    n_devils : 各窓に含まれるダストデビルの件数 (array of int)
+    AT : 各窓の sol における事象の平均気温 (array)
+    Ws : 各窓の sol における事象の平均風速 (array)
+    timerange : 窓の長さ (秒) (int)
+    estimator : スペクトル推定法 (str)
+    '''
+    def __init__(self, fft_x, fft_y, sol, MUTC_h, ls, n_devils, AT, Ws, timerange, estimator='periodogram'):
+        self.fft_x = np.asarray(fft_x, dtype=np.float64)
+        self.fft_y = np.asarray(fft_y)
+        self.sol = np.asarray(sol, dtype=np.int64)
+        self.MUTC_h = np.asarray(MUTC_h, dtype=np.float64)
+        self.ls = np.asarray(ls, dtype=np.float64)
+        self.n_devils = np.asarray(n_devils, dtype=np.int64)
+        self.AT = np.asarray(AT, dtype=np.float64)
+        self.Ws = np.asarray(Ws, dtype=np.float64)
+        self.timerange = int(timerange)
+        self.estimator = estimator
+
+        # (sol, 時刻) から窓の番号を引く索引
+        self._index = {(s, h): i for i, (s, h) in enumerate(zip(self.sol.tolist(), self.MUTC_h.tolist()))}
+
+    def __len__(self):
+        return len(self.sol)
+
+    @property
+    def devil(self):
+        '''窓内にダストデビルが含まれるか (array of bool)'''
+        return self.n_devils > 0
+
+    @classmethod
+    def build(cls, timerange, MUTC_hlist=range(24), estimator='periodogram', sols=None, n_jobs=1):
+        '''
+        指定された全ての sol の背景スペクトルを (n_jobs > 1 の場合はプロセスを並列にして) 算出し、
+        ライブラリを作成する関数。
+        ※データ数の異なる窓が混在する場合は、最も件数の多いデータ数の窓のみを用いる。
+
+        timerange : 窓の長さ (秒) (int)
+        MUTC_hlist : 火星地方時のリスト (0 ≦ MUTC_h < 24)
+        estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+        sols : 対象の sol のリスト ※None の場合は時系列データが存在する全ての sol
+        n_jobs : 並列に実行するプロセス数 (int)
+        '''
+        MUTC_hlist = np.asarray(list(MUTC_hlist), dtype=np.float64)
+        if sols is None:
+            sols = available_sols()
+        jobs = [(sol, timerange, MUTC_hlist, estimator) for sol in sols]
+
+        # sol ごとに背景スペクトルを算出 (結果は sols と同じ順序)
+        if n_jobs > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                results = list(tqdm(executor.map(_process_solbackground, jobs, chunksize=4),
+                                    total=len(jobs), desc="Processing sol"))
+        else:
+            results = [_process_solbackground(job) for job in tqdm(jobs, desc="Processing sol")]
+
+        sollist, hourlist, lslist, fft_xlist, fft_ylist = [], [], [], [], []
+        for sol, (hours, ls, fft_xs, fft_ys) in zip(sols, results):
+            sollist.extend([sol] * len(hours))
+            hourlist.extend(MUTC_hlist[hours])
+            lslist.extend(ls)
+            fft_xlist.extend(fft_xs)
+            fft_ylist.extend(fft_ys)
+        if not fft_ylist:
+            raise ValueError("No spectrum available.")
+
+        # 最も件数の多いデータ数の窓にそろえる
+        lengths = np.array([len(fft_y) for fft_y in fft_ylist])
+        values, counts = np.unique(lengths, return_counts=True)
+        keep = lengths == values[np.argmax(counts)]
+        if not keep.all():
+            print(f"Skipped {np.sum(~keep)} spectra with a different length.")
+        fft_x = fft_xlist[int(np.argmax(keep))]
+        fft_y = np.array([fft_y for fft_y, k in zip(fft_ylist, keep) if k])
+        sol = np.asarray(sollist)[keep]
+        MUTC_h = np.asarray(hourlist)[keep]
+        ls = np.asarray(lslist)[keep]
+
+        n_devils, AT, Ws = catalog_features(sol, MUTC_h, timerange)
+
+        return cls(fft_x, fft_y, sol, MUTC_h, ls, n_devils, AT, Ws, timerange, estimator)
+
+    def select(self, sol=None, MUTC_h=None, ls=None, devil=None, mask=None):
+        '''
+        条件に一致する窓を表す真偽値の配列を返す関数。
+        ※sol・MUTC_h・ls は単一の値またはリストで指定する。
+
+        sol : sol (int または list)
+        MUTC_h : 開始時刻 (火星地方時) (float または list)
+        ls : 疑似的な ls (int または list)
+        devil : True の場合はダストデビルを含む窓、False の場合は含まない窓のみ (bool)
+        mask : カタログ (DATACATALOG.process_datacatalog) の行に対する真偽値の配列
+               ※条件に一致する事象が発生した sol の窓のみを選ぶ
+        '''
+        selected = np.ones(len(self), dtype=bool)
+        if sol is not None:
+            selected &= np.isin(self.sol, np.atleast_1d(sol))
+        if MUTC_h is not None:
+            selected &= np.isin(self.MUTC_h, np.atleast_1d(MUTC_h))
+        if ls is not None:
+            selected &= np.isin(self.ls, np.atleast_1d(ls))
+        if devil is not None:
+            selected &= self.devil == devil
+        if mask is not None:
+            datacatalog = DATACATALOG.process_datacatalog()
+            selected &= np.isin(self.sol, datacatalog.loc[np.asarray(mask), 'sol'].values)
+        return selected
+
+    def get(self, sol, MUTC_h):
+        '''
+        指定された (sol, 時刻) の窓のパワースペクトルを返す関数。
+        (該当する窓が無い場合は None)
+
+        sol : 火星日(探査機到着後からの経過日数)(int)
+        MUTC_h : 開始時刻 (火星地方時) (float)
+        '''
+        i = self._index.get((int(sol), float(MUTC_h)))
+        return None if i is None else self.fft_y[i]
+
+    def mean(self, selected=None):
+        '''
+        選択した窓のパワースペクトルのケース平均と件数を返す関数。
+
+        selected : select で作成した真偽値の配列 ※None の場合は全ての窓
+        '''
+        fft_y = self.fft_y if selected is None else self.fft_y[selected]
+        if len(fft_y) == 0:
+            raise ValueError("No spectrum selected.")
+        return np.nanmean(fft_y, axis=0), len(fft_y)
+
+    def save(self, file_path=None):
+        '''
+        ライブラリを npz ファイルに保存する関数。
+        ※書き込み途中のファイルを読まないよう、一時ファイルを経由して置き換える。
+
+        file_path : 保存先のパス ※None の場合は library_path
+        '''
+        if file_path is None:
+            file_path = library_path(self.timerange, self.estimator)
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        tmp_path = f"{file_path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, fft_x=self.fft_x, fft_y=self.fft_y, sol=self.sol, MUTC_h=self.MUTC_h,
+                 ls=self.ls, n_devils=self.n_devils, AT=self.AT, Ws=self.Ws,
+                 timerange=self.timerange, estimator=self.estimator)
+        os.replace(tmp_path, file_path)
+        return file_path
+
+    @classmethod
+    def load(cls, file_path):
+        '''
+        save で保存したライブラリを読み込む関数。
+
+        file_path : 読み込むファイルのパス
+        '''
+        with np.load(file_path) as state:
+            return cls(state['fft_x'], state['fft_y'], state['sol'], state['MUTC_h'], state['ls'],
+                       state['n_devils'], state['AT'], state['Ws'], int(state['timerange']), str(state['estimator']))
+
+def catalog_features(sol, MUTC_h, timerange):
+    '''
+    各窓 (sol, 開始時刻) について、窓内のダストデビルの件数と、
+    同じ sol の事象の平均気温・平均風速 (事象の無い sol は NaN) を
+    カタログの時刻の二分探索で一括して求める関数。
+
+    sol : 各窓の sol (array of int)
+    MUTC_h : 各窓の開始時刻 (火星地方時) (array)
+    timerange : 窓の長さ (秒) (int)
+    '''
+    datacatalog = DATACATALOG.process_datacatalog()
+    sol = np.asarray(sol, dtype=np.int64)
+
+    # 窓の範囲 (filter_focusdata と同じく両端を含まない)
+    start = np.array([window_starts(s, [h])[0] for s, h in zip(sol, MUTC_h)], dtype='datetime64[ns]')
+    stop = start + np.timedelta64(int(timerange * 1e9), 'ns')
+
+    # カタログの時刻を並べ替え、窓内の件数を二分探索で算出
+    MUTC = np.sort(pd.to_datetime(datacatalog['MUTC']).values)
+    n_devils = np.searchsorted(MUTC, stop, side='left') - np.searchsorted(MUTC, start, side='right')
+
+    # sol ごとの事象の平均気温・平均風速
+    solmean = datacatalog.groupby('sol')[['AT-ave', 'Ws-ave']].mean()
+    solmean = solmean.reindex(sol)
+
+    return n_devils, solmean['AT-ave'].values, solmean['Ws-ave'].values
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('timerange', type=int, help='timerang(s)') # 窓の長さ(秒)
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
+    parser.add_argument('--hours', type=float, nargs='+', default=list(range(24)),
+                        help="Start times of the windows") # 窓の開始時刻のリスト
+    parser.add_argument('--n_jobs', type=int, default=os.cpu_count(), help="Number of worker processes") # 並列に実行するプロセス数
+    parser.add_argument('--output', type=str, default=None, help="Output path of the library") # 保存先のパス
+    args = parser.parse_args()
+    library = BackgroundLibrary.build(args.timerange, args.hours, args.estimator, n_jobs=args.n_jobs)
+    file_path = library.save(args.output)
+    print(f"Save completed: {file_path} ({len(library)} windows, {int(library.devil.sum())} with devils)")
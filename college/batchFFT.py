@@ -0,0 +1,252 @@
+import numpy as np
+import scipy.fft
+from scipy import signal
+from functools import lru_cache
+import os
+import precision
+
+# 選択可能なスペクトル推定法
+ESTIMATORS = ['periodogram', 'welch', 'multitaper']
+
+# DPSS テーパーのディスクキャッシュの保存先
+TAPER_DIR = os.path.expanduser('~/.cache/explore/dpss')
+
+@lru_cache(maxsize=256)
+def FFT_freq(N, sampling_freq):
+    '''
+    データ数 N, サンプリング周波数 sampling_freq に対応する
+    片側パワースペクトルの周波数軸を返す関数。
+    ※(N, sampling_freq) ごとにメモリ上へキャッシュされるため、
+    返り値は読み取り専用。(resample しない窓ではサンプリング周波数が窓ごとに異なるため、
+    キャッシュは直近の 256 通りに限る)
+
+    N : データ数 (int)
+    sampling_freq : サンプリング周波数 (Hz) (float)
+    '''
+    fft_x = scipy.fft.rfftfreq(N, d=1 / sampling_freq)
+    fft_x.setflags(write=False)
+    return fft_x
+
+def FFT_batch(residuals, sampling_freq):
+    '''
+    データ数の揃った複数の窓の残差に対し、
+    最終軸方向の実FFT 1回で全窓のパワースペクトルを算出する関数。
+    ※signal.periodogram の既定値 (detrend='constant', boxcar 窓,
+    scaling='density', 片側) と同じ規格化。
+
+    residuals : 気圧の残差 (ndarray, 1D または 窓数 × データ数 の 2D)
+    sampling_freq : サンプリング周波数 (Hz) (float)
+    '''
+    residuals = np.asarray(residuals)
+    N = residuals.shape[-1]
+
+    # 平均の除去 (detrend='constant') ※平均は ACCUMULATE_DTYPE で累積
+    residuals = residuals - residuals.mean(axis=-1, keepdims=True, dtype=precision.ACCUMULATE_DTYPE).astype(residuals.dtype)
+
+    # 実FFT によるパワースペクトル密度の導出
+    Y = scipy.fft.rfft(residuals, axis=-1)
+    fft_y = (Y.real**2 + Y.imag**2) / (sampling_freq * N)
+
+    # 片側スペクトルへの変換 (直流成分とナイキスト周波数は除く)
+    if N % 2 == 0:
+        fft_y[..., 1:-1] *= 2
+    else:
+        fft_y[..., 1:] *= 2
+
+    return FFT_freq(N, sampling_freq), fft_y
+
+def AS_batch(residuals, sampling_freq):
+    '''
+    データ数の揃った複数の窓の残差に対し、
+    最終軸方向の実FFT 1回で全窓の片側振幅スペクトルを算出する関数。
+    ※振幅は正弦波の片振幅 (Pa) に対応するよう、
+    直流成分とナイキスト周波数以外を2倍している。
+
+    residuals : 気圧の残差 (ndarray, 1D または 窓数 × データ数 の 2D)
+    sampling_freq : サンプリング周波数 (Hz) (float)
+    '''
+    residuals = np.asarray(residuals)
+    N = residuals.shape[-1]
+
+    # 実FFT (データ数で規格化)
+    Y = scipy.fft.rfft(residuals, axis=-1, norm='forward')
+    AS_y = np.abs(Y)
+
+    # 片側スペクトルへの変換 (直流成分とナイキスト周波数は除く)
+    if N % 2 == 0:
+        AS_y[..., 1:-1] *= 2
+    else:
+        AS_y[..., 1:] *= 2
+
+    return FFT_freq(N, sampling_freq), AS_y
+
+def welch_batch(residuals, sampling_freq, nperseg=None):
+    '''
+    データ数の揃った複数の窓の残差に対し、
+    Welch 法 (Hann 窓, 50% 重複) でパワースペクトルを一括で算出する関数。
+    ※規格化は FFT_batch と同じ片側パワースペクトル密度。
+
+    residuals : 気圧の残差 (ndarray, 1D または 窓数 × データ数 の 2D)
+    sampling_freq : サンプリング周波数 (Hz) (float)
+    nperseg : 1区間のデータ数 (int) ※None の場合は窓長の1/4
+    '''
+    residuals = np.asarray(residuals)
+    N = residuals.shape[-1]
+    if nperseg is None:
+        nperseg = max(N // 4, 1)
+
+    fft_x, fft_y = signal.welch(residuals, fs=sampling_freq, nperseg=nperseg, axis=-1)
+
+    return fft_x, fft_y
+
+def load_dpss(N, NW, K):
+    '''
+    DPSS テーパーと固有値をディスクキャッシュから読み込む関数。
+    キャッシュが存在しない場合は None を返す。
+
+    N : データ数 (int)
+    NW : 時間・帯域幅積 (float)
+    K : テーパー数 (int)
+    '''
+    file_path = os.path.join(TAPER_DIR, f"dpss_N={N}_NW={NW}_K={K}.npz")
+    try:
+        with np.load(file_path) as cache:
+            return cache['tapers'], cache['ratios']
+    except (FileNotFoundError, OSError, KeyError, ValueError):
+        return None
+
+def save_dpss(N, NW, K, tapers, ratios):
+    '''
+    DPSS テーパーと固有値をディスクキャッシュへ保存する関数。
+    ※書き込み途中のファイルを読まないよう、一時ファイルを経由して置き換える。
+
+    N : データ数 (int)
+    NW : 時間・帯域幅積 (float)
+    K : テーパー数 (int)
+    tapers : DPSS テーパー (ndarray, K × N)
+    ratios : 各テーパーの固有値 (集中度) (ndarray)
+    '''
+    try:
+        os.makedirs(TAPER_DIR, exist_ok=True)
+        file_path = os.path.join(TAPER_DIR, f"dpss_N={N}_NW={NW}_K={K}.npz")
+        tmp_path = f"{file_path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, tapers=tapers, ratios=ratios)
+        os.replace(tmp_path, file_path)
+    except OSError as e:
+        print(f"Failed to save DPSS cache: {e}")
+
+@lru_cache(maxsize=None)
+def dpss_tapers(N, NW=4.0, K=None):
+    '''
+    データ数 N に対する DPSS テーパーとその固有値を返す関数。
+    ※(N, NW, K) ごとにメモリ上とディスク上 (TAPER_DIR) へキャッシュされるため、
+    返り値は読み取り専用。
+
+    N : データ数 (int)
+    NW : 時間・帯域幅積 (float)
+    K : テーパー数 (int) ※None の場合は 2NW-1
+    '''
+    if K is None:
+        K = int(2 * NW) - 1
+
+    cache = load_dpss(N, NW, K)
+    if cache is None:
+        tapers, ratios = signal.windows.dpss(N, NW, Kmax=K, return_ratios=True)
+        tapers, ratios = np.atleast_2d(tapers), np.atleast_1d(ratios)
+        save_dpss(N, NW, K, tapers, ratios)
+    else:
+        tapers, ratios = cache
+
+    tapers.setflags(write=False)
+    ratios.setflags(write=False)
+
+    return tapers, ratios
+
+def multitaper_batch(residuals, sampling_freq, NW=4.0, K=None):
+    '''
+    データ数の揃った複数の窓の残差に対し、
+    DPSS テーパーを用いたマルチテーパー法でパワースペクトルを一括で算出する関数。
+    各テーパーのスペクトルを固有値で重み付け平均する。
+    ※規格化は FFT_batch と同じ片側パワースペクトル密度。
+
+    residuals : 気圧の残差 (ndarray, 1D または 窓数 × データ数 の 2D)
+    sampling_freq : サンプリング周波数 (Hz) (float)
+    NW : 時間・帯域幅積 (float)
+    K : テーパー数 (int) ※None の場合は 2NW-1
+    '''
+    residuals = np.asarray(residuals)
+    N = residuals.shape[-1]
+    tapers, ratios = dpss_tapers(N, NW, K)
+    if residuals.dtype == np.float32:
+        tapers = tapers.astype(np.float32)
+
+    # 平均の除去 (detrend='constant') ※平均は ACCUMULATE_DTYPE で累積
+    residuals = residuals - residuals.mean(axis=-1, keepdims=True, dtype=precision.ACCUMULATE_DTYPE).astype(residuals.dtype)
+
+    # 全テーパーを掛けたデータに対する実FFT (窓数 × テーパー数 × 周波数)
+    Y = scipy.fft.rfft(residuals[..., np.newaxis, :] * tapers, axis=-1)
+    power = (Y.real**2 + Y.imag**2) / sampling_freq
+
+    # 固有値による重み付き平均
+    fft_y = np.tensordot(power, ratios / ratios.sum(), axes=([-2], [0]))
+
+    # 片側スペクトルへの変換 (直流成分とナイキスト周波数は除く)
+    if N % 2 == 0:
+        fft_y[..., 1:-1] *= 2
+    else:
+        fft_y[..., 1:] *= 2
+
+    return FFT_freq(N, sampling_freq), fft_y
+
+def spectrum_batch(residuals, sampling_freq, estimator='periodogram'):
+    '''
+    指定されたスペクトル推定法で、複数の窓のパワースペクトルを一括で算出する関数。
+
+    residuals : 気圧の残差 (ndarray, 1D または 窓数 × データ数 の 2D)
+    sampling_freq : サンプリング周波数 (Hz) (float)
+    estimator : スペクトル推定法 (str)
+        'periodogram' : ピリオドグラム (signal.periodogram と同等)
+        'welch' : Welch 法
+        'multitaper' : DPSS テーパーによるマルチテーパー法
+    '''
+    if estimator == 'periodogram':
+        return FFT_batch(residuals, sampling_freq)
+    if estimator == 'welch':
+        return welch_batch(residuals, sampling_freq)
+    if estimator == 'multitaper':
+        return multitaper_batch(residuals, sampling_freq)
+    raise ValueError(f"Unknown estimator: {estimator}")
+
+def FFT_stack(residuallist, sampling_freqlist, estimator='periodogram'):
+    '''
+    長さやサンプリング周波数の異なる窓の残差をまとめて受け取り、
+    データ数が一致する窓ごとにパワースペクトルを一括で算出する関数。
+    結果は residuallist と同じ順序のリストで返す。
+    ※いずれの推定法も、サンプリング周波数には密度の規格化 (1/fs) と周波数軸 (∝ fs) のみが依存するため、
+    まとまりの先頭の窓のサンプリング周波数で算出し、異なる窓はその比で換算する。
+    (resample しない窓のようにサンプリング周波数が窓ごとにわずかに異なる場合も、1回の FFT で処理できる)
+
+    residuallist : 各窓の気圧の残差 (array) のリスト
+    sampling_freqlist : 各窓のサンプリング周波数 (Hz) (float) のリスト
+    estimator : スペクトル推定法 (str) (spectrum_batch 参照)
+    '''
+    # データ数が一致する窓ごとにまとめる
+    groups = {}
+    for i, residual in enumerate(residuallist):
+        groups.setdefault(len(residual), []).append(i)
+
+    fft_xlist, fft_ylist = [None] * len(residuallist), [None] * len(residuallist)
+    for N, indices in groups.items():
+        sampling_freq = sampling_freqlist[indices[0]]
+        fft_x, fft_y = spectrum_batch(np.array([residuallist[i] for i in indices]), sampling_freq, estimator)
+        for row, i in enumerate(indices):
+            if sampling_freqlist[i] == sampling_freq:
+                fft_xlist[i] = fft_x
+                fft_ylist[i] = fft_y[row]
+            else:
+                # サンプリング周波数の比で周波数軸と密度を換算
+                ratio = sampling_freqlist[i] / sampling_freq
+                fft_xlist[i] = fft_x * ratio
+                fft_ylist[i] = fft_y[row] / ratio
+
+    return fft_xlist, fft_ylist
@@ -0,0 +1,89 @@
+import numpy as np
+
+def resample_weights(n_cases, n_boot, seed=None):
+    '''
+    ブートストラップ再標本化を、各ケースが選ばれた回数 (多項分布の重み) の
+    行列 (再標本数 × ケース数) として返す関数。
+    ※添字の行列 (再標本数 × ケース数) を作成し、bincount 1回で回数へ変換する。
+
+    n_cases : ケース数 (int)
+    n_boot : 再標本数 (int)
+    seed : 乱数のシード (int)
+    '''
+    rng = np.random.default_rng(seed)
+    index = rng.integers(0, n_cases, size=(n_boot, n_cases))
+    offset = np.arange(n_boot)[:, np.newaxis] * n_cases
+    weights = np.bincount((index + offset).ravel(), minlength=n_boot * n_cases)
+    return weights.reshape(n_boot, n_cases).astype(np.float64)
+
+def bootstrap_means(Y, n_boot=1000, seed=None, chunk=1000):
+    '''
+    (ケース数 × 周波数) のスペクトルについて、
+    n_boot 個のブートストラップ再標本の平均を行列積で一括して算出する関数。
+    返り値は (再標本数 × 周波数) の配列。
+    ※NaN は周波数ビンごとに除外して平均する (有効なケースが選ばれなかったビンは NaN)。
+    メモリを抑えるため、再標本は chunk 個ずつ計算する。
+
+    Y : スペクトル (ndarray, ケース数 × 周波数)
+    n_boot : 再標本数 (int)
+    seed : 乱数のシード (int)
+    chunk : 1度に計算する再標本数 (int)
+    '''
+    Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+    n_cases = Y.shape[0]
+    if n_cases == 0:
+        raise ValueError("No spectrum available for bootstrap.")
+
+    # 欠測は値 0・重み 0 として扱う
+    valid = np.isfinite(Y)
+    values = np.where(valid, Y, 0)
+    valid = valid.astype(np.float64)
+
+    rng = np.random.default_rng(seed)
+    means = np.empty((n_boot, Y.shape[1]))
+    for start in range(0, n_boot, chunk):
+        stop = min(start + chunk, n_boot)
+        weights = resample_weights(n_cases, stop - start, rng)
+
+        # 重み付き総和と有効件数を行列積で算出
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means[start:stop] = (weights @ values) / (weights @ valid)
+
+    return means
+
+def bootstrap_band(Y, n_boot=1000, percentiles=(2.5, 97.5), seed=None):
+    '''
+    (ケース数 × 周波数) のスペクトルについて、ケース平均と
+    ブートストラップによる百分位の信頼区間 (下限, 上限) を返す関数。
+
+    Y : スペクトル (ndarray, ケース数 × 周波数)
+    n_boot : 再標本数 (int)
+    percentiles : 信頼区間の下限・上限の百分位 (tuple)
+    seed : 乱数のシード (int)
+    '''
+    Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+    means = bootstrap_means(Y, n_boot, seed)
+
+    with np.errstate(invalid='ignore'):
+        mean = np.nanmean(Y, axis=0) if np.isfinite(Y).any() else np.full(Y.shape[1], np.nan)
+        lower, upper = np.nanpercentile(means, percentiles, axis=0)
+
+    return mean, lower, upper
+
+def bootstrap_arrays(arrays, n_boot=1000, percentiles=(2.5, 97.5), seed=None):
+    '''
+    ケースごとのスペクトルのリスト (meanmovingFFT_sorteddP.process_arrays と同じ入力) から、
+    ケース平均とブートストラップによる信頼区間を返す関数。
+
+    arrays : 各ケースのスペクトル (array) のリスト ※各配列の長さが一致している必要有
+    n_boot : 再標本数 (int)
+    percentiles : 信頼区間の下限・上限の百分位 (tuple)
+    seed : 乱数のシード (int)
+    '''
+    if not arrays or any(len(arr) == 0 for arr in arrays):
+        raise ValueError("No spectrum available for bootstrap.")
+    length = len(arrays[0])
+    if not all(len(arr) == length for arr in arrays):
+        raise ValueError("All arrays must have the same length")
+
+    return bootstrap_band(np.array(arrays), n_boot, percentiles, seed)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+# 合成カタログの事象 (同じ sol に複数の事象を含む)
+SOLS = [100, 100, 101, 102, 102, 102, 103, 104, 104, 105]
+LTST_H = [10.0, 10.5, 11.0, 11.25, 11.75, 12.5, 12.0, 12.25, 13.0, 13.5]
+
+def synthetic_catalog_csv(*args, **kwargs):
+    '''
+    DATACATALOG.process_datacatalog が読み込む CSV の代わりに、合成したカタログを返す関数。
+    '''
+    n = len(SOLS)
+    UTC = [f'2019-{100 + 7 * i:03d}T12:00:00.{i:03d}Z' for i in range(n)]
+    return pd.DataFrame({
+        'ID': np.arange(n), 'sol': SOLS, 'LTST_h': LTST_H, 'UTC': UTC,
+        'dP': -0.5 - 0.5 * np.arange(n),
+        'Ws-ave': 2.0 + np.arange(n) % 5, 'Ws-std': np.ones(n),
+        'Wd-ave': np.full(n, 180.0), 'Wd-std': np.ones(n),
+        'AT-ave': 200.0 + 3 * (np.arange(n) % 4), 'AT-std': np.ones(n),
+    })
+
+# DATACATALOG は import 時に実データの CSV を読み込むため、合成カタログに置き換えて読み込む
+_read_csv = pd.read_csv
+pd.read_csv = synthetic_catalog_csv
+try:
+    import DATACATALOG
+finally:
+    pd.read_csv = _read_csv
+CATALOG = DATACATALOG.datacatalog.copy()
+
+def synthetic_catalog():
+    '''
+    合成カタログ (DATACATALOG.process_datacatalog の代わり)。
+    '''
+    return CATALOG.copy()
+
+def synthetic_surround_dailydata(sol):
+    '''
+    sol の 9〜15 時 (火星地方時) の 0.25 秒間隔の合成気圧データ (dailychange_p.process_surround_dailydata の代わり)。
+    ※カタログに無い sol は None を返す。
+
+    sol : 火星日 (int)
+    '''
+    if sol not in SOLS:
+        return None
+    day = pd.Timestamp(2018, 11, 26) + pd.Timedelta(days=int(sol))
+    MUTC = pd.date_range(day + pd.Timedelta(hours=9), day + pd.Timedelta(hours=15), freq='250ms')
+    t = 0.25 * np.arange(len(MUTC))
+    rng = np.random.default_rng(sol)
+    p = 700 + 1e-5 * t + 0.05 * np.sin(2 * np.pi * t / 47) + rng.normal(0, 0.02, len(t))
+    return pd.DataFrame({'MUTC': MUTC, 'p': p, 'Local Time': MUTC.time})
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch, tmp_path):
+    '''
+    ディスクキャッシュを無効にし、出力を一時ディレクトリに保存する。
+    '''
+    import spectracache
+    monkeypatch.setattr(spectracache, 'ENABLED', False)
+    monkeypatch.setattr(DATACATALOG, 'process_datacatalog', synthetic_catalog)
+    monkeypatch.chdir(tmp_path)
+
+@pytest.fixture
+def surround_data(monkeypatch):
+    '''
+    時系列データの読み込みを合成データに置き換える。
+    '''
+    import dailychange_p
+    monkeypatch.setattr(dailychange_p, 'process_surround_dailydata', synthetic_surround_dailydata)
+    return synthetic_surround_dailydata
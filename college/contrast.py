@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import os
+import warnings
+import argparse as argparse
+from scipy.spatial import cKDTree
+import DATACATALOG
+import eventspectra
+import backgroundlibrary
+import meanFFT_sorteddP
+from Dispersion_Relation import Params
+
+# 近傍探索に用いることができる特徴量
+FEATURES = ['season', 'hour', 'AT', 'Ws']
+
+def feature_matrix(ls, hour, AT, Ws, features, scale):
+    '''
+    季節・時刻・気温・風速から、近傍探索に用いる特徴量の行列を作成する関数。
+    ※季節 (ls) と時刻は周期的なため、単位円上の (cos, sin) に変換する。
+    気温・風速は scale (背景の窓の標準偏差) で規格化する。
+
+    ls : 疑似的な ls (度) (array)
+    hour : 窓の中心の火星地方時 (h) (array)
+    AT : 平均気温 (array)
+    Ws : 平均風速 (array)
+    features : 用いる特徴量のリスト ('season', 'hour', 'AT', 'Ws')
+    scale : 気温・風速を規格化する値の辞書 ({'AT': float, 'Ws': float})
+    '''
+    columns = []
+    for feature in features:
+        if feature == 'season':
+            angle = np.deg2rad(np.asarray(ls, dtype=np.float64))
+            columns += [np.cos(angle), np.sin(angle)]
+        elif feature == 'hour':
+            angle = np.asarray(hour, dtype=np.float64) / 24 * 2 * np.pi
+            columns += [np.cos(angle), np.sin(angle)]
+        elif feature in ('AT', 'Ws'):
+            values = np.asarray(AT if feature == 'AT' else Ws, dtype=np.float64)
+            columns.append(values / scale[feature])
+        else:
+            raise ValueError(f"Unknown feature: {feature}")
+    return np.column_stack(columns)
+
+def event_features(IDs, timerange, interval):
+    '''
+    各事象の窓 (発生前 timerange + interval 秒 〜 interval 秒) について、
+    疑似的な ls・窓の中心の火星地方時・平均気温・平均風速をカタログから返す関数。
+
+    IDs : ダストデビルの識別番号の配列
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    '''
+    datacatalog = DATACATALOG.process_datacatalog().set_index('ID').loc[IDs]
+    MUTC = pd.to_datetime(datacatalog['MUTC'])
+    center = MUTC - pd.to_timedelta(interval + timerange / 2, unit='s')
+    hour = (center - center.dt.normalize()).dt.total_seconds().values / 3600
+    return datacatalog['ls'].values, hour, datacatalog['AT-ave'].values, datacatalog['Ws-ave'].values
+
+def interp_columns(x, Y, new_x):
+    '''
+    (行数 × len(x)) の配列の各行を、周波数軸 new_x 上に一括で線形補間する関数。
+    ※補間の添字と重みは1度だけ求め、全ての行で共有する。
+
+    x : 元の周波数軸 (array) ※昇順
+    Y : 値 (ndarray, 行数 × len(x))
+    new_x : 補間先の周波数軸 (array)
+    '''
+    right = np.clip(np.searchsorted(x, new_x), 1, len(x) - 1)
+    left = right - 1
+    weight = np.clip((new_x - x[left]) / (x[right] - x[left]), 0, 1)
+    return Y[:, left] * (1 - weight) + Y[:, right] * weight
+
+class ContrastEngine:
+    '''
+    背景スペクトルライブラリのうち、ダストデビルを含まない窓を
+    (季節, 地方時, 気温, 風速) の KD 木に登録し、
+    各事象に近い K 個の背景の窓の平均スペクトルとの比 (コントラスト) を一括で求めるクラス。
+
+    library : 背景スペクトルライブラリ (backgroundlibrary.BackgroundLibrary)
+    features : 近傍探索に用いる特徴量のリスト ('season', 'hour', 'AT', 'Ws')
+    '''
+    def __init__(self, library, features=FEATURES):
+        self.library = library
+        self.features = list(features)
+
+        # ダストデビルを含まず、特徴量が揃っている窓のみを背景とする
+        hour = library.MUTC_h + library.timerange / 7200
+        quiet = ~library.devil & np.isfinite(library.ls)
+        for feature in ('AT', 'Ws'):
+            if feature in self.features:
+                quiet &= np.isfinite(getattr(library, feature))
+        if not quiet.any():
+            raise ValueError("No quiet window available for matching.")
+        self.index = np.flatnonzero(quiet)
+
+        # 気温・風速は背景の窓の標準偏差で規格化
+        self.scale = {}
+        for feature in ('AT', 'Ws'):
+            std = np.std(getattr(library, feature)[quiet]) if quiet.any() else 0
+            self.scale[feature] = std if np.isfinite(std) and std > 0 else 1.0
+
+        points = feature_matrix(library.ls[quiet], hour[quiet], library.AT[quiet], library.Ws[quiet],
+                                self.features, self.scale)
+        self.tree = cKDTree(points)
+
+    def neighbors(self, ls, hour, AT, Ws, k=10):
+        '''
+        各事象に近い k 個の背景の窓の (ライブラリ内の番号, 距離) を返す関数。
+        ※特徴量に NaN を含む事象は番号 -1 とする。
+
+        ls : 疑似的な ls (度) (array)
+        hour : 窓の中心の火星地方時 (h) (array)
+        AT : 平均気温 (array)
+        Ws : 平均風速 (array)
+        k : 近傍の窓の数 (int)
+        '''
+        k = min(k, len(self.index))
+        points = feature_matrix(ls, hour, AT, Ws, self.features, self.scale)
+        valid = np.isfinite(points).all(axis=1)
+
+        index = np.full((len(points), k), -1, dtype=np.int64)
+        distance = np.full((len(points), k), np.inf)
+        if valid.any():
+            d, i = self.tree.query(points[valid], k=k)
+            index[valid] = self.index[np.asarray(i).reshape(-1, k)]
+            distance[valid] = np.asarray(d).reshape(-1, k)
+        return index, distance
+
+    def background(self, index, chunk=256):
+        '''
+        各事象の近傍の窓の平均スペクトル (事象数 × 周波数) を返す関数。
+        ※(事象数 × K × 周波数) の配列を作らないよう、chunk 件ずつ算出する。
+
+        index : neighbors で求めた近傍の窓の番号 (ndarray, 事象数 × K)
+        chunk : 1度に計算する事象数 (int)
+        '''
+        fft_y = self.library.fft_y
+        mean = np.full((len(index), fft_y.shape[1]), np.nan)
+        for start in range(0, len(index), chunk):
+            block = index[start:start + chunk]
+            valid = (block >= 0).all(axis=1)
+            if valid.any():
+                mean[start:start + chunk][valid] = fft_y[block[valid]].mean(axis=1)
+        return mean
+
+    def contrast(self, fft_x, fft_y, ls, hour, AT, Ws, k=10):
+        '''
+        各事象のパワースペクトルと、近傍の背景の窓の平均スペクトルとの比を一括で求める関数。
+        返り値は (比 (事象数 × 周波数), 近傍の窓の番号, 距離)。
+        ※周波数軸がライブラリと異なる場合は、背景のスペクトルを事象の周波数軸に線形補間する。
+
+        fft_x : 事象の周波数軸 (array)
+        fft_y : 事象のパワースペクトル (ndarray, 事象数 × 周波数)
+        ls, hour, AT, Ws : 各事象の特徴量 (neighbors 参照)
+        k : 近傍の窓の数 (int)
+        '''
+        index, distance = self.neighbors(ls, hour, AT, Ws, k)
+        background = self.background(index)
+        if len(fft_x) != len(self.library.fft_x) or not np.allclose(fft_x, self.library.fft_x):
+            background = interp_columns(self.library.fft_x, background, np.asarray(fft_x))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = np.asarray(fft_y, dtype=np.float64) / background
+        return ratio, index, distance
+
+def summarize_contrast(ratio):
+    '''
+    事象ごとのコントラスト (比) を対数で集計する関数。
+    返り値は (周波数ごとの log10 比の平均, 標準誤差, 中央値, 事象ごとの log10 比の平均)。
+    ※直流成分は除き、0 や NaN を含むビンは除外する。
+
+    ratio : コントラスト (ndarray, 事象数 × 周波数)
+    '''
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_ratio = np.log10(ratio)
+    log_ratio[:, 0] = np.nan
+    log_ratio[~np.isfinite(log_ratio)] = np.nan
+
+    # 有効な値の無いビン・事象は NaN とする (空のスライスの警告は表示しない)
+    count = np.sum(np.isfinite(log_ratio), axis=0)
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(log_ratio, axis=0)
+        sem = np.nanstd(log_ratio, axis=0) / np.sqrt(count)
+        median = np.nanmedian(log_ratio, axis=0)
+        per_event = np.nanmean(log_ratio, axis=1)
+    return mean, sem, median, per_event
+
+def process_contrast_dP(dP_Ulimit, timerange, interval, estimator='periodogram', k=10, features=FEATURES, file_path=None):
+    '''
+    dP_Ulimit 未満の全ての事象について、MUTC (ダストデビル発生時刻) 直前の
+    パワースペクトルと、条件の近い K 個の背景の窓の平均スペクトルとの比を一括で算出する関数。
+    返り値は (事象の ID, 周波数軸, 比 (事象数 × 周波数), 近傍の窓の番号, 距離, ライブラリ, 除外した ID の配列)。
+
+    dP_Ulimit : 気圧降下量の閾値 (Pa) (int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    k : 近傍の窓の数 (int)
+    features : 近傍探索に用いる特徴量のリスト ('season', 'hour', 'AT', 'Ws')
+    file_path : 背景スペクトルライブラリのパス ※None の場合は backgroundlibrary.library_path
+    '''
+    if file_path is None:
+        file_path = backgroundlibrary.library_path(timerange, estimator)
+    if not os.path.exists(file_path):
+        raise ValueError(f"Background library not found: {file_path}")
+    library = backgroundlibrary.BackgroundLibrary.load(file_path)
+    engine = ContrastEngine(library, features)
+
+    # 各事象のパワースペクトルと特徴量
+    IDs, fft_x, fft_y, dropped = eventspectra.process_eventspectra(meanFFT_sorteddP.process_IDlist_dP(dP_Ulimit), timerange, interval, estimator)
+    ls, hour, AT, Ws = event_features(IDs, timerange, interval)
+
+    ratio, index, distance = engine.contrast(fft_x, fft_y, ls, hour, AT, Ws, k)
+
+    return IDs, fft_x, ratio, index, distance, library, dropped
+
+def plot_contrast_dP(dP_Ulimit, timerange, interval, estimator='periodogram', k=10, features=FEATURES):
+    '''
+    事象のパワースペクトルと近傍の背景の窓との比を算出し、
+    周波数ごとの log10 比の平均 (± 標準誤差) と中央値のプロット、および結果 (npz) を保存する関数。
+
+    - X軸 : 振動数 (Hz)
+    - Y軸 : log10 (事象 / 背景)
+
+    dP_Ulimit : 気圧降下量の閾値 (Pa) (int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    k : 近傍の窓の数 (int)
+    features : 近傍探索に用いる特徴量のリスト ('season', 'hour', 'AT', 'Ws')
+    '''
+    try:
+        IDs, fft_x, ratio, index, distance, library, dropped = process_contrast_dP(dP_Ulimit, timerange, interval, estimator, k, features)
+        mean, sem, median, per_event = summarize_contrast(ratio)
+
+        # 音波と重力波の境界に該当する周波数
+        params = Params()
+        w = params.border_Hz()
+
+        # 保存の設定
+        output_dir = f'contrast_dP<{dP_Ulimit}'
+        os.makedirs(output_dir, exist_ok=True)
+        name = f"{timerange}s,k={k},{'+'.join(features)}"
+        # 近傍が無い (特徴量が NaN の) 事象は index = -1 のため、sol は -1、MUTC_h は NaN とする
+        found = index >= 0
+        neighbor_sol = np.where(found, library.sol[index], -1)
+        neighbor_MUTC_h = np.where(found, library.MUTC_h[index], np.nan)
+        np.savez(os.path.join(output_dir, f"{name}.npz"), ID=IDs, fft_x=fft_x, ratio=ratio,
+                 neighbor_sol=neighbor_sol, neighbor_MUTC_h=neighbor_MUTC_h, distance=distance,
+                 mean=mean, sem=sem, median=median, per_event=per_event, dropped_ID=dropped)
+
+        # プロットの設定
+        plt.xscale('log')
+        plt.plot(fft_x, mean, label='mean')
+        plt.fill_between(fft_x, mean - sem, mean + sem, alpha=0.3)
+        plt.plot(fft_x, median, label='median')
+        plt.axhline(y=0, color='k', linewidth=0.8)
+        plt.axvline(x=w, color='r', label='border')
+        plt.title(f'Contrast_dP<{dP_Ulimit},{timerange}s,K={k} (N={len(IDs)})')
+        plt.xlabel('Vibration Frequency [Hz]')
+        plt.ylabel('log10(event / background)')
+        plt.grid(True)
+        plt.legend(fontsize=12)
+        plt.tight_layout()
+
+        filename = f"{name}.png"
+        plt.savefig(os.path.join(output_dir, filename))
+        plt.clf()
+        plt.close()
+        print(f"Save completed: {filename}")
+
+        return fft_x, mean, per_event
+
+    except ValueError as e:
+        print(f"An error occurred: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dP_Ulimit', type=int,
+                        help="Serves as the standard for the upper limit of dP_ave(Negative int)") # dPの上限の指定(負)
+    parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
+    parser.add_argument('--k', type=int, default=10, help="Number of matched quiet windows") # 近傍の窓の数
+    parser.add_argument('--features', type=str, nargs='+', default=FEATURES, choices=FEATURES,
+                        help="Features used for matching") # 近傍探索に用いる特徴量
+    args = parser.parse_args()
+    plot_contrast_dP(args.dP_Ulimit, args.timerange, 20, args.estimator, args.k, args.features)
@@ -1,8 +1,12 @@
+import numpy as np
 import datetime as datetime
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
+import contextlib
 import argparse as argparse
+import precision
+import spectracache
 
 def get_file_path(sol):
     '''
@@ -16,13 +20,28 @@ def get_file_path(sol):
 def load_data(file_pass):
     '''
     指定されたCSVファイルを読み込む関数
+    ※読み込み結果は (パス, サイズ, 更新時刻, 精度) をキーとしてディスクにキャッシュし、
+    2回目以降は CSV の解析を省略する。
 
     file_pass : 読み込むファイルのパス
     '''
     try:
+        # キャッシュの確認
+        key = spectracache.make_key('sol', spectracache.file_stamp(file_pass), np.dtype(precision.DTYPE).str)
+        cache = spectracache.load('sol', key)
+        if cache is not None:
+            return pd.DataFrame({name: cache[name] for name in ["MUTC", "LMST", "LTST", "UTC", "p"]})
+
         data = pd.read_csv(file_pass, skiprows=1, usecols=[0, 1, 2, 3, 4], 
-                           names=["MUTC", "LMST", "LTST", "UTC", "p"], parse_dates=[0])
+                           names=["MUTC", "LMST", "LTST", "UTC", "p"], parse_dates=[0],
+                           dtype={"p": precision.DTYPE})
         data["UTC"] = pd.to_datetime(data["UTC"], format="%Y-%jT%H:%M:%S.%fZ")
+
+        # 時刻の列が変換済みで、文字列の列に欠損が無い場合のみキャッシュ (pickle を用いずに保存するため)
+        if data["MUTC"].dtype.kind == 'M' and not data[["LMST", "LTST"]].isna().any().any():
+            spectracache.save('sol', key, MUTC=data["MUTC"].values, UTC=data["UTC"].values,
+                              LMST=data["LMST"].values.astype(str), LTST=data["LTST"].values.astype(str),
+                              p=data["p"].values)
         return data
 
     except FileNotFoundError:
@@ -60,6 +79,37 @@ def process_dailydata_p(sol):
         return None
 
 
+# 直近に読み込んだ sol の結合済みデータ (reuse_surround_dailydata の範囲でのみ使用)
+_surround_memo = None
+
+# 共有の時系列データ (timeline.attach で設定)
+_timeline = None
+
+def shared_timeline():
+    '''
+    共有の時系列データ (timeline.Timeline) を返す関数。
+    未設定で環境変数 EXPLORE_TIMELINE が指定されている場合は、そのディレクトリを設定する。
+    (共有の時系列データを用いない場合は None)
+    '''
+    if _timeline is None and os.environ.get('EXPLORE_TIMELINE'):
+        import timeline
+        timeline.attach(os.environ['EXPLORE_TIMELINE'])
+    return _timeline
+
+@contextlib.contextmanager
+def reuse_surround_dailydata():
+    '''
+    with 文の範囲のみ、process_surround_dailydata が直前と同じ sol の結果を
+    読み込み直さずに (コピーを) 返すようにする関数。
+    ※sol ごとにまとめた事象を続けて処理する場合に、同じ sol の読み込みを1回にする。
+    '''
+    global _surround_memo
+    _surround_memo = {}
+    try:
+        yield
+    finally:
+        _surround_memo = None
+
 def process_surround_dailydata(sol):
     '''
     指定されたsolとその前後1sol（sol-1, sol, sol+1）を含む
@@ -68,24 +118,40 @@ def process_surround_dailydata(sol):
     - 指定されたsolの前後1solのデータを取得
     - データを結合し、`MUTC`（火星協定時）で重複を削除
     - `Local Time`（火星地方時刻）を追加
+    ※共有の時系列データ (timeline) が設定されている場合はそこから取得する。
+    (この場合、時刻と気圧以外の列は含まない)
 
     sol : 取り扱う火星日 (探査機到着後からの経過日数) (int型)
     '''
-    # sol-1, sol, sol+1 に対応する全データを取得
-    dataframes = [load_data(get_file_path(sol_offset)) for sol_offset in [sol - 1, sol, sol + 1]]
-    
-    # None ではないデータのみをリストに格納
-    valid_dataframes = [dataframe for dataframe in dataframes if dataframe is not None]
-
-    # データを結合し、重複を削除
-    if valid_dataframes:
-        dataframe = pd.concat(valid_dataframes, ignore_index=True)
-        dataframe = dataframe.drop_duplicates(subset=['MUTC'], keep='first')
-        dataframe['Local Time'] = dataframe['MUTC'].dt.time  # 火星地方時刻を追加
-        
-        return dataframe
+    # 直前と同じ sol の場合は再利用 (reuse_surround_dailydata の範囲のみ)
+    if _surround_memo is not None and sol in _surround_memo:
+        dataframe = _surround_memo[sol]
+        return None if dataframe is None else dataframe.copy()
+
+    if shared_timeline() is not None:
+        # 共有の時系列データから取得 (CSV は読み込まない)
+        dataframe = _timeline.surround(sol)
     else:
-        return None
+        # sol-1, sol, sol+1 に対応する全データを取得
+        dataframes = [load_data(get_file_path(sol_offset)) for sol_offset in [sol - 1, sol, sol + 1]]
+
+        # None ではないデータのみをリストに格納
+        valid_dataframes = [dataframe for dataframe in dataframes if dataframe is not None]
+
+        # データを結合し、重複を削除
+        if valid_dataframes:
+            dataframe = pd.concat(valid_dataframes, ignore_index=True)
+            dataframe = dataframe.drop_duplicates(subset=['MUTC'], keep='first')
+            dataframe['Local Time'] = dataframe['MUTC'].dt.time  # 火星地方時刻を追加
+        else:
+            dataframe = None
+
+    if _surround_memo is not None:
+        _surround_memo.clear()
+        _surround_memo[sol] = dataframe
+        return None if dataframe is None else dataframe.copy()
+
+    return dataframe
 
 def plot_dailychange_p(sol):
     '''
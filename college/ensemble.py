@@ -0,0 +1,380 @@
+import numpy as np
+
+class SpectrumAccumulator:
+    '''
+    ケースごとのスペクトルを1件ずつ受け取り、周波数ビンごとの
+    件数・平均・分散 (Welford 法)・最小値・最大値を逐次更新するクラス。
+    ※保持するのは周波数ビン数の配列のみで、ケース数によらずメモリは一定。
+    NaN (移動平均が計算できない範囲など) はビンごとに除外して集計する。
+    並列処理で得た部分的な集計は merge で統合できる。
+
+    fft_x : 周波数軸 (array) ※None の場合は最初に add したスペクトルの長さにそろえる
+    '''
+    def __init__(self, fft_x=None):
+        self.fft_x = None if fft_x is None else np.asarray(fft_x, dtype=np.float64)
+        self.n_cases = 0
+        self.count = None
+        self._mean = None
+        self._M2 = None
+        self._min = None
+        self._max = None
+        if self.fft_x is not None:
+            self._allocate(len(self.fft_x))
+
+    def _allocate(self, n):
+        '''
+        周波数ビン数 n の集計用配列を確保する関数。
+
+        n : 周波数ビン数 (int)
+        '''
+        self.count = np.zeros(n, dtype=np.int64)
+        self._mean = np.zeros(n)
+        self._M2 = np.zeros(n)
+        self._min = np.full(n, np.inf)
+        self._max = np.full(n, -np.inf)
+
+    def _check(self, n, fft_x=None):
+        '''
+        スペクトルの長さ (および周波数軸) が集計と一致しているか確認する関数。
+
+        n : スペクトルの長さ (int)
+        fft_x : スペクトルの周波数軸 (array)
+        '''
+        if self.count is None:
+            self._allocate(n)
+        if n != len(self.count):
+            raise ValueError(f"Spectrum length {n} does not match the accumulator ({len(self.count)}).")
+        if fft_x is not None:
+            if self.fft_x is None:
+                self.fft_x = np.asarray(fft_x, dtype=np.float64)
+            elif not np.allclose(self.fft_x, fft_x, equal_nan=True):
+                raise ValueError("Frequency axis does not match the accumulator.")
+
+    def add(self, y, fft_x=None):
+        '''
+        1件のスペクトルで集計を更新する関数。(Welford 法)
+
+        y : スペクトル (array)
+        fft_x : y の周波数軸 (array) ※指定した場合は集計の周波数軸と一致するか確認する
+        '''
+        y = np.asarray(y, dtype=np.float64)
+        self._check(len(y), fft_x)
+        valid = np.isfinite(y)
+
+        # 有効なビンのみ件数と平均・偏差平方和を更新
+        self.count += valid
+        delta = np.where(valid, y - self._mean, 0)
+        self._mean += np.where(valid, delta / np.maximum(self.count, 1), 0)
+        self._M2 += np.where(valid, delta * (y - self._mean), 0)
+        self._min = np.where(valid, np.fmin(self._min, y), self._min)
+        self._max = np.where(valid, np.fmax(self._max, y), self._max)
+        self.n_cases += 1
+
+        return self
+
+    def add_batch(self, Y, fft_x=None):
+        '''
+        複数件のスペクトル (ケース数 × 周波数) で集計を一括して更新する関数。
+
+        Y : スペクトル (ndarray, ケース数 × 周波数)
+        fft_x : Y の周波数軸 (array)
+        '''
+        Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+        batch = SpectrumAccumulator()
+        batch._check(Y.shape[-1], fft_x)
+        valid = np.isfinite(Y)
+
+        # バッチ内の件数・平均・偏差平方和
+        batch.count = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            batch._mean = np.where(batch.count > 0, np.where(valid, Y, 0).sum(axis=0) / batch.count, 0)
+        batch._M2 = np.where(valid, (Y - batch._mean)**2, 0).sum(axis=0)
+        batch._min = np.where(valid, Y, np.inf).min(axis=0)
+        batch._max = np.where(valid, Y, -np.inf).max(axis=0)
+        batch.n_cases = Y.shape[0]
+
+        return self.merge(batch)
+
+    def merge(self, other):
+        '''
+        別の集計 (並列処理の部分結果など) を統合する関数。(Chan らの方法)
+
+        other : 統合する SpectrumAccumulator
+        '''
+        if other.count is None:
+            return self
+        self._check(len(other.count), other.fft_x)
+
+        count = self.count + other.count
+        delta = other._mean - self._mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(count > 0, other.count / count, 0)
+        self._mean = self._mean + delta * weight
+        self._M2 = self._M2 + other._M2 + delta**2 * self.count * weight
+        self._min = np.fmin(self._min, other._min)
+        self._max = np.fmax(self._max, other._max)
+        self.count = count
+        self.n_cases += other.n_cases
+
+        return self
+
+    def _masked(self, values, min_count=1):
+        '''
+        件数が min_count 未満のビンを NaN に変更して返す関数。
+
+        values : 周波数ビンごとの値 (ndarray)
+        min_count : 必要な件数 (int)
+        '''
+        if self.count is None:
+            return np.array([])
+        return np.where(self.count >= min_count, values, np.nan)
+
+    @property
+    def mean(self):
+        '''周波数ビンごとの平均 (件数 0 のビンは NaN)'''
+        return self._masked(self._mean)
+
+    @property
+    def var(self):
+        '''周波数ビンごとの不偏分散 (件数 1 以下のビンは NaN)'''
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._masked(self._M2 / (self.count - 1), 2)
+
+    @property
+    def std(self):
+        '''周波数ビンごとの標準偏差'''
+        return np.sqrt(self.var)
+
+    @property
+    def sem(self):
+        '''周波数ビンごとの平均の標準誤差'''
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.var / self.count)
+
+    @property
+    def min(self):
+        '''周波数ビンごとの最小値'''
+        return self._masked(self._min)
+
+    @property
+    def max(self):
+        '''周波数ビンごとの最大値'''
+        return self._masked(self._max)
+
+    def state(self):
+        '''
+        集計の状態を配列の辞書として返す関数。(save や分割した集計の保存に用いる)
+        '''
+        if self.count is None:
+            raise ValueError("No spectrum has been accumulated.")
+        return {'fft_x': np.array([]) if self.fft_x is None else self.fft_x,
+                'n_cases': np.array(self.n_cases), 'count': self.count, 'mean': self._mean,
+                'M2': self._M2, 'min': self._min, 'max': self._max}
+
+    @classmethod
+    def from_state(cls, state):
+        '''
+        state で作成した辞書から集計を復元する関数。
+
+        state : 集計の状態 (dict)
+        '''
+        accumulator = cls(state['fft_x'] if len(state['fft_x']) else None)
+        accumulator.n_cases = int(state['n_cases'])
+        accumulator.count = np.array(state['count'], dtype=np.int64)
+        accumulator._mean = np.array(state['mean'], dtype=np.float64)
+        accumulator._M2 = np.array(state['M2'], dtype=np.float64)
+        accumulator._min = np.array(state['min'], dtype=np.float64)
+        accumulator._max = np.array(state['max'], dtype=np.float64)
+        return accumulator
+
+    def save(self, file_path):
+        '''
+        集計を npz ファイルに保存する関数。
+
+        file_path : 保存先のパス
+        '''
+        np.savez(file_path, **self.state())
+
+    @classmethod
+    def load(cls, file_path):
+        '''
+        save で保存した集計を読み込む関数。
+
+        file_path : 読み込むファイルのパス
+        '''
+        with np.load(file_path) as state:
+            return cls.from_state(state)
+
+class QuantileSketch:
+    '''
+    ケースごとのスペクトルを1件ずつ受け取り、周波数ビンごとに
+    値の分布を対数間隔のバケットの度数として記録するクラス。(DDSketch と同様の方式)
+    ※任意の分位点 (中央値、5/95 パーセンタイルなど) を、
+    相対誤差 relative_accuracy 以内で返す。
+    メモリは (周波数ビン数 × バケット数) でケース数によらず一定で、
+    並列処理で得た部分的な集計は merge (度数の和) で統合できる。
+    絶対値が min_value 未満の値は 0 として、max_value を超える値は最大のバケットとして数える。
+
+    relative_accuracy : 分位点の相対誤差の上限 (float)
+    min_value : 区別する絶対値の下限 (float)
+    max_value : 区別する絶対値の上限 (float)
+    '''
+    def __init__(self, relative_accuracy=0.01, min_value=1e-8, max_value=1e8):
+        self.relative_accuracy = relative_accuracy
+        self.min_value, self.max_value = min_value, max_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.n_buckets = int(np.ceil(np.log(max_value / min_value) / np.log(self.gamma))) + 1
+        self.n_cases = 0
+        self.counts = None
+
+    def _index(self, Y):
+        '''
+        各値が属する列 (負のバケット・0・正のバケットの順) を返す関数。
+        ※NaN は -1 を返す。
+
+        Y : 値 (ndarray)
+        '''
+        magnitude = np.abs(Y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bucket = np.ceil(np.log(magnitude / self.min_value) / np.log(self.gamma))
+        bucket = np.clip(np.nan_to_num(bucket, nan=0, neginf=0), 0, self.n_buckets - 1).astype(np.int64)
+
+        # 負の値は絶対値の大きい順、続いて 0、正の値は小さい順に並べる
+        column = np.where(Y > 0, self.n_buckets + 1 + bucket, self.n_buckets - 1 - bucket)
+        column = np.where(magnitude < self.min_value, self.n_buckets, column)
+        return np.where(np.isfinite(Y), column, -1)
+
+    def _value(self, column):
+        '''
+        列番号に対応するバケットの代表値を返す関数。
+
+        column : 列番号 (ndarray)
+        '''
+        positive = column - (self.n_buckets + 1)
+        negative = self.n_buckets - 1 - column
+        bucket = np.where(column > self.n_buckets, positive, negative)
+        value = self.min_value * 2 * self.gamma**bucket / (self.gamma + 1)
+        value = np.where(column > self.n_buckets, value, -value)
+        return np.where(column == self.n_buckets, 0.0, value)
+
+    def add_batch(self, Y):
+        '''
+        複数件のスペクトル (ケース数 × 周波数) で度数を一括して更新する関数。
+        (NaN は周波数ビンごとに除外)
+
+        Y : スペクトル (ndarray, ケース数 × 周波数)
+        '''
+        Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+        n_bins, n_columns = Y.shape[1], 2 * self.n_buckets + 1
+        if self.counts is None:
+            self.counts = np.zeros((n_bins, n_columns), dtype=np.int64)
+        if n_bins != self.counts.shape[0]:
+            raise ValueError(f"Spectrum length {n_bins} does not match the sketch ({self.counts.shape[0]}).")
+
+        # 値のある (周波数ビン, 列) だけに度数を加算 (コストはケース数 × 周波数 に比例)
+        column = self._index(Y)
+        case, row = np.nonzero(column >= 0)
+        np.add.at(self.counts, (row, column[case, row]), 1)
+        self.n_cases += Y.shape[0]
+
+        return self
+
+    def add(self, y):
+        '''
+        1件のスペクトルで度数を更新する関数。
+
+        y : スペクトル (array)
+        '''
+        return self.add_batch(np.asarray(y, dtype=np.float64)[np.newaxis, :])
+
+    def merge(self, other):
+        '''
+        別の集計 (並列処理の部分結果など) を統合する関数。
+
+        other : 統合する QuantileSketch (同じ relative_accuracy, min_value, max_value)
+        '''
+        if (other.relative_accuracy, other.min_value, other.max_value) != \
+                (self.relative_accuracy, self.min_value, self.max_value):
+            raise ValueError("Sketches with different parameters cannot be merged.")
+        if other.counts is None:
+            return self
+        if self.counts is None:
+            self.counts = np.zeros_like(other.counts)
+        if self.counts.shape != other.counts.shape:
+            raise ValueError("Spectrum length does not match the sketch.")
+        self.counts += other.counts
+        self.n_cases += other.n_cases
+        return self
+
+    def quantile(self, q):
+        '''
+        周波数ビンごとの分位点を返す関数。(件数 0 のビンは NaN)
+        q をリストで与えた場合は (分位点数 × 周波数) の配列を返す。
+        ※np.nanpercentile (既定の線形補間) と同様に、順位 q(n-1) の前後の値を線形補間する。
+        各値の相対誤差は relative_accuracy 以下のため、分位点の相対誤差も relative_accuracy 以下となる。
+
+        q : 分位点 (0 ≦ q ≦ 1) (float または list)
+        '''
+        if self.counts is None:
+            return np.array([])
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        cumulative = np.cumsum(self.counts, axis=1)
+        total = cumulative[:, -1]
+
+        result = np.full((len(q), len(total)), np.nan)
+        for k, qk in enumerate(q):
+            # 順位 q(n-1) の前後の値 (小さい方から i 番目の値は、累積度数が i を超える最初のバケット)
+            rank = qk * np.maximum(total - 1, 0)
+            lower = np.floor(rank)
+            upper = np.minimum(lower + 1, np.maximum(total - 1, 0))
+            lower_value = self._value(np.argmax(cumulative > lower[:, np.newaxis], axis=1))
+            upper_value = self._value(np.argmax(cumulative > upper[:, np.newaxis], axis=1))
+            value = lower_value + (rank - lower) * (upper_value - lower_value)
+            result[k] = np.where(total > 0, value, np.nan)
+
+        return result if len(result) > 1 else result[0]
+
+    @property
+    def median(self):
+        '''周波数ビンごとの中央値'''
+        return self.quantile(0.5)
+
+    def state(self):
+        '''
+        集計の状態を配列の辞書として返す関数。(save や分割した集計の保存に用いる)
+        '''
+        if self.counts is None:
+            raise ValueError("No spectrum has been accumulated.")
+        return {'counts': self.counts, 'n_cases': np.array(self.n_cases),
+                'params': np.array([self.relative_accuracy, self.min_value, self.max_value])}
+
+    @classmethod
+    def from_state(cls, state):
+        '''
+        state で作成した辞書から集計を復元する関数。
+
+        state : 集計の状態 (dict)
+        '''
+        relative_accuracy, min_value, max_value = state['params']
+        sketch = cls(relative_accuracy, min_value, max_value)
+        sketch.counts = np.array(state['counts'])
+        sketch.n_cases = int(state['n_cases'])
+        return sketch
+
+    def save(self, file_path):
+        '''
+        集計を npz ファイルに保存する関数。
+
+        file_path : 保存先のパス
+        '''
+        np.savez(file_path, **self.state())
+
+    @classmethod
+    def load(cls, file_path):
+        '''
+        save で保存した集計を読み込む関数。
+
+        file_path : 読み込むファイルのパス
+        '''
+        with np.load(file_path) as state:
+            return cls.from_state(state)
@@ -0,0 +1,144 @@
+import numpy as np
+import dailychange_p
+import neardevil
+import nearFFT
+import meanFFT_sortedseason
+import batchFFT
+import precision
+import spectracache
+import parallel
+
+def process_residual(ID, timerange, interval, s=0.5):
+    '''
+    指定された ID に対応する MUTC (ダストデビル発生時刻) 直前の
+    時系列データを s 秒間隔に resample し、気圧残差とサンプリング周波数を返す関数。
+    ※取得できない場合は ValueError を送出する。
+    結果は (ID, パラメータ, 前後1solのファイル, 精度) をキーとしてディスクにキャッシュする。
+
+    ID : ダストデビルの識別番号 (int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    s : resample の間隔 (秒) (float)
+    '''
+    # ID に対応する sol および MUTC を取得
+    sol, MUTC = neardevil.get_sol_MUTC(ID)
+
+    # キャッシュの確認
+    key = spectracache.make_key('residual', ID, sol, str(MUTC), timerange, interval, s,
+                                spectracache.sol_stamps([sol - 1, sol, sol + 1]), np.dtype(precision.DTYPE).str)
+    cache = spectracache.load('residual', key)
+    if cache is not None:
+        return cache['residual'], float(cache['sampling_freq'])
+
+    # 該当sol付近の時系列データを取得
+    data = dailychange_p.process_surround_dailydata(sol)
+    if data is None:
+        raise ValueError("Failed to retrieve time-series data.")
+
+    # MUTC 付近の時系列データを取得
+    near_devildata = neardevil.filter_neardevildata(data, MUTC, timerange, interval)
+    if near_devildata is None or near_devildata.empty:
+        raise ValueError("No data available after filtering.")
+
+    # s秒間隔でresample
+    near_devildata = meanFFT_sortedseason.data_resample(near_devildata, s)
+
+    # 残差計算を実施
+    near_devildata = nearFFT.calculate_residual(near_devildata)
+
+    residual = near_devildata['residual'].values
+    sampling_freq = 1 / np.mean(np.diff(near_devildata['countdown']))
+    spectracache.save('residual', key, residual=residual, sampling_freq=sampling_freq)
+
+    return residual, sampling_freq
+
+def common_length(IDs, fft_xlist, fft_ylist):
+    '''
+    データ数の異なる窓が混在する場合に、最も件数の多いデータ数の窓のみを残し、
+    (ケース数 × 周波数) の配列にまとめる関数。
+    返り値は (残した ID の配列, 周波数軸, パワースペクトル, 除外した ID の配列)。
+
+    IDs : 各スペクトルの ID (array)
+    fft_xlist : 各スペクトルの周波数軸のリスト
+    fft_ylist : 各スペクトルの強度のリスト
+    '''
+    IDs = np.asarray(IDs)
+    lengths = np.array([len(fft_y) for fft_y in fft_ylist])
+    values, counts = np.unique(lengths, return_counts=True)
+    keep = lengths == values[np.argmax(counts)]
+    if not keep.all():
+        print(f"Skipped {np.sum(~keep)} spectra with a different length: ID={IDs[~keep].tolist()}")
+    fft_x = fft_xlist[int(np.argmax(keep))]
+    fft_y = np.array([fft_y for fft_y, k in zip(fft_ylist, keep) if k])
+
+    return IDs[keep], fft_x, fft_y, IDs[~keep]
+
+def process_eventspectra(IDlist, timerange, interval, estimator='periodogram', workers=1):
+    '''
+    IDlist の各 ID について MUTC (ダストデビル発生時刻) 直前の
+    気圧残差のパワースペクトルを1度だけ求め、(ケース数 × 周波数) の配列にまとめて返す関数。
+    返り値は (スペクトルが得られた ID の配列, 周波数軸, パワースペクトル, データ数が異なり除外した ID の配列)。
+    ※データ数の異なる窓が混在する場合は、最も件数の多いデータ数の窓のみを用いる。(common_length 参照)
+
+    IDlist : ダストデビルの識別番号のリスト
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
+    '''
+    # 各ケースの気圧残差とサンプリング周波数 (取得できないケースは除外)
+    IDs, results = parallel.run_events(process_residual, IDlist, (timerange, interval), workers)
+    residuallist = [residual for residual, sampling_freq in results]
+    sampling_freqlist = [sampling_freq for residual, sampling_freq in results]
+
+    if not residuallist:
+        raise ValueError("No spectrum available.")
+
+    # 周波数軸が一致する窓ごとに、パワースペクトルを一括で導出
+    fft_xlist, fft_ylist = batchFFT.FFT_stack(residuallist, sampling_freqlist, estimator)
+
+    # 最も件数の多いデータ数の窓にそろえる
+    return common_length(IDs, fft_xlist, fft_ylist)
+
+def group_sum(group, fft_y, n_groups):
+    '''
+    各ケースの所属するグループ番号から、グループごとのスペクトルの総和と有効件数を
+    np.add.at による1回の加算 (scatter-add) で算出する関数。
+    返り値は (グループ数 × 周波数) の総和と有効件数、およびグループごとのケース数。
+    ※NaN は周波数ビンごとに除外する。グループ番号が範囲外のケースは除く。
+
+    group : 各ケースのグループ番号 (array of int)
+    fft_y : パワースペクトル (ndarray, ケース数 × 周波数)
+    n_groups : グループ数 (int)
+    '''
+    group = np.asarray(group, dtype=np.int64)
+    fft_y = np.asarray(fft_y, dtype=np.float64)
+    use = (group >= 0) & (group < n_groups)
+    group, fft_y = group[use], fft_y[use]
+
+    # グループごとの総和と有効件数
+    valid = np.isfinite(fft_y)
+    total = np.zeros((n_groups, fft_y.shape[1]))
+    count = np.zeros((n_groups, fft_y.shape[1]))
+    np.add.at(total, group, np.where(valid, fft_y, 0))
+    np.add.at(count, group, valid)
+
+    return total, count, np.bincount(group, minlength=n_groups)
+
+def group_mean(group, fft_y, n_groups):
+    '''
+    各ケースの所属するグループ番号から、グループごとの平均スペクトルを
+    scatter-add (group_sum) で算出する関数。
+    返り値は (グループ数 × 周波数) の平均スペクトル (ケースの無いグループは NaN) と、
+    グループごとのケース数。
+
+    group : 各ケースのグループ番号 (array of int)
+    fft_y : パワースペクトル (ndarray, ケース数 × 周波数)
+    n_groups : グループ数 (int)
+    '''
+    total, count, n_cases = group_sum(group, fft_y, n_groups)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+
+    return mean, n_cases
@@ -8,7 +8,7 @@ from tqdm import tqdm
 import nearFFT
 from Dispersion_Relation import Params
 
-def process_focusFFT(sol, MUTC_h, timerange):
+def process_focusFFT(sol, MUTC_h, timerange, estimator='periodogram'):
     '''
     指定された sol (火星日) における MUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -17,6 +17,7 @@ def process_focusFFT(sol, MUTC_h, timerange):
     sol : 火星日(探査機到着後からの経過日数)(int)
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 該当 sol 及び MUTC_h に対応する時系列データの取得
@@ -34,7 +35,7 @@ def process_focusFFT(sol, MUTC_h, timerange):
         '''
         
         # FFT によるパワースペクトルの導出
-        fft_x, fft_y = nearFFT.FFT(focus_data)
+        fft_x, fft_y = nearFFT.FFT(focus_data, estimator)
 
         return fft_x, fft_y
     
@@ -42,7 +43,7 @@ def process_focusFFT(sol, MUTC_h, timerange):
         print(f"An error occurred: {e}")
         return None
 
-def plot_focusFFT(sol, MUTC_h, timerange):
+def plot_focusFFT(sol, MUTC_h, timerange, estimator='periodogram'):
     '''
     指定された sol (火星日) における MUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -54,10 +55,11 @@ def plot_focusFFT(sol, MUTC_h, timerange):
     sol : 火星日(探査機到着後からの経過日数)(int)
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''  
     try:
         # パワースペクトルの導出
-        fft_x, fft_y = process_focusFFT(sol, MUTC_h, timerange)
+        fft_x, fft_y = process_focusFFT(sol, MUTC_h, timerange, estimator)
         
         # 音波と重力波の境界に該当する周波数
         params = Params()
@@ -95,9 +97,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('MUTC_h', type=int, help='Base start time') # MUTC_h (火星地方時)の指定
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
     
     # ダストデビルのない sol のパワースペクトルを描画
     nodevilsollist = nodevil.process_nodevilsollist()
     for sol in tqdm(nodevilsollist, desc="Processing nodevil sols"):
-        plot_focusFFT(sol, args.MUTC_h, args.timerange)
+        plot_focusFFT(sol, args.MUTC_h, args.timerange, args.estimator)
@@ -1,4 +1,5 @@
 import datetime
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
@@ -28,6 +29,30 @@ def filter_focusdata(data, sol, MUTC_h, timerange):
     
     return filtered_data
 
+def filter_focuswindows(data, sol, MUTC_hlist, timerange):
+    '''
+    与えられた時系列データから、MUTC_hlist の各時刻から timerange 秒間のデータを
+    1度の並べ替えと二分探索でまとめて切り出し、リストで返す関数 (filter_focusdata と同じ範囲)。
+    ※MUTC_h は小数 (例: 12.5 → 12:30) も指定可能。該当データが無い時刻は空の DataFrame とする。
+
+    data:気圧の時系列データ(dataframe)
+    sol:取り扱う火星日(探査機到着後からの経過日数)(int型)
+    MUTC_hlist:基準となる開始時刻のリスト(0 ≦ MUTC_h < 24)
+    timerange:時間間隔(切り取る時間)(秒)(int型)
+    '''
+    #時刻順に並べ替え
+    data = data.sort_values('MUTC', kind='stable')
+    MUTC = data['MUTC'].values
+
+    #solに対応するMUTCを計算した後に、各時刻の範囲を二分探索で取得
+    date = pd.Timestamp(datetime.date(2018, 11, 26)+datetime.timedelta(days=sol))
+    start = (date + pd.to_timedelta(list(MUTC_hlist), unit='h')).values
+    stop = start + np.timedelta64(int(timerange * 1e9), 'ns')
+    lower = np.searchsorted(MUTC, start, side='right')
+    upper = np.searchsorted(MUTC, stop, side='left')
+
+    return [data.iloc[lo:max(lo, up)].copy() for lo, up in zip(lower, upper)]
+
 def process_focusdata_p(sol, MUTC_h, timerange):
     '''
     sol,時刻MUTC_hからtimerange秒間に対応する
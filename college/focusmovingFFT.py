@@ -9,7 +9,7 @@ import nearFFT
 import nearmovingFFT
 from Dispersion_Relation import Params
 
-def process_focusmovingFFT(sol, MUTC_h, timerange, windowsize_FFT):
+def process_focusmovingFFT(sol, MUTC_h, timerange, windowsize_FFT, estimator='periodogram'):
     '''
     指定された sol (火星日) における MUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -19,6 +19,7 @@ def process_focusmovingFFT(sol, MUTC_h, timerange, windowsize_FFT):
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均を計算する際に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 該当 sol 及び MUTC_h に対応する時系列データの取得
@@ -36,7 +37,7 @@ def process_focusmovingFFT(sol, MUTC_h, timerange, windowsize_FFT):
         '''
         
         # FFT によるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(focus_data, windowsize_FFT)
+        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(focus_data, windowsize_FFT, estimator)
 
         return fft_x, fft_y, moving_fft_x, moving_fft_y
     
@@ -44,7 +45,7 @@ def process_focusmovingFFT(sol, MUTC_h, timerange, windowsize_FFT):
         print(f"An error occurred: {e}")
         return None
     
-def plot_focusmovingFFT(sol, MUTC_h, timerange, windowsize_FFT):
+def plot_focusmovingFFT(sol, MUTC_h, timerange, windowsize_FFT, estimator='periodogram'):
     '''
     指定された sol (火星日) における MUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -57,10 +58,11 @@ def plot_focusmovingFFT(sol, MUTC_h, timerange, windowsize_FFT):
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均を計算する際に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''  
     try:
         # パワースペクトルとその移動平均の導出
-        fft_x, fft_y, moving_fft_x, moving_fft_y = process_focusmovingFFT(sol, MUTC_h, timerange, windowsize_FFT)
+        fft_x, fft_y, moving_fft_x, moving_fft_y = process_focusmovingFFT(sol, MUTC_h, timerange, windowsize_FFT, estimator)
         
         # 音波と重力波の境界に該当する周波数
         params = Params()
@@ -102,9 +104,11 @@ if __name__ == "__main__":
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
     parser.add_argument('windowsize_FFT', type=int, 
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
     
     # ダストデビルのない sol のパワースペクトルを描画
     nodevilsollist = nodevil.process_nodevilsollist()
     for sol in tqdm(nodevilsollist, desc="Processing nodevil sols"):
-        plot_focusmovingFFT(sol, args.MUTC_h, args.timerange, args.windowsize_FFT) 
+        plot_focusmovingFFT(sol, args.MUTC_h, args.timerange, args.windowsize_FFT, args.estimator) 
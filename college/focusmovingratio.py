@@ -11,7 +11,7 @@ import nearratio
 import nearmovingratio
 from Dispersion_Relation import Params
 
-def process_focusmovingratio(sol, MUTC_h, timerange, windowsize_FFT, windowsize_ratio):
+def process_focusmovingratio(sol, MUTC_h, timerange, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
     '''
     指定された sol (火星日) における MUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -22,6 +22,7 @@ def process_focusmovingratio(sol, MUTC_h, timerange, windowsize_FFT, windowsize_
     timerange : 切り取る時間範囲 (秒) (int)
     windowsize_FFT :パワースペクトルの移動平均を計算する際に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 該当 sol 及び MUTC_h に対応する時系列データの取得
@@ -39,7 +40,7 @@ def process_focusmovingratio(sol, MUTC_h, timerange, windowsize_FFT, windowsize_
         '''
         
         # FFT によるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(focus_data, windowsize_FFT)
+        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(focus_data, windowsize_FFT, estimator)
         
         # パワースペクトル比の算出
         moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
@@ -53,7 +54,7 @@ def process_focusmovingratio(sol, MUTC_h, timerange, windowsize_FFT, windowsize_
         print(f"An error occurred: {e}")
         return None
 
-def plot_focusmovingratio(sol, MUTC_h, timerange, windowsize_FFT, windowsize_ratio):
+def plot_focusmovingratio(sol, MUTC_h, timerange, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
     '''
     指定された sol (火星日) における MUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -67,10 +68,11 @@ def plot_focusmovingratio(sol, MUTC_h, timerange, windowsize_FFT, windowsize_rat
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 修正パワースペクトルの算出
-        moving_fft_x, moving_ratio = process_focusmovingratio(sol, MUTC_h, timerange, windowsize_FFT, windowsize_ratio)
+        moving_fft_x, moving_ratio = process_focusmovingratio(sol, MUTC_h, timerange, windowsize_FFT, windowsize_ratio, estimator)
 
         # 特定の周波数より高周波の情報をNaNに変更
         #moving_fft_x, ratio = nearratio.filter_xUlimit(moving_fft_x, ratio, 0.8)
@@ -112,9 +114,11 @@ if __name__ == "__main__":
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
     parser.add_argument('windowsize_ratio', type=int, 
                         help="The [windowsize] used to calculate the moving average of ratio") # パワースペクトル比のの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
     
     #　ダストデビルの発生がない sol の修正パワースペクトルを描画
     nodevilsollist = nodevil.process_nodevilsollist()
     for sol in tqdm(nodevilsollist, desc="Processing nodevil sols"):
-        plot_focusmovingratio(sol, args.MUTC_h, args.timerange, args.windowsize_FFT, args.windowsize_ratio) 
\ No newline at end of file
+        plot_focusmovingratio(sol, args.MUTC_h, args.timerange, args.windowsize_FFT, args.windowsize_ratio, args.estimator) 
\ No newline at end of file
@@ -10,7 +10,7 @@ import nearratio
 import nearmovingratio
 from Dispersion_Relation import Params
 
-def process_focusmovingratio_resample(sol, MUTC_h, timerange, windowsize_FFT, windowsize_ratio):
+def process_focusmovingratio_resample(sol, MUTC_h, timerange, windowsize_FFT, windowsize_ratio, method='mean', estimator='periodogram'):
     '''
     指定された sol (火星日) における MUTC_h (地方時) 直後の
     時系列データ(0.5秒間隔でリサンプリング済)における気圧残差を求め、
@@ -21,6 +21,8 @@ def process_focusmovingratio_resample(sol, MUTC_h, timerange, windowsize_FFT, wi
     timerange : 切り取る時間範囲 (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均を計算する際に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    method : resample の方法 ('mean' : 区間平均, 'polyphase' : polyphase FIR による間引き) (str)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 該当 sol 及び MUTC_h に対応する時系列データの取得
@@ -29,7 +31,7 @@ def process_focusmovingratio_resample(sol, MUTC_h, timerange, windowsize_FFT, wi
             raise ValueError("Failed to retrieve time-series data.")
 
         # 0.5秒間隔でresample
-        focus_devildata = meanFFT_sortedseason.data_resample(focus_devildata, 0.5)
+        focus_devildata = meanFFT_sortedseason.data_resample(focus_devildata, 0.5, method)
         
         # 残差計算を実施
         focus_data = nearFFT.calculate_residual(focus_data)
@@ -41,7 +43,7 @@ def process_focusmovingratio_resample(sol, MUTC_h, timerange, windowsize_FFT, wi
         '''
         
         # FFT によるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(focus_data, windowsize_FFT)
+        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(focus_data, windowsize_FFT, estimator)
         
         # パワースペクトル比の算出
         moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
@@ -56,7 +58,7 @@ def process_focusmovingratio_resample(sol, MUTC_h, timerange, windowsize_FFT, wi
         print(f"An error occurred: {e}")
         return None
 
-def plot_focusmovingratio_resample(sol, MUTC_h, timerange, windowsize_FFT, windowsize_ratio):
+def plot_focusmovingratio_resample(sol, MUTC_h, timerange, windowsize_FFT, windowsize_ratio, method='mean', estimator='periodogram'):
     '''
     指定された sol (火星日) における MUTC_h (地方時) 直後の
     時系列データ(0.5秒間隔でリサンプリング済)における気圧残差を求め、
@@ -69,10 +71,12 @@ def plot_focusmovingratio_resample(sol, MUTC_h, timerange, windowsize_FFT, windo
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均を計算する際に用いる窓数(int)
+    method : resample の方法 ('mean' : 区間平均, 'polyphase' : polyphase FIR による間引き) (str)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 修正パワースペクトルの算出
-        moving_fft_x, moving_ratio = process_focusmovingratio_resample(sol, MUTC_h, timerange, windowsize_FFT, windowsize_ratio)
+        moving_fft_x, moving_ratio = process_focusmovingratio_resample(sol, MUTC_h, timerange, windowsize_FFT, windowsize_ratio, method, estimator)
 
         # 特定の周波数より高周波の情報をNaNに変更
         #moving_fft_x, ratio = nearratio.filter_xUlimit(moving_fft_x, ratio, 0.8)
@@ -116,9 +120,13 @@ if __name__ == "__main__":
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
     parser.add_argument('windowsize_ratio', type=int, 
                         help="The [windowsize] used to calculate the moving average of ratio") # パワースペクトル比のの移動平均に用いる窓数
+    parser.add_argument('--method', type=str, default='mean', choices=['mean', 'polyphase'],
+                        help="Resampling method") # resampleの方法
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
     
     #ダストデビルの発生がない時間帯の修正パワースペクトルを描画
     nodevilsollist = nodevil.process_nodevilsollist()
     for sol in tqdm(nodevilsollist, desc="Processing nodevil sols"):
-        plot_focusmovingratio_resample(sol, args.MUTC_h, args.timerange, args.windowsize_FFT, args.windowsize_ratio) 
\ No newline at end of file
+        plot_focusmovingratio_resample(sol, args.MUTC_h, args.timerange, args.windowsize_FFT, args.windowsize_ratio, args.method, args.estimator) 
\ No newline at end of file
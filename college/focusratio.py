@@ -11,7 +11,7 @@ import nearmovingFFT
 import nearratio
 from Dispersion_Relation import Params
 
-def process_focusratio(sol, MUTC_h, timerange, windowsize_FFT):
+def process_focusratio(sol, MUTC_h, timerange, windowsize_FFT, estimator='periodogram'):
     '''
     指定された sol (火星日) における MUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -21,6 +21,7 @@ def process_focusratio(sol, MUTC_h, timerange, windowsize_FFT):
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均を計算する際に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 該当 sol 及び MUTC_h に対応する時系列データの取得
@@ -38,7 +39,7 @@ def process_focusratio(sol, MUTC_h, timerange, windowsize_FFT):
         '''
         
         # FFT によるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(focus_data, windowsize_FFT)
+        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(focus_data, windowsize_FFT, estimator)
         
         # パワースペクトル比の算出
         moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
@@ -49,7 +50,7 @@ def process_focusratio(sol, MUTC_h, timerange, windowsize_FFT):
         print(f"An error occurred: {e}")
         return None
 
-def plot_focusratio(sol, MUTC_h, timerange, windowsize_FFT):
+def plot_focusratio(sol, MUTC_h, timerange, windowsize_FFT, estimator='periodogram'):
     '''
     指定された sol (火星日) における MUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -62,10 +63,11 @@ def plot_focusratio(sol, MUTC_h, timerange, windowsize_FFT):
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
     windowsize_FFT :パワースペクトルの移動平均を計算する際に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # パワースペクトル比の算出
-        moving_fft_x, ratio = process_focusratio(sol, MUTC_h, timerange, windowsize_FFT)
+        moving_fft_x, ratio = process_focusratio(sol, MUTC_h, timerange, windowsize_FFT, estimator)
 
         # 特定の周波数より高周波の情報をNaNに変更
         #moving_fft_x, ratio = nearratio.filter_xUlimit(moving_fft_x, ratio, 0.8)
@@ -106,9 +108,11 @@ if __name__ == "__main__":
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
     parser.add_argument('windowsize_FFT', type=int, 
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
     
     # ダストデビルのない sol のパワースペクトル比を描画
     nodevilsollist = nodevil.process_nodevilsollist()
     for sol in tqdm(nodevilsollist, desc="Processing nodevil sols"):
-        plot_focusratio(sol, args.MUTC_h, args.timerange, args.windowsize_FFT) 
\ No newline at end of file
+        plot_focusratio(sol, args.MUTC_h, args.timerange, args.windowsize_FFT, args.estimator) 
\ No newline at end of file
@@ -0,0 +1,108 @@
+import numpy as np
+from functools import lru_cache
+
+# 既定の対数周波数ビンの数
+N_BINS = 200
+
+@lru_cache(maxsize=None)
+def log_grid(f_min, f_max, n_bins):
+    '''
+    f_min 〜 f_max を対数等間隔に n_bins 個へ分割した周波数ビンの
+    境界と中心 (境界の幾何平均) を返す関数。
+    ※(f_min, f_max, n_bins) ごとにメモリ上へキャッシュされるため、
+    返り値は読み取り専用。
+
+    f_min : 最小の周波数 (Hz) (float, > 0)
+    f_max : 最大の周波数 (Hz) (float)
+    n_bins : ビン数 (int)
+    '''
+    if not 0 < f_min < f_max:
+        raise ValueError("The frequency range must satisfy 0 < f_min < f_max.")
+
+    edges = np.geomspace(f_min, f_max, n_bins + 1)
+    centers = np.sqrt(edges[:-1] * edges[1:])
+    edges.setflags(write=False)
+    centers.setflags(write=False)
+
+    return edges, centers
+
+def common_grid(fft_xlist, n_bins):
+    '''
+    複数のスペクトルの周波数軸を全て覆う、共通の対数周波数ビンを返す関数。
+    ※直流成分 (0 Hz) および NaN は範囲の決定から除く。
+
+    fft_xlist : 各スペクトルの周波数軸 (array) のリスト
+    n_bins : ビン数 (int)
+    '''
+    x = np.concatenate([np.asarray(fft_x, dtype=float) for fft_x in fft_xlist])
+    x = x[np.isfinite(x) & (x > 0)]
+    if len(x) == 0:
+        raise ValueError("No positive frequency available.")
+
+    return log_grid(float(x.min()), float(x.max()), n_bins)
+
+def logbin_stack(fft_xlist, fft_ylist, edges, operation='mean'):
+    '''
+    長さの異なる複数のスペクトルを、共通の周波数ビン (edges) へ再ビン化する関数。
+    全スペクトルを連結し、(スペクトル番号, ビン番号) の切れ目で
+    np.add.reduceat を1回適用するため、スペクトル数によらずループを回さない。
+    返り値は (スペクトル数 × ビン数) の配列で、点を含まないビンは NaN とする。
+
+    fft_xlist : 各スペクトルの周波数軸 (array, 昇順) のリスト
+    fft_ylist : 各スペクトルの強度 (array) のリスト
+    edges : 周波数ビンの境界 (array, 昇順)
+    operation : ビン内の演算 ('mean' : 平均, 'sum' : 総和) (str)
+    '''
+    if operation not in ('mean', 'sum'):
+        raise ValueError(f"Unknown operation: {operation}")
+    n_spectra, n_bins = len(fft_xlist), len(edges) - 1
+    result = np.full((n_spectra, n_bins), np.nan)
+    if n_spectra == 0:
+        return result
+
+    # 全スペクトルの連結と、各点が属するスペクトル番号
+    lengths = [len(fft_x) for fft_x in fft_xlist]
+    x = np.concatenate([np.asarray(fft_x, dtype=float) for fft_x in fft_xlist])
+    y = np.concatenate([np.asarray(fft_y, dtype=float) for fft_y in fft_ylist])
+    if len(x) != len(y):
+        raise ValueError("fft_x and fft_y must have the same length.")
+    spectrum = np.repeat(np.arange(n_spectra), lengths)
+
+    # 各点が属するビン番号 (右端の境界は最後のビンに含める)
+    bins = np.searchsorted(edges, x, side='right') - 1
+    bins[x == edges[-1]] = n_bins - 1
+
+    # 範囲外の点と欠測 (NaN) の除外
+    valid = (bins >= 0) & (bins < n_bins) & np.isfinite(y)
+    if not valid.any():
+        return result
+    key = spectrum[valid] * n_bins + bins[valid]
+    y = y[valid]
+
+    # 昇順の周波数軸であれば既に整列済みだが、念のため安定ソートで揃える
+    if np.any(np.diff(key) < 0):
+        order = np.argsort(key, kind='stable')
+        key, y = key[order], y[order]
+
+    # (スペクトル番号, ビン番号) の切れ目ごとに集計
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    total = np.add.reduceat(y, starts)
+    if operation == 'mean':
+        total = total / np.diff(np.r_[starts, len(key)])
+
+    result.flat[key[starts]] = total
+
+    return result
+
+def logbin(fft_xlist, fft_ylist, n_bins=N_BINS, operation='mean'):
+    '''
+    長さの異なる複数のスペクトルを共通の対数周波数ビンへ再ビン化し、
+    (ビンの中心周波数, スペクトル数 × ビン数 の配列) を返す関数。
+
+    fft_xlist : 各スペクトルの周波数軸 (array, 昇順) のリスト
+    fft_ylist : 各スペクトルの強度 (array) のリスト
+    n_bins : ビン数 (int)
+    operation : ビン内の演算 ('mean' : 平均, 'sum' : 総和) (str)
+    '''
+    edges, centers = common_grid(fft_xlist, n_bins)
+    return centers, logbin_stack(fft_xlist, fft_ylist, edges, operation)
@@ -11,6 +11,8 @@ import neardevil
 import nearFFT
 import meanFFT_sortedseason
 import meanmovingFFT_sorteddP
+import batchFFT
+import eventspectra
 from Dispersion_Relation import Params
 
 def process_IDlist_ATandWs(AT_Llimit, Ws_Ulimit):
@@ -25,7 +27,7 @@ def process_IDlist_ATandWs(AT_Llimit, Ws_Ulimit):
     return filtered_list['ID'].tolist()
 
 
-def process_FFTlist_ATandWs(AT_Llimit, Ws_Ulimit, timerange, interval):
+def process_FFTlist_ATandWs(AT_Llimit, Ws_Ulimit, timerange, interval, estimator='periodogram'):
     '''
     AT-ave>AT_Llimit かつ Ws-ave<Ws_Ulimit を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直前の時系列データにおける気圧残差を求め、
@@ -35,10 +37,11 @@ def process_FFTlist_ATandWs(AT_Llimit, Ws_Ulimit, timerange, interval):
     Ws_Ulimit : 基準となる風速(m/s) (int型)
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
 
     # 記録用配列の作成
-    fft_xlist, fft_ylist = [], []
+    residuallist, sampling_freqlist = [], []
 
     # AT-ave>AT_Llimit かつ Ws-ave<Ws_Ulimit を満たすIDをリスト化
     IDlist = process_IDlist_ATandWs(AT_Llimit, Ws_Ulimit)
@@ -69,20 +72,20 @@ def process_FFTlist_ATandWs(AT_Llimit, Ws_Ulimit, timerange, interval):
             - residual: 気圧の残差
             '''
 
-            # FFT によるパワースペクトルの導出
-            fft_x, fft_y =  nearFFT.FFT(near_devildata)
-
-            # 結果を配列に記録
-            fft_xlist.append(fft_x)
-            fft_ylist.append(fft_y)
+            # 残差とサンプリング周波数を配列に記録 (FFT はループ後に一括で実施)
+            residuallist.append(near_devildata['residual'].values)
+            sampling_freqlist.append(1 / np.mean(np.diff(near_devildata['countdown'])))
             
         except ValueError as e:
             print(e)
             continue 
             
+    # 周波数軸が一致する窓ごとに、パワースペクトルを一括で導出
+    fft_xlist, fft_ylist = batchFFT.FFT_stack(residuallist, sampling_freqlist, estimator)
+
     return fft_xlist, fft_ylist
 
-def plot_meanFFT_ATandWs(AT_Llimit, Ws_Ulimit, timerange, interval):
+def plot_meanFFT_ATandWs(AT_Llimit, Ws_Ulimit, timerange, interval, estimator='periodogram'):
     '''
     AT-ave>AT_Llimit かつ Ws-ave<Ws_Ulimit を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直前の時系列データにおける気圧残差を求め、
@@ -95,10 +98,11 @@ def plot_meanFFT_ATandWs(AT_Llimit, Ws_Ulimit, timerange, interval):
     Ws_Ulimit : 基準となる風速(m/s) (int型)
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 各ケースにおけるパワースペクトルをまとめたリストの導出
-        fft_xlist, fft_ylist = process_FFTlist_ATandWs(AT_Llimit, Ws_Ulimit, timerange, interval)
+        fft_xlist, fft_ylist = process_FFTlist_ATandWs(AT_Llimit, Ws_Ulimit, timerange, interval, estimator)
         
         # パワースペクトルのケース平均を導出
         fft_x = meanmovingFFT_sorteddP.process_arrays(fft_xlist, np.nanmean)
@@ -135,12 +139,154 @@ def plot_meanFFT_ATandWs(AT_Llimit, Ws_Ulimit, timerange, interval):
     except ValueError as e:
         print(f"An error occurred: {e}")
 
+def grid_index(AT, Ws, AT_edges, Ws_edges):
+    '''
+    各ケースの AT-ave, Ws-ave が属する (AT ビン, Ws ビン) を1次元の番号で返す関数。
+    AT ビン i は AT_edges[i] < AT ≦ AT_edges[i+1]、
+    Ws ビン j は Ws_edges[j] ≦ Ws < Ws_edges[j+1] とする。
+    (AT>AT_Llimit かつ Ws<Ws_Ulimit の条件がビンの境界で正確に表せるようにするため)
+    ※範囲外のケースは -1 を返す。
+
+    AT : 各ケースの大気の温度 (K) (array)
+    Ws : 各ケースの風速 (m/s) (array)
+    AT_edges : AT ビンの境界 (array, 昇順)
+    Ws_edges : Ws ビンの境界 (array, 昇順)
+    '''
+    n_AT, n_Ws = len(AT_edges) - 1, len(Ws_edges) - 1
+    i = np.searchsorted(AT_edges, AT, side='left') - 1
+    j = np.searchsorted(Ws_edges, Ws, side='right') - 1
+    inside = (i >= 0) & (i < n_AT) & (j >= 0) & (j < n_Ws)
+    return np.where(inside, i * n_Ws + j, -1)
+
+def cumulative_ATandWs(total, count):
+    '''
+    (AT ビン × Ws ビン × 周波数) の総和と有効件数から、2次元の累積和をとり、
+    全ての閾値 AT>AT_edges[i] かつ Ws<Ws_edges[j] に対する平均スペクトルを返す関数。
+    返り値は ((AT ビン数 + 1) × (Ws ビン数 + 1) × 周波数) の配列で、
+    [i, j] が AT ビン i 以上かつ Ws ビン j 未満のケースの平均 (ケースの無い場合は NaN)。
+
+    total : ビンごとのスペクトルの総和 (ndarray, AT ビン × Ws ビン × 周波数)
+    count : ビンごとの有効件数 (ndarray, AT ビン × Ws ビン × 周波数)
+    '''
+    def prefix(cube):
+        # AT 方向は大きい側から、Ws 方向は小さい側から累積し、端に 0 を付与
+        cube = np.cumsum(cube[::-1], axis=0)[::-1]
+        cube = np.cumsum(cube, axis=1)
+        return np.pad(cube, ((0, 1), (1, 0), (0, 0)))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return prefix(total) / prefix(count)
+
+def process_gridATandWs(timerange, interval, estimator='periodogram', AT_step=5, Ws_step=1):
+    '''
+    全ての ID のパワースペクトルを1度だけ求め、AT-ave を AT_step (K)、Ws-ave を Ws_step (m/s) ごとに区切った
+    (AT ビン × Ws ビン × 周波数) の平均スペクトルとケース数を scatter-add で算出し、
+    さらに2次元の累積和から全ての閾値に対する平均スペクトルを返す関数。
+    返り値は (AT ビンの境界, Ws ビンの境界, 周波数軸, ビンごとの平均, ビンごとのケース数, 閾値ごとの平均, 除外した ID の配列)。
+
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    AT_step : AT ビンの幅 (K) (float)
+    Ws_step : Ws ビンの幅 (m/s) (float)
+    '''
+    # AT-ave, Ws-ave が求まっている全ての ID
+    datacatalog = DATACATALOG.process_datacatalog()
+    datacatalog = datacatalog.dropna(subset=['AT-ave', 'Ws-ave'])
+
+    # 各ケースのパワースペクトル
+    IDs, fft_x, fft_y, dropped = eventspectra.process_eventspectra(datacatalog['ID'].tolist(), timerange, interval, estimator)
+    datacatalog = datacatalog.set_index('ID').loc[IDs]
+    AT, Ws = datacatalog['AT-ave'].values, datacatalog['Ws-ave'].values
+
+    # 全てのケースを含むビンの境界
+    AT_edges = np.arange(np.floor(AT.min() / AT_step) * AT_step - AT_step, AT.max() + AT_step, AT_step)
+    Ws_edges = np.arange(np.floor(Ws.min() / Ws_step) * Ws_step, Ws.max() + 2 * Ws_step, Ws_step)
+    n_AT, n_Ws = len(AT_edges) - 1, len(Ws_edges) - 1
+
+    # (AT ビン × Ws ビン × 周波数) の総和と有効件数
+    group = grid_index(AT, Ws, AT_edges, Ws_edges)
+    total, count, n_cases = eventspectra.group_sum(group, fft_y, n_AT * n_Ws)
+    total = total.reshape(n_AT, n_Ws, -1)
+    count = count.reshape(n_AT, n_Ws, -1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+
+    return AT_edges, Ws_edges, fft_x, mean, n_cases.reshape(n_AT, n_Ws), cumulative_ATandWs(total, count), dropped
+
+def plot_gridATandWs(timerange, interval, estimator='periodogram', AT_step=5, Ws_step=1):
+    '''
+    AT × Ws のグリッドと全ての閾値に対する平均スペクトルを1度に算出し、
+    結果 (npz) と、ビンごとのケース数・閾値ごとの高周波側の平均パワーのプロットを保存する関数。
+
+    - 左図 : ビンごとのケース数 (X軸 : Ws (m/s), Y軸 : AT (K))
+    - 右図 : AT>AT_Llimit かつ Ws<Ws_Ulimit を満たすケースの、
+      音波と重力波の境界より高周波側の平均パワーの常用対数 (X軸 : Ws_Ulimit, Y軸 : AT_Llimit)
+
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    AT_step : AT ビンの幅 (K) (float)
+    Ws_step : Ws ビンの幅 (m/s) (float)
+    '''
+    try:
+        AT_edges, Ws_edges, fft_x, mean, n_cases, cumulative, dropped = process_gridATandWs(timerange, interval, estimator, AT_step, Ws_step)
+
+        # 音波と重力波の境界に該当する周波数
+        params = Params()
+        w = params.border_Hz()
+
+        # 保存の設定
+        output_dir = f'meanFFT_sortedATandWs_{timerange}s'
+        os.makedirs(output_dir, exist_ok=True)
+        np.savez(os.path.join(output_dir, f"grid,AT_step={AT_step},Ws_step={Ws_step}.npz"),
+                 AT_edges=AT_edges, Ws_edges=Ws_edges, fft_x=fft_x, fft_y=mean, n_cases=n_cases,
+                 cumulative_fft_y=cumulative, dropped_ID=dropped)
+
+        # 閾値ごとの高周波側の平均パワー
+        with np.errstate(invalid='ignore', divide='ignore'):
+            band_power = np.log10(np.nanmean(cumulative[..., fft_x > w], axis=-1))
+
+        fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+        mesh = axes[0].pcolormesh(Ws_edges, AT_edges, n_cases, cmap='viridis')
+        fig.colorbar(mesh, ax=axes[0], label='N')
+        axes[0].set_xlabel('Ws [m/s]', fontsize=15)
+        axes[0].set_ylabel('AT [K]', fontsize=15)
+        mesh = axes[1].pcolormesh(Ws_edges, AT_edges, band_power, shading='nearest', cmap='viridis')
+        fig.colorbar(mesh, ax=axes[1], label='log10 Pressure Power [$Pa^2$]')
+        axes[1].set_xlabel('Ws_Ulimit [m/s]', fontsize=15)
+        axes[1].set_ylabel('AT_Llimit [K]', fontsize=15)
+        fig.suptitle(f'MPS_AT×Ws grid, time_range={timerange}(s)', fontsize=15)
+        fig.tight_layout()
+
+        filename = f"grid,AT_step={AT_step},Ws_step={Ws_step}.png"
+        fig.savefig(os.path.join(output_dir, filename))
+        plt.close(fig)
+        print(f"Save completed: {filename}")
+
+        return AT_edges, Ws_edges, fft_x, mean, cumulative
+
+    except ValueError as e:
+        print(f"An error occurred: {e}")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('AT_Ulimit', type=int, 
+    parser.add_argument('AT_Ulimit', type=int, nargs='?',
                         help="Serves as the standard for the upper limit of AT_ave(K)") # AT_aveの上限の指定
-    parser.add_argument('Ws_Llimit', type=int, 
+    parser.add_argument('Ws_Llimit', type=int, nargs='?',
                         help='Serves as the standard for the upper limit of Ws_ave(m/s)') # Ws_aveの下限の指定
     parser.add_argument('timerange', type=int, help='timerang(s)') # り取る時間範囲(秒)
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
+    parser.add_argument('--grid', action='store_true',
+                        help="Compute the full AT x Ws grid and every threshold pair at once") # AT×Wsのグリッドを一括で計算
+    parser.add_argument('--AT_step', type=float, default=5, help="Width of each AT bin(K)") # ATビンの幅(K)
+    parser.add_argument('--Ws_step', type=float, default=1, help="Width of each Ws bin(m/s)") # Wsビンの幅(m/s)
     args = parser.parse_args()
-    plot_meanFFT_ATandWs(args.AT_Ulimit, args.Ws_Llimit, args.timerange, 20)
\ No newline at end of file
+    if args.grid:
+        plot_gridATandWs(args.timerange, 20, args.estimator, args.AT_step, args.Ws_step)
+    elif args.AT_Ulimit is None or args.Ws_Llimit is None:
+        parser.error("AT_Ulimit and Ws_Llimit are required unless --grid is given.")
+    else:
+        plot_meanFFT_ATandWs(args.AT_Ulimit, args.Ws_Llimit, args.timerange, 20, args.estimator)
\ No newline at end of file
@@ -11,6 +11,10 @@ import neardevil
 import nearFFT
 import meanFFT_sortedseason
 import meanmovingFFT_sorteddP
+import batchFFT
+import bootstrap
+import eventspectra
+import parallel
 from Dispersion_Relation import Params
 
 def process_IDlist_dP(dP_Ulimit):
@@ -24,7 +28,7 @@ def process_IDlist_dP(dP_Ulimit):
     filtered_list = datacatalog[datacatalog['dP'] < dP_Ulimit ]
     return filtered_list['ID'].tolist()
 
-def process_FFTlist_dP(dP_Ulimit, timerange, interval):
+def process_FFTlist_dP(dP_Ulimit, timerange, interval, estimator='periodogram', workers=1):
     '''
     dP_Ulimit > dP を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直前の時系列データにおける気圧残差を求め、
@@ -34,53 +38,22 @@ def process_FFTlist_dP(dP_Ulimit, timerange, interval):
     ※dP, dP_Ulimit < 0
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
     '''
-    # 記録用配列の作成
-    fft_xlist, fft_ylist = [], []
-
     # dP_Ulimit > dP を満たすIDをリスト化
     IDlist = process_IDlist_dP(dP_Ulimit)
-    for ID in tqdm(IDlist, desc="Processing IDs"):
-        try:
-            # ID に対応する sol および MUTC を取得
-            sol, MUTC = neardevil.get_sol_MUTC(ID)
-
-            # 該当sol付近の時系列データを取得
-            data = dailychange_p.process_surround_dailydata(sol)
-            if data is None:
-                raise ValueError("Failed to retrieve time-series data.")
-            
-            # MUTC 付近の時系列データを取得
-            near_devildata = neardevil.filter_neardevildata(data, MUTC, timerange, interval)
-            if near_devildata is None or near_devildata.empty:
-                raise ValueError("No data available after filtering.")
-
-            # 0.5秒間隔でresample
-            near_devildata = meanFFT_sortedseason.data_resample(near_devildata, 0.5)
-                
-            # 残差計算を実施
-            near_devildata = nearFFT.calculate_residual(near_devildata)
-            '''
-            追加カラム:
-            - countdown: 経過時間 (秒) (countdown ≦ 0)
-            - p-pred: 線形回帰による気圧予測値 (Pa)
-            - residual: 気圧の残差
-            '''
-
-            # FFT によるパワースペクトルの導出
-            fft_x, fft_y =  nearFFT.FFT(near_devildata)
-
-            # 結果を配列に記録
-            fft_xlist.append(fft_x)
-            fft_ylist.append(fft_y)
-            
-        except ValueError as e:
-            print(e)
-            continue 
+
+    # 各ケースの気圧残差とサンプリング周波数 (取得できないケースは除外、FFT は後で一括して実施)
+    IDs, results = parallel.run_events(eventspectra.process_residual, IDlist, (timerange, interval), workers)
+    residuallist, sampling_freqlist = parallel.unzip(results, 2)
             
+    # 周波数軸が一致する窓ごとに、パワースペクトルを一括で導出
+    fft_xlist, fft_ylist = batchFFT.FFT_stack(residuallist, sampling_freqlist, estimator)
+
     return fft_xlist, fft_ylist
 
-def plot_meanFFT_dP(dP_Ulimit, timerange, interval):
+def plot_meanFFT_dP(dP_Ulimit, timerange, interval, estimator='periodogram', n_boot=0, workers=1):
     '''
     dP_Ulimit > dP を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直前の時系列データにおける気圧残差を求め、
@@ -93,14 +66,21 @@ def plot_meanFFT_dP(dP_Ulimit, timerange, interval):
     ※dP, dP_Ulimit < 0
     time_range:時間間隔(切り出す時間)(秒)(int型)
     interval:ラグ(何秒前から切り出すか)(秒)(int型)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    n_boot : ブートストラップの再標本数 (int) ※0 の場合は信頼区間を描画しない
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
     '''
     try:
         # 各ケースにおけるパワースペクトルをまとめたリストの導出
-        fft_xlist, fft_ylist = process_FFTlist_dP(dP_Ulimit, timerange, interval)
+        fft_xlist, fft_ylist = process_FFTlist_dP(dP_Ulimit, timerange, interval, estimator, workers)
         
         # パワースペクトルのケース平均を導出
         fft_x = meanmovingFFT_sorteddP.process_arrays(fft_xlist, np.nanmean)
         fft_y = meanmovingFFT_sorteddP.process_arrays(fft_ylist, np.nanmean)
+
+        # ブートストラップによる 95% 信頼区間
+        if n_boot > 0:
+            _, lower, upper = bootstrap.bootstrap_arrays(fft_ylist, n_boot)
         
         # 音波と重力波の境界に該当する周波数
         params = Params()
@@ -111,6 +91,8 @@ def plot_meanFFT_dP(dP_Ulimit, timerange, interval):
         plt.yscale('log')
         plt.ylim(1e-6, 1e2)
         plt.plot(fft_x, fft_y, label='FFT')
+        if n_boot > 0:
+            plt.fill_between(fft_x, lower, upper, alpha=0.3, label='95% CI')
         plt.axvline(x=w, color='r', label='border')
         plt.title(f'MPS_dP>{-dP_Ulimit},timerange={timerange}s', fontsize=15)
         plt.xlabel('Vibration Frequency [Hz]', fontsize=15)
@@ -133,10 +115,131 @@ def plot_meanFFT_dP(dP_Ulimit, timerange, interval):
     except ValueError as e:
         print(f"An error occurred: {e}")
 
+def cumulative_mean_dP(dP, fft_y, dP_Ulimitlist):
+    '''
+    各ケースの dP とパワースペクトル (ケース数 × 周波数) から、
+    dP_Ulimitlist の全ての閾値について dP_Ulimit > dP を満たすケースの平均スペクトルを返す関数。
+    ケースを dP の昇順に並べて累積和をとるため、閾値1つあたりの計算量は周波数ビン数に比例する。
+    返り値は (閾値数 × 周波数) の平均スペクトルと、閾値ごとのケース数。
+    ※NaN は周波数ビンごとに除外して平均する。
+
+    dP : 各ケースの気圧降下量 (Pa) (array)
+    fft_y : パワースペクトル (ndarray, ケース数 × 周波数)
+    dP_Ulimitlist : 上限となる気圧降下量 (Pa) のリスト
+    '''
+    dP = np.asarray(dP, dtype=np.float64)
+    fft_y = np.asarray(fft_y, dtype=np.float64)
+
+    # dP の昇順 (気圧降下の大きい順) に並べ替え
+    order = np.argsort(dP, kind='stable')
+    dP, fft_y = dP[order], fft_y[order]
+
+    # ケース方向の累積和 (先頭に 0 を付与)
+    valid = np.isfinite(fft_y)
+    zeros = np.zeros((1, fft_y.shape[1]))
+    cumsum = np.concatenate([zeros, np.cumsum(np.where(valid, fft_y, 0), axis=0)])
+    cumcount = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+
+    # 閾値ごとに dP < dP_Ulimit を満たすケース数を求め、累積和から平均を算出
+    n_cases = np.searchsorted(dP, np.asarray(dP_Ulimitlist, dtype=np.float64), side='left')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = cumsum[n_cases] / cumcount[n_cases]
+
+    return mean, n_cases
+
+def process_sweep_dP(dP_Ulimit, timerange, interval, estimator='periodogram', step=1, workers=1):
+    '''
+    dP_Ulimit > dP を満たす全ての ID のパワースペクトルを1度だけ求め、
+    dP_Ulimit から step ずつ厳しくした全ての閾値について、ケース平均のスペクトルを返す関数。
+    返り値は (閾値のリスト, 周波数軸, 閾値数 × 周波数 の平均スペクトル, 閾値ごとのケース数, 除外した ID の配列)。
+
+    dP_Ulimit : 最も緩い上限となる気圧降下量(Pa) (int)
+    ※dP, dP_Ulimit < 0
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    step : 閾値の間隔 (Pa) (int)
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
+    '''
+    # 各ケースのパワースペクトルと dP
+    IDs, fft_x, fft_y, dropped = eventspectra.process_eventspectra(process_IDlist_dP(dP_Ulimit), timerange, interval, estimator, workers)
+    datacatalog = DATACATALOG.process_datacatalog()
+    dP = datacatalog.set_index('ID').loc[IDs, 'dP'].values
+
+    # 少なくとも1件を含む全ての閾値
+    dP_Ulimitlist = np.arange(dP_Ulimit, np.floor(dP.min()), -step)
+
+    mean, n_cases = cumulative_mean_dP(dP, fft_y, dP_Ulimitlist)
+
+    return dP_Ulimitlist, fft_x, mean, n_cases, dropped
+
+def plot_sweep_dP(dP_Ulimit, timerange, interval, estimator='periodogram', step=1, workers=1):
+    '''
+    dP_Ulimit から step ずつ厳しくした全ての閾値について、
+    ケース平均のパワースペクトルを1度に算出し、結果 (npz) とプロットを保存する関数。
+
+    - X軸 : 振動数 (Hz)
+    - Y軸 : 上限となる気圧降下量 (Pa) の絶対値
+    - 色 : スペクトル強度の常用対数 (Pa^2)
+
+    dP_Ulimit : 最も緩い上限となる気圧降下量(Pa) (int)
+    ※dP, dP_Ulimit < 0
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    step : 閾値の間隔 (Pa) (int)
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
+    '''
+    try:
+        dP_Ulimitlist, fft_x, mean, n_cases, dropped = process_sweep_dP(dP_Ulimit, timerange, interval, estimator, step, workers)
+
+        # 音波と重力波の境界に該当する周波数
+        params = Params()
+        w = params.border_Hz()
+
+        # 保存の設定
+        output_dir = f'sweepFFT_dP_{timerange}s'
+        os.makedirs(output_dir, exist_ok=True)
+        np.savez(os.path.join(output_dir, f"dP is More {-dP_Ulimit}.npz"),
+                 dP_Ulimit=dP_Ulimitlist, fft_x=fft_x, fft_y=mean, n_cases=n_cases, dropped_ID=dropped)
+
+        # プロットの設定 (直流成分は除く)
+        plt.pcolormesh(fft_x[1:], -dP_Ulimitlist, np.log10(mean[:, 1:]), shading='nearest', cmap='viridis')
+        plt.colorbar(label='log10 Pressure Power [$Pa^2$]')
+        plt.xscale('log')
+        plt.axvline(x=w, color='r', label='border')
+        plt.title(f'MPS_dP>{-dP_Ulimit},timerange={timerange}s', fontsize=15)
+        plt.xlabel('Vibration Frequency [Hz]', fontsize=15)
+        plt.ylabel('dP threshold [Pa]', fontsize=15)
+        plt.legend(fontsize=15)
+        plt.tight_layout()
+
+        filename = f"dP is More {-dP_Ulimit}.png"
+        plt.savefig(os.path.join(output_dir, filename))
+        plt.clf()
+        plt.close()
+        print(f"Save completed: {filename}")
+
+        return dP_Ulimitlist, fft_x, mean
+
+    except ValueError as e:
+        print(f"An error occurred: {e}")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser() 
     parser.add_argument('dP_Ulimit', type=int, 
                         help="Serves as the standard for the upper limit of dP_ave(Negative int)") # dPの上限の指定(負)
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
+    parser.add_argument('--n_boot', type=int, default=0,
+                        help="Number of bootstrap resamples for the confidence band") # ブートストラップの再標本数
+    parser.add_argument('--sweep', action='store_true',
+                        help="Compute the mean spectrum for every threshold up to dP_Ulimit") # 全ての閾値を一括で計算
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes") # 並列に実行するプロセス数
     args = parser.parse_args()
-    plot_meanFFT_dP(args.dP_Ulimit, args.timerange, 20)
+    if args.sweep:
+        plot_sweep_dP(args.dP_Ulimit, args.timerange, 20, args.estimator, workers=args.workers)
+    else:
+        plot_meanFFT_dP(args.dP_Ulimit, args.timerange, 20, args.estimator, args.n_boot, args.workers)
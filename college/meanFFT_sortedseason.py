@@ -11,6 +11,9 @@ import dailychange_p
 import neardevil
 import nearFFT
 import meanmovingFFT_sorteddP
+import polyphase
+import batchFFT
+import eventspectra
 from Dispersion_Relation import Params
 
 def process_IDlist_ls(ls):
@@ -30,13 +33,20 @@ def process_IDlist_ls(ls):
 
     return filtered_list['ID'].tolist(), pseudo_ls
 
-def data_resample(data, s):
+def data_resample(data, s, method='mean'):
     '''
     与えられた時系列データをs秒間隔でresampleする関数
 
     data : フィルタリング済みの時系列データ(DataFrame)
     s : 秒(int)
+    method : resample の方法 (str)
+        'mean' : s秒ごとの区間平均
+        'polyphase' : polyphase FIR フィルターによるアンチエイリアス付きの間引き
     '''
+    if method == 'polyphase':
+        return polyphase.data_decimate(data, s)
+    if method != 'mean':
+        raise ValueError(f"Unknown resample method: {method}")
 
     new_data = data.copy()
 
@@ -77,7 +87,7 @@ def process_arrays(arrays, operation):
     return [operation(values) for values in zip(*trimmed_arrays)]
 '''
 
-def process_FFTlist_season(ls, timerange, interval):
+def process_FFTlist_season(ls, timerange, interval, estimator='periodogram'):
     '''
     疑似的な ls が一致している全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直前の時系列データにおける気圧残差を求め、
@@ -86,9 +96,10 @@ def process_FFTlist_season(ls, timerange, interval):
     ls : 季節を表す指標 (int)
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     # 記録用配列の作成
-    fft_xlist, fft_ylist = [], []
+    residuallist, sampling_freqlist = [], []
 
     # 疑似的なlsが一致するIDをリスト化
     IDlist, LS = process_IDlist_ls(ls)
@@ -119,20 +130,20 @@ def process_FFTlist_season(ls, timerange, interval):
             - residual: 気圧の残差
             '''
 
-            # FFT によるパワースペクトルの導出
-            fft_x, fft_y =  nearFFT.FFT(near_devildata)
-
-            # 結果を配列に記録
-            fft_xlist.append(fft_x)
-            fft_ylist.append(fft_y)
+            # 残差とサンプリング周波数を配列に記録 (FFT はループ後に一括で実施)
+            residuallist.append(near_devildata['residual'].values)
+            sampling_freqlist.append(1 / np.mean(np.diff(near_devildata['countdown'])))
             
         except ValueError as e:
             print(e)
             continue 
             
+    # 周波数軸が一致する窓ごとに、パワースペクトルを一括で導出
+    fft_xlist, fft_ylist = batchFFT.FFT_stack(residuallist, sampling_freqlist, estimator)
+
     return fft_xlist, fft_ylist, LS
 
-def plot_meanFFT_season(ls, timerange, interval):
+def plot_meanFFT_season(ls, timerange, interval, estimator='periodogram'):
     '''
     疑似的な ls が一致している全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直前の時系列データにおける気圧残差を求め、
@@ -144,10 +155,11 @@ def plot_meanFFT_season(ls, timerange, interval):
     ls : 季節を表す指標 (int)
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 各ケースにおけるパワースペクトルをまとめたリストの導出
-        fft_xlist, fft_ylist, LS = process_FFTlist_season(ls, timerange, interval)
+        fft_xlist, fft_ylist, LS = process_FFTlist_season(ls, timerange, interval, estimator)
         
         # パワースペクトルのケース平均を算出
         fft_x = meanmovingFFT_sorteddP.process_arrays(fft_xlist, np.nanmean)
@@ -184,9 +196,106 @@ def plot_meanFFT_season(ls, timerange, interval):
     except ValueError as e:
         print(f"An error occurred: {e}")
 
+def process_allseasons(timerange, interval, estimator='periodogram', width=30):
+    '''
+    全ての ID のパワースペクトルを1度だけ求め、疑似的な ls を width 度ごとに区切った
+    全ての季節について、ケース平均のスペクトルを一括で (scatter-add により) 算出する関数。
+    返り値は (各季節の ls の下限, 周波数軸, 季節数 × 周波数 の平均スペクトル, 季節ごとのケース数, 除外した ID の配列)。
+    ※datacatalog の ls は 30 度刻みの疑似的な値のため、width は 30 の倍数とする。
+
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    width : 季節の区切りの幅 (度) (int)
+    '''
+    if width <= 0 or width % 30 != 0 or 360 % width != 0:
+        raise ValueError("width must be a multiple of 30 that divides 360.")
+
+    # ls が求まっている全ての ID
+    datacatalog = DATACATALOG.process_datacatalog()
+    datacatalog = datacatalog.dropna(subset=['ls'])
+
+    # 各ケースのパワースペクトル
+    IDs, fft_x, fft_y, dropped = eventspectra.process_eventspectra(datacatalog['ID'].tolist(), timerange, interval, estimator)
+
+    # 各ケースが属する季節の番号
+    ls = datacatalog.set_index('ID').loc[IDs, 'ls'].values.astype(int)
+    group = (ls % 360) // width
+
+    # 全ての季節の平均スペクトルを一括で算出
+    mean, n_cases = eventspectra.group_mean(group, fft_y, 360 // width)
+
+    return np.arange(0, 360, width), fft_x, mean, n_cases, dropped
+
+def plot_allseasons(timerange, interval, estimator='periodogram', width=30):
+    '''
+    全ての季節のケース平均のパワースペクトルを1度に算出し、
+    結果 (npz) と季節ごとのパネルを並べたプロットを保存する関数。
+
+    - X軸 : 振動数 (Hz)
+    - Y軸 : スペクトル強度 (Pa^2)
+
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    width : 季節の区切りの幅 (度) (int)
+    '''
+    try:
+        LSlist, fft_x, mean, n_cases, dropped = process_allseasons(timerange, interval, estimator, width)
+
+        # 音波と重力波の境界に該当する周波数
+        params = Params()
+        w = params.border_Hz()
+
+        # 保存の設定
+        output_dir = f'meanFFT_sortedseason_{timerange}s'
+        os.makedirs(output_dir, exist_ok=True)
+        np.savez(os.path.join(output_dir, f"all seasons,width={width}.npz"),
+                 ls=LSlist, fft_x=fft_x, fft_y=mean, n_cases=n_cases, dropped_ID=dropped)
+
+        # 季節ごとのパネルを作成
+        n_cols = min(4, len(LSlist))
+        n_rows = int(np.ceil(len(LSlist) / n_cols))
+        fig, axes = plt.subplots(n_rows, n_cols, figsize=(4 * n_cols, 3 * n_rows), sharex=True, sharey=True, squeeze=False)
+        for ax, LS, fft_y, n in zip(axes.flat, LSlist, mean, n_cases):
+            ax.set_xscale('log')
+            ax.set_yscale('log')
+            ax.set_ylim(1e-6, 1e2)
+            if n > 0:
+                ax.plot(fft_x, fft_y, label='FFT')
+            ax.axvline(x=w, color='r', label='border')
+            ax.set_title(f'{LS}≦ ls <{LS+width} (N={n})', fontsize=12)
+            ax.grid(True)
+        for ax in axes.flat[len(LSlist):]:
+            ax.set_visible(False)
+        fig.supxlabel('Vibration Frequency [Hz]', fontsize=15)
+        fig.supylabel('Pressure Power [$Pa^2$]', fontsize=15)
+        fig.suptitle(f'MPS_all seasons,time_range={timerange}s', fontsize=15)
+        fig.tight_layout()
+
+        filename = f"all seasons,width={width}.png"
+        fig.savefig(os.path.join(output_dir, filename))
+        plt.close(fig)
+        print(f"Save completed: {filename}")
+
+        return LSlist, fft_x, mean
+
+    except ValueError as e:
+        print(f"An error occurred: {e}")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('ls', type=int, help="ls(season)") # 疑似的なlsの指定
+    parser.add_argument('ls', type=int, nargs='?', default=None, help="ls(season)") # 疑似的なlsの指定 (--all_seasons の場合は不要)
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
+    parser.add_argument('--all_seasons', action='store_true',
+                        help="Compute every season at once") # 全ての季節を一括で計算
+    parser.add_argument('--width', type=int, default=30, help="Width of each season bin(deg)") # 季節の区切りの幅(度)
     args = parser.parse_args()
-    plot_meanFFT_season(args.ls, args.timerange, 20)
\ No newline at end of file
+    if not args.all_seasons and args.ls is None:
+        parser.error("ls is required unless --all_seasons is given.")
+    if args.all_seasons:
+        plot_allseasons(args.timerange, 20, args.estimator, args.width)
+    else:
+        plot_meanFFT_season(args.ls, args.timerange, 20, args.estimator)
\ No newline at end of file
@@ -12,9 +12,10 @@ import afterFFT
 import meanFFT_sorteddP
 import meanFFT_sortedseason
 import meanmovingFFT_sorteddP
+import batchFFT
 from Dispersion_Relation import Params
 
-def process_afterFFTlist_dP(dP_Ulimit, timerange, interval):
+def process_afterFFTlist_dP(dP_Ulimit, timerange, interval, estimator='periodogram'):
     '''
     dP_Ulimit > dP を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直後の時系列データにおける気圧残差を求め、
@@ -24,9 +25,10 @@ def process_afterFFTlist_dP(dP_Ulimit, timerange, interval):
     ※dP, dP_Ulimit < 0
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     # 記録用配列の作成
-    fft_xlist, fft_ylist = [], []
+    residuallist, sampling_freqlist = [], []
 
     # dP_Ulimit > dP を満たすIDをリスト化
     IDlist = meanFFT_sorteddP.process_IDlist_dP(dP_Ulimit)
@@ -57,20 +59,20 @@ def process_afterFFTlist_dP(dP_Ulimit, timerange, interval):
             - residual: 気圧の残差
             '''
         
-            # FFT によるパワースペクトルの導出
-            fft_x, fft_y = afterFFT.after_FFT(after_devildata)
-
-            # 結果を配列に記録
-            fft_xlist.append(fft_x)
-            fft_ylist.append(fft_y)
+            # 残差とサンプリング周波数を配列に記録 (FFT はループ後に一括で実施)
+            residuallist.append(after_devildata['residual'].values)
+            sampling_freqlist.append(1 / np.mean(np.diff(after_devildata['timecount'])))
             
         except ValueError as e:
             print(e)
             continue 
             
+    # 周波数軸が一致する窓ごとに、パワースペクトルを一括で導出
+    fft_xlist, fft_ylist = batchFFT.FFT_stack(residuallist, sampling_freqlist, estimator)
+
     return fft_xlist, fft_ylist
 
-def plot_meanafterFFT_dP(dP_Ulimit, timerange, interval):
+def plot_meanafterFFT_dP(dP_Ulimit, timerange, interval, estimator='periodogram'):
     '''
     dP_Ulimit > dP を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直後の時系列データにおける気圧残差を求め、
@@ -83,10 +85,11 @@ def plot_meanafterFFT_dP(dP_Ulimit, timerange, interval):
     ※dP, dP_Ulimit < 0
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 各ケースにおけるパワースペクトルをまとめたリストの導出
-        fft_xlist, fft_ylist = process_afterFFTlist_dP(dP_Ulimit, timerange, interval)
+        fft_xlist, fft_ylist = process_afterFFTlist_dP(dP_Ulimit, timerange, interval, estimator)
         
         # パワースペクトルのケース平均を導出
         fft_x = meanmovingFFT_sorteddP.process_arrays(fft_xlist, np.nanmean)
@@ -128,5 +131,7 @@ if __name__ == "__main__":
     parser.add_argument('dP_Ulimit', type=int, 
                         help="Serves as the standard for the upper limit of dP_ave(Negative int)") # dPの上限の指定(負)
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_meanafterFFT_dP(args.dP_Ulimit, args.timerange, 20)
+    plot_meanafterFFT_dP(args.dP_Ulimit, args.timerange, 20, args.estimator)
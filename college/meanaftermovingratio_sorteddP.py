@@ -17,7 +17,7 @@ import meanFFT_sorteddP
 import meanmovingFFT_sorteddP
 from Dispersion_Relation import Params
 
-def process_aftermovingratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio):
+def process_aftermovingratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データにおける気圧残差を求め、
@@ -29,6 +29,7 @@ def process_aftermovingratiolist_dP(dP_Ulimit, timerange, interval, windowsize_F
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     # 記録用配列の作成
     moving_fft_xlist, moving_ratiolist = [], []
@@ -63,7 +64,7 @@ def process_aftermovingratiolist_dP(dP_Ulimit, timerange, interval, windowsize_F
             '''
                 
             # FFT によるパワースペクトルとその移動平均の導出
-            fft_x, fft_y, moving_fft_x, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT)      
+            fft_x, fft_y, moving_fft_x, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT, estimator)      
             
             # パワースペクトル比の算出
             moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
@@ -81,7 +82,7 @@ def process_aftermovingratiolist_dP(dP_Ulimit, timerange, interval, windowsize_F
             
     return moving_fft_xlist, moving_ratiolist
 
-def plot_meanaftermovingratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio):
+def plot_meanaftermovingratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
     '''
     dP_Ulimit > dP を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直後の時系列データにおける気圧残差を求め、
@@ -96,11 +97,12 @@ def plot_meanaftermovingratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT,
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
 
     try:
         # 各ケースにおける修正パワースペクトルをまとめたリストの導出
-        moving_fft_xlist, moving_ratiolist = process_aftermovingratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio)
+        moving_fft_xlist, moving_ratiolist = process_aftermovingratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator)
         
         # 修正パワースペクトルのケース平均の導出
         moving_fft_x = meanmovingFFT_sorteddP.process_arrays(moving_fft_xlist, np.nanmean)
@@ -148,5 +150,7 @@ if __name__ == "__main__":
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
     parser.add_argument('windowsize_ratio', type=int, 
                         help="The [windowsize] used to calculate the moving average of ratio") # パワースペクトル比のの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_meanaftermovingratio_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio)
+    plot_meanaftermovingratio_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio, args.estimator)
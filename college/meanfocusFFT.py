@@ -9,9 +9,13 @@ from tqdm import tqdm
 import nearFFT
 import meanFFT_sortedseason
 import meanmovingFFT_sorteddP
+import batchFFT
+import ensemble
+import backgroundlibrary
+import spectrogram_cube
 from Dispersion_Relation import Params
 
-def process_focusFFTlist(MUTC_h, timerange):
+def process_focusFFTlist(MUTC_h, timerange, estimator='periodogram'):
     '''
     ダストデビルの発生がない sol (火星日)におけるMUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -19,9 +23,10 @@ def process_focusFFTlist(MUTC_h, timerange):
 
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     # 記録用配列の作成
-    fft_xlist, fft_ylist = [], []
+    residuallist, sampling_freqlist = [], []
 
     # ダストデビルの発生がない sol のリストを作成
     nodevilsollist = nodevil.process_nodevilsollist() 
@@ -50,16 +55,184 @@ def process_focusFFTlist(MUTC_h, timerange):
         - residual: 気圧の残差
         '''
         
-        # FFT によるパワースペクトルの導出
-        fft_x, fft_y = nearFFT.FFT(focus_data)
-
-        # 結果を配列に記録
-        fft_xlist.append(fft_x)
-        fft_ylist.append(fft_y)
+        # 残差とサンプリング周波数を配列に記録 (FFT はループ後に一括で実施)
+        residuallist.append(focus_data['residual'].values)
+        sampling_freqlist.append(1 / np.mean(np.diff(focus_data['countdown'])))
             
+    # 周波数軸が一致する窓ごとに、パワースペクトルを一括で導出
+    fft_xlist, fft_ylist = batchFFT.FFT_stack(residuallist, sampling_freqlist, estimator)
+
     return fft_xlist, fft_ylist
 
-def plot_meanfocusFFT(MUTC_h, timerange):
+def process_allhours(timerange, MUTC_hlist=range(24), estimator='periodogram'):
+    '''
+    ダストデビルの発生がない sol (火星日)の時系列データを1度だけ読み込み、
+    MUTC_hlist の全ての時刻について直後の気圧残差のパワースペクトルを求め、
+    時刻ごとの集計 (SpectrumAccumulator) で逐次平均する関数。
+    返り値は (時刻の配列, 周波数軸, 時刻数 × 周波数 の平均スペクトル, 時刻ごとのケース数)。
+    ※周波数軸が最初のスペクトルと異なる窓は除く。
+
+    timerange : 切り取る時間範囲 (秒) (int)
+    MUTC_hlist : 火星地方時のリスト (0 ≦ MUTC_h < 24)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    '''
+    MUTC_hlist = np.asarray(list(MUTC_hlist), dtype=np.float64)
+
+    # 時刻ごとの集計 (最初のスペクトルが得られた時点で周波数軸をそろえて作成)
+    accumulators, n_skipped = None, 0
+
+    # ダストデビルの発生がない sol のリストを作成
+    nodevilsollist = nodevil.process_nodevilsollist()
+
+    for sol in tqdm(nodevilsollist, desc="Processing nodevil sol"):
+
+        # 該当 sol に対応する時系列データの取得 (全ての時刻で共有)
+        data = dailychange_p.process_surround_dailydata(sol)
+        if data is None or data.empty:
+            continue
+
+        # 全ての時刻の時系列データをまとめて切り出し
+        hourlist, residuallist, sampling_freqlist = [], [], []
+        for i, focus_data in enumerate(focuschange_p.filter_focuswindows(data, sol, MUTC_hlist, timerange)):
+            if focus_data.empty:
+                continue
+
+            # 0.5秒間隔でresampleし、残差計算を実施
+            focus_data = meanFFT_sortedseason.data_resample(focus_data, 0.5)
+            focus_data = nearFFT.calculate_residual(focus_data)
+
+            hourlist.append(i)
+            residuallist.append(focus_data['residual'].values)
+            sampling_freqlist.append(1 / np.mean(np.diff(focus_data['countdown'])))
+
+        if not residuallist:
+            continue
+
+        # 該当 sol の全ての時刻のパワースペクトルを一括で導出し、時刻ごとの集計に加える
+        fft_xlist, fft_ylist = batchFFT.FFT_stack(residuallist, sampling_freqlist, estimator)
+        if accumulators is None:
+            accumulators = [ensemble.SpectrumAccumulator(fft_xlist[0]) for _ in MUTC_hlist]
+        for i, fft_x, fft_y in zip(hourlist, fft_xlist, fft_ylist):
+            try:
+                accumulators[i].add(fft_y, fft_x)
+            except ValueError:
+                n_skipped += 1
+
+    if accumulators is None:
+        raise ValueError("No spectrum available.")
+    if n_skipped:
+        print(f"Skipped {n_skipped} spectra with a different frequency axis.")
+
+    mean = np.array([accumulator.mean for accumulator in accumulators])
+    n_cases = np.array([accumulator.n_cases for accumulator in accumulators])
+
+    return MUTC_hlist, accumulators[0].fft_x, mean, n_cases
+
+def process_focusFFTlibrary(MUTC_h, timerange, estimator='periodogram', file_path=None):
+    '''
+    作成済みの背景スペクトルライブラリ (backgroundlibrary) から、
+    ダストデビルの発生がない sol における MUTC_h (地方時) 直後の
+    パワースペクトルを選び、ケース平均を返す関数。
+
+    MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    file_path : ライブラリのパス ※None の場合は backgroundlibrary.library_path
+    '''
+    if file_path is None:
+        file_path = backgroundlibrary.library_path(timerange, estimator)
+    if not os.path.exists(file_path):
+        raise ValueError(f"Background library not found: {file_path}")
+    library = backgroundlibrary.BackgroundLibrary.load(file_path)
+
+    # ダストデビルの発生がない sol 及び MUTC_h の窓を選択
+    selected = library.select(sol=nodevil.process_nodevilsollist(), MUTC_h=MUTC_h)
+    fft_y, n_cases = library.mean(selected)
+
+    return library.fft_x, fft_y
+
+def process_focusFFTcube(MUTC_h, timerange, cube_dir=spectrogram_cube.CUBE_DIR):
+    '''
+    作成済みのスペクトログラムキューブ (spectrogram_cube) から、
+    ダストデビルの発生がない sol における MUTC_h (地方時) 直後の timerange 秒間に含まれる
+    区間のスペクトルを集め、ケース平均を返す関数。
+    ※周波数分解能はキューブの区間の長さ (segment) で決まるため、timerange の窓全体の FFT とは異なる。
+
+    MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    cube_dir : キューブの保存先のディレクトリ
+    '''
+    if not os.path.exists(os.path.join(cube_dir, 'index.npz')):
+        raise ValueError(f"Spectrogram cube not found: {cube_dir}")
+    cube = spectrogram_cube.SpectrogramCube(cube_dir)
+    if cube.segment > timerange:
+        raise ValueError(f"The cube segment ({cube.segment}s) is longer than timerange ({timerange}s).")
+
+    # ダストデビルの発生がない sol の窓に含まれる区間を集計
+    accumulator = ensemble.SpectrumAccumulator(cube.fft_x)
+    for sol in nodevil.process_nodevilsollist():
+        _, spectra = cube.focus(sol, MUTC_h, timerange)
+        if len(spectra):
+            accumulator.add_batch(spectra)
+
+    if accumulator.n_cases == 0:
+        raise ValueError("No spectrum available.")
+
+    return cube.fft_x, accumulator.mean
+
+def plot_allhours(timerange, MUTC_hlist=range(24), estimator='periodogram'):
+    '''
+    ダストデビルの発生がない sol (火星日)における全ての時刻のケース平均のパワースペクトルを
+    1度に算出し、結果 (npz) と (時刻 × 振動数) のカラーマップを保存する関数。
+
+    - X軸 : 振動数 (Hz)
+    - Y軸 : 火星地方時 (h)
+    - 色 : スペクトル強度 (Pa^2)
+
+    timerange : 切り取る時間範囲 (秒) (int)
+    MUTC_hlist : 火星地方時のリスト (0 ≦ MUTC_h < 24)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    '''
+    try:
+        MUTC_hlist, fft_x, mean, n_cases = process_allhours(timerange, MUTC_hlist, estimator)
+
+        # 音波と重力波の境界に該当する周波数
+        params = Params()
+        w = params.border_Hz()
+
+        # 保存の設定
+        output_dir = 'meanfocusFFT_all hours'
+        os.makedirs(output_dir, exist_ok=True)
+        np.savez(os.path.join(output_dir, f"{timerange}s.npz"),
+                 MUTC_h=MUTC_hlist, fft_x=fft_x, fft_y=mean, n_cases=n_cases)
+
+        # 直流成分を除いた (時刻 × 振動数) のカラーマップ
+        fig, ax = plt.subplots(figsize=(10, 6))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mesh = ax.pcolormesh(fft_x[1:], np.arange(len(MUTC_hlist)), np.log10(mean[:, 1:]),
+                                 shading='nearest', vmin=-6, vmax=2)
+        ax.set_xscale('log')
+        ax.set_yticks(np.arange(len(MUTC_hlist)))
+        ax.set_yticklabels([f'{h:g} (N={n})' for h, n in zip(MUTC_hlist, n_cases)], fontsize=8)
+        ax.axvline(x=w, color='r', label='border')
+        ax.set_title(f'MPS_all hours~{timerange}s', fontsize=15)
+        ax.set_xlabel('Vibration Frequency [Hz]', fontsize=15)
+        ax.set_ylabel('MUTC [h]', fontsize=15)
+        ax.legend(fontsize=12)
+        fig.colorbar(mesh, ax=ax, label='log10 Pressure Power [$Pa^2$]')
+        fig.tight_layout()
+
+        filename = f"{timerange}s.png"
+        fig.savefig(os.path.join(output_dir, filename))
+        plt.close(fig)
+        print(f"Save completed: {filename}")
+
+        return MUTC_hlist, fft_x, mean
+
+    except ValueError as e:
+        print(f"An error occurred: {e}")
+
+def plot_meanfocusFFT(MUTC_h, timerange, estimator='periodogram', library=False, cube_dir=None):
     '''
     ダストデビルの発生がない sol (火星日)におけるMUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -70,14 +243,24 @@ def plot_meanfocusFFT(MUTC_h, timerange):
 
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    library : True の場合は背景スペクトルライブラリから平均を求める (bool)
+    cube_dir : 指定した場合はスペクトログラムキューブから平均を求める ※estimator は用いない
     '''
     try:
-        # 各ケースにおけるパワースペクトルをまとめたリストを導出
-        fft_xlist, fft_ylist = process_focusFFTlist(MUTC_h, timerange)
-        
-        # パワースペクトルのケース平均を導出
-        fft_x = meanmovingFFT_sorteddP.process_arrays(fft_xlist, np.nanmean)
-        fft_y = meanmovingFFT_sorteddP.process_arrays(fft_ylist, np.nanmean)
+        if cube_dir is not None:
+            # スペクトログラムキューブからケース平均を導出
+            fft_x, fft_y = process_focusFFTcube(MUTC_h, timerange, cube_dir)
+        elif library:
+            # 背景スペクトルライブラリからケース平均を導出
+            fft_x, fft_y = process_focusFFTlibrary(MUTC_h, timerange, estimator)
+        else:
+            # 各ケースにおけるパワースペクトルをまとめたリストを導出
+            fft_xlist, fft_ylist = process_focusFFTlist(MUTC_h, timerange, estimator)
+
+            # パワースペクトルのケース平均を導出
+            fft_x = meanmovingFFT_sorteddP.process_arrays(fft_xlist, np.nanmean)
+            fft_y = meanmovingFFT_sorteddP.process_arrays(fft_ylist, np.nanmean)
         
         # 音波と重力波の境界に該当する周波数
         params = Params()
@@ -112,7 +295,22 @@ def plot_meanfocusFFT(MUTC_h, timerange):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser() 
-    parser.add_argument('MUTC_h', type=int, help='Base start time') # MUTC_h (火星地方時)の指定
+    parser.add_argument('MUTC_h', type=int, nargs='?', default=None, help='Base start time') # MUTC_h (火星地方時)の指定
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
+    parser.add_argument('--all_hours', action='store_true',
+                        help="Compute every start time at once") # 全ての時刻を一括で計算
+    parser.add_argument('--hours', type=float, nargs='+', default=list(range(24)),
+                        help="Start times for --all_hours") # --all_hours で用いる時刻のリスト
+    parser.add_argument('--library', action='store_true',
+                        help="Use the precomputed background library") # 背景スペクトルライブラリを使用
+    parser.add_argument('--cube_dir', type=str, default=None,
+                        help="Use the precomputed spectrogram cube in this directory") # スペクトログラムキューブを使用
     args = parser.parse_args()
-    plot_meanfocusFFT(args.MUTC_h, args.timerange)
\ No newline at end of file
+    if args.all_hours:
+        plot_allhours(args.timerange, args.hours, args.estimator)
+    elif args.MUTC_h is None:
+        parser.error("MUTC_h is required unless --all_hours is given.")
+    else:
+        plot_meanfocusFFT(args.MUTC_h, args.timerange, args.estimator, args.library, args.cube_dir)
\ No newline at end of file
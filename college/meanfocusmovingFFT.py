@@ -12,7 +12,7 @@ import meanFFT_sortedseason
 import meanmovingFFT_sorteddP
 from Dispersion_Relation import Params
 
-def process_focusmovingFFTlist(MUTC_h, timerange, windowsize_FFT):
+def process_focusmovingFFTlist(MUTC_h, timerange, windowsize_FFT, estimator='periodogram'):
     '''
     ダストデビルの発生がない sol (火星日)におけるMUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -21,6 +21,7 @@ def process_focusmovingFFTlist(MUTC_h, timerange, windowsize_FFT):
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     # 記録用配列の作成    
     fft_xlist, fft_ylist = [], []
@@ -53,7 +54,7 @@ def process_focusmovingFFTlist(MUTC_h, timerange, windowsize_FFT):
         '''
 
         # FFT によるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(focus_data, windowsize_FFT)
+        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(focus_data, windowsize_FFT, estimator)
 
         # 結果を配列に記録
         fft_xlist.append(fft_x)
@@ -64,7 +65,7 @@ def process_focusmovingFFTlist(MUTC_h, timerange, windowsize_FFT):
     return fft_xlist, fft_ylist, moving_fft_xlist, moving_fft_ylist
             
 
-def plot_meanfocusmovingFFT(MUTC_h, timerange, windowsize_FFT):
+def plot_meanfocusmovingFFT(MUTC_h, timerange, windowsize_FFT, estimator='periodogram'):
     '''
     ダストデビルの発生がない sol (火星日)におけるMUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -76,10 +77,11 @@ def plot_meanfocusmovingFFT(MUTC_h, timerange, windowsize_FFT):
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 各ケースにおけるパワースペクトルとその移動平均をまとめたリストを導出
-        fft_xlist, fft_ylist, moving_fft_xlist, moving_fft_ylist = process_focusmovingFFTlist(MUTC_h, timerange, windowsize_FFT)
+        fft_xlist, fft_ylist, moving_fft_xlist, moving_fft_ylist = process_focusmovingFFTlist(MUTC_h, timerange, windowsize_FFT, estimator)
         
         # パワースペクトルとその移動平均のケース平均の導出
         fft_x = meanmovingFFT_sorteddP.process_arrays(fft_xlist, np.nanmean)
@@ -124,5 +126,7 @@ if __name__ == "__main__":
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
     parser.add_argument('windowsize_FFT', type=int, 
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_meanfocusmovingFFT(args.MUTC_h, args.timerange, args.windowsize_FFT)
\ No newline at end of file
+    plot_meanfocusmovingFFT(args.MUTC_h, args.timerange, args.windowsize_FFT, args.estimator)
\ No newline at end of file
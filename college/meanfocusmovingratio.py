@@ -14,7 +14,7 @@ import meanFFT_sortedseason
 import meanmovingFFT_sorteddP
 from Dispersion_Relation import Params
 
-def process_focusmovingratiolist(MUTC_h, timerange, windowsize_FFT, windowsize_ratio):
+def process_focusmovingratiolist(MUTC_h, timerange, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
     '''
     ダストデビルが1つも発生していない火星日のうち、
     MUTC_h(時刻)からtimerange秒間に対応する気圧の時系列データを全て加工し、
@@ -26,6 +26,7 @@ def process_focusmovingratiolist(MUTC_h, timerange, windowsize_FFT, windowsize_r
     timerange:時間間隔(切り出す時間)(秒)(int型)
     windowsize_FFT:パワースペクトルの移動平均を計算する際の窓数(int型)
     windowsize_ratio:パワースペクトルとその移動平均の比の移動平均を計算するときの窓数(int型)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
 
     #記録用配列の作成 
@@ -56,7 +57,7 @@ def process_focusmovingratiolist(MUTC_h, timerange, windowsize_FFT, windowsize_r
         '''
         
         #パワースペクトルの導出
-        fft_x, fft_y = nearFFT.FFT(focus_data)
+        fft_x, fft_y = nearFFT.FFT(focus_data, estimator)
             
         #パワースペクトルとその移動平均の導出
         fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.moving_FFT(focus_data, windowsize_FFT)
@@ -73,7 +74,7 @@ def process_focusmovingratiolist(MUTC_h, timerange, windowsize_FFT, windowsize_r
            
     return moving_fft_xlist, moving_ratiolist
 
-def plot_focusmeanmovingratio(MUTC_h, timerange, windowsize_FFT, windowsize_ratio):
+def plot_focusmeanmovingratio(MUTC_h, timerange, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
     '''
     ダストデビルが1つも発生していない火星日のうち、
     MUTC_h(時刻)からtimerange秒間に対応する気圧の時系列データを全て加工し、
@@ -84,10 +85,11 @@ def plot_focusmeanmovingratio(MUTC_h, timerange, windowsize_FFT, windowsize_rati
     timerange:時間間隔(切り出す時間)(秒)(int型)
     windowsize_FFT:パワースペクトルの移動平均を計算する際の窓数(int型)
     windowsize_ratio:パワースペクトルとその移動平均の比の移動平均を計算するときの窓数(int型)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         #対応する全事象のパワースペクトルとその移動平均の比をリスト化したもの(修正パワースペクトル)を導出
-        moving_fft_xlist, moving_ratiolist = process_focusmovingratiolist(MUTC_h, timerange, windowsize_FFT, windowsize_ratio)
+        moving_fft_xlist, moving_ratiolist = process_focusmovingratiolist(MUTC_h, timerange, windowsize_FFT, windowsize_ratio, estimator)
         if not moving_fft_xlist or not moving_ratiolist:
             raise ValueError("No data")
         
@@ -134,5 +136,7 @@ if __name__ == "__main__":
                         help="The [windowsize] used to calculate the moving average") #パワースペクトルの移動平均を計算する際の窓数の指定
     parser.add_argument('windowsize_ratio', type=int, 
                         help="The [windowsize] used to calculate the moving average of ratio") #パワースペクトルとその移動平均の比の移動平均を計算する際の窓数の指定
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_focusmeanmovingratio(args.MUTC_h, args.timerange, args.windowsize_FFT, args.windowsize_ratio)
\ No newline at end of file
+    plot_focusmeanmovingratio(args.MUTC_h, args.timerange, args.windowsize_FFT, args.windowsize_ratio, args.estimator)
\ No newline at end of file
@@ -13,7 +13,7 @@ import meanFFT_sortedseason
 import meanmovingFFT_sorteddP
 from Dispersion_Relation import Params
 
-def process_focusratiolist(MUTC_h, timerange, windowsize_FFT):
+def process_focusratiolist(MUTC_h, timerange, windowsize_FFT, estimator='periodogram'):
     '''
     ダストデビルの発生がない sol (火星日)におけるMUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -22,6 +22,7 @@ def process_focusratiolist(MUTC_h, timerange, windowsize_FFT):
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     # 記録用配列の作成 
     moving_fft_xlist, ratio_list = [], []
@@ -53,7 +54,7 @@ def process_focusratiolist(MUTC_h, timerange, windowsize_FFT):
         '''
             
         # FFT によるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(focus_data, windowsize_FFT)
+        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(focus_data, windowsize_FFT, estimator)
 
         # パワースペクトル比の導出
         moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
@@ -64,7 +65,7 @@ def process_focusratiolist(MUTC_h, timerange, windowsize_FFT):
             
     return moving_fft_xlist, ratio_list
 
-def plot_meanfocusratio(MUTC_h, timerange, windowsize_FFT):
+def plot_meanfocusratio(MUTC_h, timerange, windowsize_FFT, estimator='periodogram'):
     '''
     ダストデビルの発生がない sol (火星日)におけるMUTC_h (地方時) 直後の
     時系列データにおける気圧残差を求め、
@@ -76,10 +77,11 @@ def plot_meanfocusratio(MUTC_h, timerange, windowsize_FFT):
     MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
     timerange : 切り取る時間範囲 (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 各ケースにおけるパワースペクトル比をまとめたリストを導出
-        moving_fft_xlist, ratio_list = process_focusratiolist(MUTC_h, timerange, windowsize_FFT)
+        moving_fft_xlist, ratio_list = process_focusratiolist(MUTC_h, timerange, windowsize_FFT, estimator)
         
         # パワースペクトル比のケース平均の導出
         moving_fft_x =  meanmovingFFT_sorteddP.process_arrays(moving_fft_xlist, np.nanmean)
@@ -122,5 +124,7 @@ if __name__ == "__main__":
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
     parser.add_argument('windowsize_FFT', type=int, 
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_meanfocusratio(args.MUTC_h, args.timerange, args.windowsize_FFT)
+    plot_meanfocusratio(args.MUTC_h, args.timerange, args.windowsize_FFT, args.estimator)
@@ -11,12 +11,20 @@ import nearFFT
 import nearmovingFFT
 import meanFFT_sortedseason
 import meanFFT_sorteddP
+import logbin
+import parallel
+import precision
 from Dispersion_Relation import Params
 
+# 累積の精度 (dtype) を指定できる、総和を伴う演算
+ACCUMULATE_OPERATIONS = (np.mean, np.nanmean, np.sum, np.nansum)
+
 def process_arrays(arrays, operation):
     '''
     空配列を除外し、各配列の長さが揃っていることを確認後、
     列方向に指定の演算を適用する関数。
+    ※積み重ねは入力の精度のまま行い (float32 ではメモリが半分)、
+    総和を伴う演算 (平均・総和) は precision.ACCUMULATE_DTYPE で累積して、結果は入力の精度で返す。
 
     arrays : 演算の対象となる配列(ndarray ※各配列の長さが一致している必要有)
     operation : 適用する演算 (例) np.sum, np.max…など
@@ -30,12 +38,60 @@ def process_arrays(arrays, operation):
     if not all(len(arr) == length for arr in arrays):
         raise ValueError("All arrays must have the same length")
     
-    # 指定された操作を施す
-    result = operation(np.array(arrays), axis=0)
+    # 指定された操作を施す (総和を伴う演算は ACCUMULATE_DTYPE で累積)
+    stack = np.array(arrays)
+    if operation in ACCUMULATE_OPERATIONS:
+        result = operation(stack, axis=0, dtype=precision.ACCUMULATE_DTYPE)
+    else:
+        result = operation(stack, axis=0)
+    result = np.asarray(result).astype(precision.result_dtype(stack), copy=False)
 
     return result
 
-def process_movingFFTlist_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
+def process_movingFFT(ID, timerange, interval, windowsize_FFT, estimator='periodogram'):
+    '''
+    指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
+    時系列データにおける気圧残差を求め、パワースペクトルとその移動平均を算出する関数。
+    返り値は (周波数軸, パワースペクトル, 移動平均の周波数軸, 移動平均)。
+    ※取得できない場合は ValueError を送出する。
+
+    ID : ダストデビルの識別番号 (int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    '''
+    # ID に対応する sol および MUTC を取得
+    sol, MUTC = neardevil.get_sol_MUTC(ID)
+
+    # 該当sol付近の時系列データを取得
+    data = dailychange_p.process_surround_dailydata(sol)
+    if data is None:
+        raise ValueError("Failed to retrieve time-series data.")
+
+    # MUTC 付近の時系列データを取得
+    near_devildata = neardevil.filter_neardevildata(data, MUTC, timerange, interval)
+    if near_devildata is None or near_devildata.empty:
+        raise ValueError("No data available after filtering.")
+
+    # 0.5秒間隔でresample
+    near_devildata = meanFFT_sortedseason.data_resample(near_devildata, 0.5)
+
+    # 残差計算を実施
+    near_devildata = nearFFT.calculate_residual(near_devildata)
+    '''
+    追加カラム:
+    - countdown: 経過時間 (秒) (countdown ≦ 0)
+    - p-pred: 線形回帰による気圧予測値 (Pa)
+    - residual: 気圧の残差
+    '''
+
+    # FFT によるパワースペクトルとその移動平均の導出
+    fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(near_devildata, windowsize_FFT, estimator)
+
+    return fft_x, fft_y, moving_fft_x, moving_fft_y
+
+def process_movingFFTlist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, estimator='periodogram', workers=1):
     '''
     dP_Ulimit > dP を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直前の時系列データにおける気圧残差を求め、
@@ -46,56 +102,19 @@ def process_movingFFTlist_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
     '''
-    # 記録用配列の作成
-    fft_xlist, fft_ylist = [], []
-    moving_fft_xlist, moving_fft_ylist = [], []
-
     # dP_Ulimit > dP を満たす ID をリスト化
     IDlist = meanFFT_sorteddP.process_IDlist_dP(dP_Ulimit)
-    for ID in tqdm(IDlist, desc="Processing IDs"):
-        try:
-            # ID に対応する sol および MUTC を取得
-            sol, MUTC = neardevil.get_sol_MUTC(ID)
-
-            # 該当sol付近の時系列データを取得
-            data = dailychange_p.process_surround_dailydata(sol)
-            if data is None:
-                raise ValueError("Failed to retrieve time-series data.")
-            
-            # MUTC 付近の時系列データを取得
-            near_devildata = neardevil.filter_neardevildata(data, MUTC, timerange, interval)
-            if near_devildata is None or near_devildata.empty:
-                raise ValueError("No data available after filtering.")
-
-            # 0.5秒間隔でresample
-            near_devildata = meanFFT_sortedseason.data_resample(near_devildata, 0.5)
-                
-            # 残差計算を実施
-            near_devildata = nearFFT.calculate_residual(near_devildata)
-            '''
-            追加カラム:
-            - countdown: 経過時間 (秒) (countdown ≦ 0)
-            - p-pred: 線形回帰による気圧予測値 (Pa)
-            - residual: 気圧の残差
-            '''
-                
-            # FFT によるパワースペクトルとその移動平均の導出
-            fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(near_devildata, windowsize_FFT)
-            
-            # 結果を配列に記録
-            fft_xlist.append(fft_x)
-            fft_ylist.append(fft_y)
-            moving_fft_xlist.append(moving_fft_x)
-            moving_fft_ylist.append(moving_fft_y)
-            
-        except ValueError as e:
-            print(e)
-            continue 
+
+    # 各ケースのパワースペクトルとその移動平均 (取得できないケースは除外)
+    IDs, results = parallel.run_events(process_movingFFT, IDlist, (timerange, interval, windowsize_FFT, estimator), workers)
+    fft_xlist, fft_ylist, moving_fft_xlist, moving_fft_ylist = parallel.unzip(results, 4)
             
     return fft_xlist, fft_ylist, moving_fft_xlist, moving_fft_ylist
 
-def plot_meanmovingFFT_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
+def plot_meanmovingFFT_dP(dP_Ulimit, timerange, interval, windowsize_FFT, estimator='periodogram', n_bins=None, workers=1):
     '''
     dP_Ulimit > dP を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直前の時系列データにおける気圧残差を求め、
@@ -109,16 +128,34 @@ def plot_meanmovingFFT_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    n_bins : 共通の対数周波数ビンの数 (int)
+             ※None の場合、全ての窓のデータ数が揃っていれば再ビン化せず、
+             揃っていなければ logbin.N_BINS 個のビンへ再ビン化する
+    ※再ビン化すると、データ数の異なる窓も共通の周波数ビンへ揃えて平均する。
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
     '''
     try:
          # 各ケースにおけるパワースペクトルとその移動平均ををまとめたリストの導出
-        fft_xlist, fft_ylist, moving_fft_xlist, moving_fft_ylist = process_movingFFTlist_dP(dP_Ulimit, timerange, interval, windowsize_FFT)
+        fft_xlist, fft_ylist, moving_fft_xlist, moving_fft_ylist = process_movingFFTlist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, estimator, workers)
         
+        # 窓のデータ数が揃っていない場合は、既定のビン数で共通の対数周波数ビンへ揃える
+        if n_bins is None and len({len(fft_x) for fft_x in fft_xlist}) > 1:
+            n_bins = logbin.N_BINS
+            print(f"Window lengths differ; averaging on {n_bins} log-frequency bins.")
+
         # パワースペクトルとその移動平均のケース平均の導出
-        fft_x = process_arrays(fft_xlist, np.nanmean)
-        fft_y = process_arrays(fft_ylist, np.nanmean) 
-        moving_fft_x = process_arrays(moving_fft_xlist, np.nanmean)
-        moving_fft_y = process_arrays(moving_fft_ylist, np.nanmean)
+        if n_bins is None:
+            fft_x = process_arrays(fft_xlist, np.nanmean)
+            fft_y = process_arrays(fft_ylist, np.nanmean) 
+            moving_fft_x = process_arrays(moving_fft_xlist, np.nanmean)
+            moving_fft_y = process_arrays(moving_fft_ylist, np.nanmean)
+        else:
+            # 共通の対数周波数ビンへ再ビン化してから平均
+            fft_x, fft_y = logbin.logbin(fft_xlist, fft_ylist, n_bins)
+            fft_y = np.nanmean(fft_y, axis=0)
+            moving_fft_x, moving_fft_y = logbin.logbin(moving_fft_xlist, moving_fft_ylist, n_bins)
+            moving_fft_y = np.nanmean(moving_fft_y, axis=0)
         
         # 音波と重力波の境界に該当する周波数
         params = Params()
@@ -143,6 +180,8 @@ def plot_meanmovingFFT_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
         output_dir = f'meanmovingFFT_dP_{timerange}s'
         os.makedirs(output_dir, exist_ok=True)
         filename = f"dP is More {-dP_Ulimit},windowsize_FFT={windowsize_FFT}.png"
+        if n_bins is not None:
+            filename = f"dP is More {-dP_Ulimit},windowsize_FFT={windowsize_FFT},n_bins={n_bins}.png"
         plt.savefig(os.path.join(output_dir, filename))
         plt.clf()
         plt.close()
@@ -160,5 +199,11 @@ if __name__ == "__main__":
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
     parser.add_argument('windowsize_FFT', type=int, 
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
+    parser.add_argument('--n_bins', type=int, default=None,
+                        help="Number of log-frequency bins for a common grid (default: only when window lengths differ)") # 共通の対数周波数ビンの数
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes") # 並列に実行するプロセス数
     args = parser.parse_args()
-    plot_meanmovingFFT_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT)
\ No newline at end of file
+    plot_meanmovingFFT_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT, args.estimator, args.n_bins, args.workers)
\ No newline at end of file
@@ -14,9 +14,63 @@ import nearmovingratio
 import meanFFT_sortedseason
 import meanFFT_sorteddP
 import meanmovingFFT_sorteddP
+import ensemble
+import bootstrap
+import parallel
+import shard
 from Dispersion_Relation import Params
 
-def process_movingratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio):
+def process_movingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
+    '''
+    指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
+    時系列データにおける気圧残差を求め、修正パワースペクトルを算出する関数。
+    返り値は (周波数軸, 修正パワースペクトル)。
+    ※取得できない場合は ValueError を送出する。
+
+    ID : ダストデビルの識別番号 (int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    '''
+    # ID に対応する sol および MUTC を取得
+    sol, MUTC = neardevil.get_sol_MUTC(ID)
+
+    # 該当sol付近の時系列データを取得
+    data = dailychange_p.process_surround_dailydata(sol)
+    if data is None:
+        raise ValueError("Failed to retrieve time-series data.")
+
+    # MUTC 付近の時系列データを取得
+    near_devildata = neardevil.filter_neardevildata(data, MUTC, timerange, interval)
+    if near_devildata is None or near_devildata.empty:
+        raise ValueError("No data available after filtering.")
+
+    # 0.5秒間隔でresample
+    near_devildata = meanFFT_sortedseason.data_resample(near_devildata, 0.5)
+
+    # 残差計算を実施
+    near_devildata = nearFFT.calculate_residual(near_devildata)
+    '''
+    追加カラム:
+    - countdown: 経過時間 (秒) (countdown ≦ 0)
+    - p-pred: 線形回帰による気圧予測値 (Pa)
+    - residual: 気圧の残差
+    '''
+
+    # FFT によるパワースペクトルとその移動平均の導出
+    fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(near_devildata, windowsize_FFT, estimator)
+
+    # パワースペクトル比の算出
+    moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
+
+    # 修正パワースペクトルを算出
+    moving_fft_x, moving_ratio = nearmovingratio.calculate_movingave(moving_fft_x, ratio, windowsize_ratio)
+
+    return moving_fft_x, moving_ratio
+
+def process_movingratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator='periodogram', workers=1):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データにおける気圧残差を求め、
@@ -28,60 +82,174 @@ def process_movingratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, w
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
     '''
-    # 記録用配列の作成
-    moving_fft_xlist, moving_ratiolist = [], []
-
     # dP_Ulimit > dP を満たす ID をリスト化
     IDlist = meanFFT_sorteddP.process_IDlist_dP(dP_Ulimit)
-    for ID in tqdm(IDlist, desc="Processing IDs"):
-        try:
-             # ID に対応する sol および MUTC を取得
-            sol, MUTC = neardevil.get_sol_MUTC(ID)
-
-            # 該当sol付近の時系列データを取得
-            data = dailychange_p.process_surround_dailydata(sol)
-            if data is None:
-                raise ValueError("Failed to retrieve time-series data.")
-            
-            # MUTC 付近の時系列データを取得
-            near_devildata = neardevil.filter_neardevildata(data, MUTC, timerange, interval)
-            if near_devildata is None or near_devildata.empty:
-                raise ValueError("No data available after filtering.")
-
-            # 0.5秒間隔でresample
-            near_devildata = meanFFT_sortedseason.data_resample(near_devildata, 0.5)
-                
-            # 残差計算を実施
-            near_devildata = nearFFT.calculate_residual(near_devildata)
-            '''
-            追加カラム:
-            - countdown: 経過時間 (秒) (countdown ≦ 0)
-            - p-pred: 線形回帰による気圧予測値 (Pa)
-            - residual: 気圧の残差
-            '''
-                
-            # FFT によるパワースペクトルとその移動平均の導出
-            fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(near_devildata, windowsize_FFT)      
-            
-            # パワースペクトル比の算出
-            moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
 
-            # 修正パワースペクトルを算出
-            moving_fft_x, moving_ratio = nearmovingratio.calculate_movingave(moving_fft_x, ratio, windowsize_ratio)
-            
-            # 結果を配列に記録
-            moving_fft_xlist.append(moving_fft_x) 
-            moving_ratiolist.append(moving_ratio)
-            
-            
-        except ValueError as e:
-            print(e)
-            continue 
+    # 各ケースの修正パワースペクトル (取得できないケースは除外)
+    IDs, results = parallel.run_events(process_movingratio, IDlist,
+                                       (timerange, interval, windowsize_FFT, windowsize_ratio, estimator), workers)
+    moving_fft_xlist, moving_ratiolist = parallel.unzip(results, 2)
             
     return moving_fft_xlist, moving_ratiolist
 
-def plot_meanmovingratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio):
+def movingratio_meta(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
+    '''
+    分割した集計 (shard) の部分結果が同じ条件で作成されたことを確認するための情報を返す関数。
+    返り値は (dP_Ulimit > dP を満たす ID のリスト, 条件の dict)。
+
+    dP_Ulimit:上限となる気圧降下量(Pa) (int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    '''
+    IDlist = meanFFT_sorteddP.process_IDlist_dP(dP_Ulimit)
+    meta = shard.make_meta(IDlist, driver='meanmovingratio_dP', dP_Ulimit=dP_Ulimit, timerange=timerange, interval=interval,
+                           windowsize_FFT=windowsize_FFT, windowsize_ratio=windowsize_ratio, estimator=estimator)
+    return IDlist, meta
+
+def shard_dir(dP_Ulimit, timerange, windowsize_FFT, windowsize_ratio, directory=shard.SHARD_DIR):
+    '''
+    部分結果の保存先のディレクトリを返す関数。
+
+    dP_Ulimit:上限となる気圧降下量(Pa) (int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    directory : 全ての部分結果の保存先のディレクトリ
+    '''
+    return os.path.join(directory, f'meanmovingratio_dP_{timerange}s_windowsize_FFT={windowsize_FFT}',
+                        f"dP is More {-dP_Ulimit},windowsize_ratio={windowsize_ratio}")
+
+def process_movingratiostream_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator='periodogram', workers=1, shard_spec=None,
+                                 checkpoint=None, checkpoint_interval=shard.CHECKPOINT_INTERVAL):
+    '''
+    dP_Ulimit > dP を満たす全ての ID に対応する、
+    MUTC (ダストデビル発生時刻) 直前の時系列データにおける気圧残差を求め、
+    各ケースの修正パワースペクトルを1件ずつ集計し、
+    平均・分散 (ensemble.SpectrumAccumulator) と分位点 (ensemble.QuantileSketch) を返す関数。
+    ※リストに保持しないため、ケース数によらずメモリは一定。
+    周波数軸が一致しないケースは除外する。
+    sol ごとに集計し、sol の順に統合する (shard.fold) ため、
+    結果はプロセス数や分割の有無によらず一定となる。
+
+    dP_Ulimit:上限となる気圧降下量(Pa) (int)
+    ※dP, dP_Ulimit < 0
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
+    shard_spec : 分割の指定 (i, n) ※指定した場合は担当する sol のみを集計し、
+    統合前の sol ごとの集計のリストを返す (shard.select_chunks 参照)
+    checkpoint : 途中経過の保存先のパス ※指定した場合は checkpoint_interval 秒ごとに途中経過を保存し、
+    ファイルが既にある場合は処理済みの ID を除外して再開する (shard.Checkpoint 参照)。
+    ※完了しても削除しない。結果 (プロットや部分結果) の保存後に呼び出し元が削除すること。
+    checkpoint_interval : 途中経過を保存する間隔 (秒)
+    '''
+    # dP_Ulimit > dP を満たす ID をリスト化
+    IDlist, meta = movingratio_meta(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator)
+
+    # 集計用のインスタンスの作成 (途中経過がある場合は復元)
+    if checkpoint is not None:
+        progress = shard.Checkpoint(checkpoint, IDlist, meta, shard_spec, shard_spec is None, checkpoint_interval)
+        sketch, skip = progress.sketch, progress.completed()
+    else:
+        progress = None
+        sketch, skip = ensemble.QuantileSketch(), []
+
+    # 各ケースの修正パワースペクトルを sol ごとに集計
+    accumulators = shard.iter_accumulators(process_movingratio, IDlist,
+                                           (timerange, interval, windowsize_FFT, windowsize_ratio, estimator),
+                                           workers, shard_spec, sketch, skip)
+    if progress is not None:
+        return progress.run(accumulators), sketch
+    if shard_spec is not None:
+        return list(accumulators), sketch
+
+    # sol の順に統合
+    accumulator = shard.fold(accumulators)
+
+    return accumulator, sketch
+
+def checkpoint_path(dP_Ulimit, timerange, windowsize_FFT, windowsize_ratio, shard_spec=None, directory=shard.CHECKPOINT_DIR):
+    '''
+    途中経過の保存先のパスを返す関数。(分割ごとに別のファイル)
+
+    dP_Ulimit:上限となる気圧降下量(Pa) (int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    shard_spec : 分割の指定 (i, n) ※None の場合は分割しない実行
+    directory : 全ての途中経過の保存先のディレクトリ
+    '''
+    directory = shard_dir(dP_Ulimit, timerange, windowsize_FFT, windowsize_ratio, directory)
+    if shard_spec is None:
+        return os.path.join(directory, "all.npz")
+    return shard.shard_path(directory, shard_spec)
+
+def save_movingratioshard_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, shard_spec, estimator='periodogram', workers=1, directory=shard.SHARD_DIR,
+                             checkpoint_dir=None, checkpoint_interval=shard.CHECKPOINT_INTERVAL):
+    '''
+    分割 shard_spec が担当する sol の修正パワースペクトルを集計し、
+    部分結果を共有の保存先に書き出す関数。(全ての分割の完了後に merge_movingratioshards_dP で統合する)
+
+    dP_Ulimit:上限となる気圧降下量(Pa) (int)
+    ※dP, dP_Ulimit < 0
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    shard_spec : 分割の指定 (i, n)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
+    directory : 全ての部分結果の保存先のディレクトリ
+    checkpoint_dir : 途中経過の保存先のディレクトリ ※None の場合は途中経過を保存しない
+    checkpoint_interval : 途中経過を保存する間隔 (秒)
+    '''
+    IDlist, meta = movingratio_meta(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator)
+    checkpoint = None
+    if checkpoint_dir is not None:
+        checkpoint = checkpoint_path(dP_Ulimit, timerange, windowsize_FFT, windowsize_ratio, shard_spec, checkpoint_dir)
+    accumulators, sketch = process_movingratiostream_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio,
+                                                        estimator, workers, shard_spec, checkpoint, checkpoint_interval)
+    file_path = shard.shard_path(shard_dir(dP_Ulimit, timerange, windowsize_FFT, windowsize_ratio, directory), shard_spec)
+    shard.save_partial(file_path, accumulators, sketch, meta)
+    print(f"Save completed: {file_path}")
+
+    # 部分結果の保存後に途中経過を削除
+    shard.remove_checkpoint(checkpoint)
+
+    return file_path
+
+def merge_movingratioshards_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator='periodogram', directory=shard.SHARD_DIR):
+    '''
+    save_movingratioshard_dP で書き出した全ての部分結果を統合し、
+    process_movingratiostream_dP と同じ (SpectrumAccumulator, QuantileSketch) を返す関数。
+
+    dP_Ulimit:上限となる気圧降下量(Pa) (int)
+    ※dP, dP_Ulimit < 0
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    directory : 全ての部分結果の保存先のディレクトリ
+    '''
+    IDlist, meta = movingratio_meta(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator)
+    accumulator, sketch = shard.merge_partials(shard_dir(dP_Ulimit, timerange, windowsize_FFT, windowsize_ratio, directory), meta)
+    if sketch is None:
+        sketch = ensemble.QuantileSketch()
+
+    return accumulator, sketch
+
+def plot_meanmovingratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator='periodogram', n_boot=0, quantiles=False, workers=1, merge_dir=None,
+                            checkpoint_dir=None, checkpoint_interval=shard.CHECKPOINT_INTERVAL):
     '''
     dP_Ulimit > dP を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直前の時系列データにおける気圧残差を求め、
@@ -96,14 +264,49 @@ def plot_meanmovingratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT, wind
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    n_boot : ブートストラップの再標本数 (int) ※0 の場合は信頼区間を描画しない
+    ※信頼区間の算出には全ケースの修正パワースペクトルを保持する必要があるため、
+    n_boot > 0 の場合は逐次集計ではなくリストを用いる。
+    quantiles : True の場合、中央値と 5〜95 パーセンタイルの範囲も描画する (bool)
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
+    merge_dir : 部分結果の保存先のディレクトリ ※指定した場合は集計せず、
+    save_movingratioshard_dP で書き出した部分結果を統合して描画する
+    checkpoint_dir : 途中経過の保存先のディレクトリ ※指定した場合は逐次集計の途中経過を保存し、
+    中断後の再実行では処理済みの ID を除外して再開する (n_boot > 0 の場合は用いない)
+    checkpoint_interval : 途中経過を保存する間隔 (秒)
     '''
+    checkpoint = None
     try:
-        # 各ケースにおける修正パワースペクトルをまとめたリストの導出
-        moving_fft_xlist, moving_ratiolist = process_movingratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio)
+        if merge_dir is not None:
+            # 分割して集計した部分結果を統合
+            accumulator, sketch = merge_movingratioshards_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator, merge_dir)
+            if accumulator.n_cases == 0:
+                raise ValueError("No spectrum available.")
+
+            # 修正パワースペクトルのケース平均の導出
+            moving_fft_x = accumulator.fft_x
+            moving_ratio = accumulator.mean
+        elif n_boot > 0:
+            # 各ケースにおける修正パワースペクトルをまとめたリストの導出
+            moving_fft_xlist, moving_ratiolist = process_movingratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator, workers)
 
-        # 修正パワースペクトルのケース平均の導出
-        moving_fft_x = meanmovingFFT_sorteddP.process_arrays(moving_fft_xlist, np.nanmean)
-        moving_ratio =  meanmovingFFT_sorteddP.process_arrays(moving_ratiolist, np.nanmean)
+            # ケース平均とブートストラップによる 95% 信頼区間の導出
+            moving_fft_x = meanmovingFFT_sorteddP.process_arrays(moving_fft_xlist, np.nanmean)
+            moving_ratio, lower, upper = bootstrap.bootstrap_arrays(moving_ratiolist, n_boot)
+            sketch = None
+        else:
+            # 各ケースにおける修正パワースペクトルを逐次集計
+            if checkpoint_dir is not None:
+                checkpoint = checkpoint_path(dP_Ulimit, timerange, windowsize_FFT, windowsize_ratio, directory=checkpoint_dir)
+            accumulator, sketch = process_movingratiostream_dP(dP_Ulimit, timerange, interval, windowsize_FFT, windowsize_ratio, estimator, workers,
+                                                               checkpoint=checkpoint, checkpoint_interval=checkpoint_interval)
+            if accumulator.n_cases == 0:
+                raise ValueError("No spectrum available.")
+
+            # 修正パワースペクトルのケース平均の導出
+            moving_fft_x = accumulator.fft_x
+            moving_ratio = accumulator.mean
         
         # 特定の周波数より高周波の情報をnanに変更
         #moving_fft_x, moving_ratio = nearratio.filter_xUlimit(moving_fft_x, moving_ratio, 0.8)
@@ -115,6 +318,12 @@ def plot_meanmovingratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT, wind
         # プロットの設定
         plt.xscale('log')
         plt.plot(moving_fft_x, moving_ratio, label='moving ratio')
+        if n_boot > 0 and merge_dir is None:
+            plt.fill_between(moving_fft_x, lower, upper, alpha=0.3, label='95% CI')
+        if quantiles and sketch is not None and sketch.counts is not None:
+            p05, p50, p95 = sketch.quantile([0.05, 0.5, 0.95])
+            plt.plot(moving_fft_x, p50, label='median')
+            plt.fill_between(moving_fft_x, p05, p95, alpha=0.2, label='5-95%')
         plt.axvline(x=w, color='r', label='border')
         plt.title(f'MMPS_dP>{-dP_Ulimit},timerange={timerange}s', fontsize=15)
         plt.xlabel('Vibration Frequency [Hz]', fontsize=15)
@@ -131,6 +340,9 @@ def plot_meanmovingratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT, wind
         plt.clf()
         plt.close()
         print(f"Save completed: {filename}")
+
+        # プロットの保存後に途中経過を削除
+        shard.remove_checkpoint(checkpoint)
         
         return moving_fft_x, moving_ratio
 
@@ -147,5 +359,31 @@ if __name__ == "__main__":
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
     parser.add_argument('windowsize_ratio', type=int, 
                         help="The [windowsize] used to calculate the moving average of ratio") # パワースペクトル比のの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
+    parser.add_argument('--n_boot', type=int, default=0,
+                        help="Number of bootstrap resamples for the confidence band") # ブートストラップの再標本数
+    parser.add_argument('--quantiles', action='store_true',
+                        help="Also plot the median and 5-95 percentile range") # 中央値と5〜95パーセンタイルの描画
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes") # 並列に実行するプロセス数
+    parser.add_argument('--shard', type=shard.parse_shard, default=None,
+                        help="Only accumulate shard i of n (i/n, 0-based) and write the partial result") # 分割して集計 (i/n)
+    parser.add_argument('--merge', action='store_true',
+                        help="Merge the partial results of every shard and plot") # 部分結果を統合して描画
+    parser.add_argument('--shard_dir', type=str, default=shard.SHARD_DIR,
+                        help="Shared directory of the partial results") # 部分結果の保存先のディレクトリ
+    parser.add_argument('--checkpoint', action='store_true',
+                        help="Periodically save progress and resume from it after an interruption") # 途中経過の保存と再開
+    parser.add_argument('--checkpoint_dir', type=str, default=shard.CHECKPOINT_DIR,
+                        help="Directory of the checkpoints") # 途中経過の保存先のディレクトリ
+    parser.add_argument('--checkpoint_interval', type=float, default=shard.CHECKPOINT_INTERVAL,
+                        help="Seconds between checkpoints") # 途中経過を保存する間隔(秒)
     args = parser.parse_args()
-    plot_meanmovingratio_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio)
+    checkpoint_dir = args.checkpoint_dir if args.checkpoint else None
+    if args.shard is not None:
+        save_movingratioshard_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio, args.shard, args.estimator, args.workers, args.shard_dir,
+                                 checkpoint_dir, args.checkpoint_interval)
+    else:
+        plot_meanmovingratio_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio, args.estimator, args.n_boot, args.quantiles, args.workers,
+                                args.shard_dir if args.merge else None, checkpoint_dir, args.checkpoint_interval)
@@ -13,9 +13,56 @@ import nearratio
 import meanFFT_sortedseason
 import meanFFT_sorteddP
 import meanmovingFFT_sorteddP
+import parallel
 from Dispersion_Relation import Params
 
-def process_ratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
+def process_ratio(ID, timerange, interval, windowsize_FFT, estimator='periodogram'):
+    '''
+    指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
+    時系列データにおける気圧残差を求め、パワースペクトル比を算出する関数。
+    返り値は (周波数軸, パワースペクトル比)。
+    ※取得できない場合は ValueError を送出する。
+
+    ID : ダストデビルの識別番号 (int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    '''
+    # ID に対応する sol および MUTC を取得
+    sol, MUTC = neardevil.get_sol_MUTC(ID)
+
+    # 該当sol付近の時系列データを取得
+    data = dailychange_p.process_surround_dailydata(sol)
+    if data is None:
+        raise ValueError("Failed to retrieve time-series data.")
+
+    # MUTC 付近の時系列データを取得
+    near_devildata = neardevil.filter_neardevildata(data, MUTC, timerange, interval)
+    if near_devildata is None or near_devildata.empty:
+        raise ValueError("No data available after filtering.")
+
+    # 0.5秒間隔でresample
+    near_devildata = meanFFT_sortedseason.data_resample(near_devildata, 0.5)
+
+    # 残差計算を実施
+    near_devildata = nearFFT.calculate_residual(near_devildata)
+    '''
+    追加カラム:
+    - countdown: 経過時間 (秒) (countdown ≦ 0)
+    - p-pred: 線形回帰による気圧予測値 (Pa)
+    - residual: 気圧の残差
+    '''
+
+    # FFT によるパワースペクトルとその移動平均の導出
+    fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(near_devildata, windowsize_FFT, estimator)
+
+    # パワースペクトル比の算出
+    moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
+
+    return moving_fft_x, ratio
+
+def process_ratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, estimator='periodogram', workers=1):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データにおける気圧残差を求め、
@@ -26,56 +73,19 @@ def process_ratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
     '''
-    # 記録用配列の作成
-    moving_fft_xlist, ratiolist = [], []
-
     # dP_Ulimit > dP を満たす ID をリスト化
     IDlist = meanFFT_sorteddP.process_IDlist_dP(dP_Ulimit)
-    for ID in tqdm(IDlist, desc="Processing IDs"):
-        try:
-            # ID に対応する sol および MUTC を取得
-            sol, MUTC = neardevil.get_sol_MUTC(ID)
-
-            # 該当sol付近の時系列データを取得
-            data = dailychange_p.process_surround_dailydata(sol)
-            if data is None:
-                raise ValueError("Failed to retrieve time-series data.")
-            
-            # MUTC 付近の時系列データを取得
-            near_devildata = neardevil.filter_neardevildata(data, MUTC, timerange, interval)
-            if near_devildata is None or near_devildata.empty:
-                raise ValueError("No data available after filtering.")
-
-            # 0.5秒間隔でresample
-            near_devildata = meanFFT_sortedseason.data_resample(near_devildata, 0.5)
-                
-            # 残差計算を実施
-            near_devildata = nearFFT.calculate_residual(near_devildata)
-            '''
-            追加カラム:
-            - countdown: 経過時間 (秒) (countdown ≦ 0)
-            - p-pred: 線形回帰による気圧予測値 (Pa)
-            - residual: 気圧の残差
-            '''
-                
-            # FFT によるパワースペクトルとその移動平均の導出
-            fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(near_devildata, windowsize_FFT)      
-            
-            # パワースペクトル比の算出
-            moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
-                      
-            # 結果を配列に記録
-            moving_fft_xlist.append(moving_fft_x) 
-            ratiolist.append(ratio)  
-            
-        except ValueError as e:
-            print(e)
-            continue 
+
+    # 各ケースのパワースペクトル比 (取得できないケースは除外)
+    IDs, results = parallel.run_events(process_ratio, IDlist, (timerange, interval, windowsize_FFT, estimator), workers)
+    moving_fft_xlist, ratiolist = parallel.unzip(results, 2)
             
     return moving_fft_xlist, ratiolist
 
-def plot_meanratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
+def plot_meanratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT, estimator='periodogram', workers=1):
     '''
     dP_Ulimit > dP を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直前の時系列データにおける気圧残差を求め、
@@ -89,11 +99,13 @@ def plot_meanratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
     time_range:時間間隔(切り出す時間)(秒)(int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    workers : 並列に実行するプロセス数 (int) (parallel.run_events 参照)
     '''
 
     try:
         # 各ケースにおけるパワースペクトル比をまとめたリストの導出
-        moving_fft_xlist, ratiolist = process_ratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT)
+        moving_fft_xlist, ratiolist = process_ratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, estimator, workers)
         
         # パワースペクトル比のケース平均の導出
         moving_fft_x = meanmovingFFT_sorteddP.process_arrays(moving_fft_xlist, np.nanmean)
@@ -138,5 +150,9 @@ if __name__ == "__main__":
     parser.add_argument('timerange', type=int, help='timerang(s)') #時間間隔(切り出す時間)の指定(秒)
     parser.add_argument('windowsize_FFT', type=int, 
                         help="The [windowsize] used to calculate the moving average of FFT") #パワースペクトルの移動平均を計算する際の窓数の指定
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes") # 並列に実行するプロセス数
     args = parser.parse_args()
-    plot_meanratio_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT)
\ No newline at end of file
+    plot_meanratio_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT, args.estimator, args.workers)
\ No newline at end of file
@@ -15,7 +15,7 @@ import meanFFT_sorteddP
 import meanmovingFFT_sorteddP
 from Dispersion_Relation import Params
 
-def process_returnaftermovingFFTlist_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
+def process_returnaftermovingFFTlist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, estimator='periodogram'):
     '''
     dP_Ulimit > dP を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直後の時系列データにおける気圧残差を求め、
@@ -26,6 +26,7 @@ def process_returnaftermovingFFTlist_dP(dP_Ulimit, timerange, interval, windowsi
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     # 記録用配列の作成
     fft_xlist, fft_ylist = [], []
@@ -61,7 +62,7 @@ def process_returnaftermovingFFTlist_dP(dP_Ulimit, timerange, interval, windowsi
             '''
         
             # パワースペクトルとその移動平均の導出
-            fft_x, fft_y, moving_fft_x, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT)
+            fft_x, fft_y, moving_fft_x, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT, estimator)
 
             # 結果を配列に保存
             fft_xlist.append(fft_x)
@@ -75,7 +76,7 @@ def process_returnaftermovingFFTlist_dP(dP_Ulimit, timerange, interval, windowsi
             
     return fft_xlist, fft_ylist, moving_fft_xlist, moving_fft_ylist
 
-def plot_meanreturnaftermovingFFT_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
+def plot_meanreturnaftermovingFFT_dP(dP_Ulimit, timerange, interval, windowsize_FFT, estimator='periodogram'):
     '''
     dP_Ulimit > dP を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直後の時系列データにおける気圧残差を求め、
@@ -89,10 +90,11 @@ def plot_meanreturnaftermovingFFT_dP(dP_Ulimit, timerange, interval, windowsize_
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 各ケースにおけるパワースペクトルとその移動平均ををまとめたリストの導出
-        fft_xlist, fft_ylist, moving_fft_xlist, moving_fft_ylist = process_returnaftermovingFFTlist_dP(dP_Ulimit, timerange, interval, windowsize_FFT)
+        fft_xlist, fft_ylist, moving_fft_xlist, moving_fft_ylist = process_returnaftermovingFFTlist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, estimator)
         
         # パワースペクトルとその移動平均のケース平均の導出
         fft_x = meanmovingFFT_sorteddP.process_arrays(fft_xlist, np.nanmean)
@@ -140,5 +142,7 @@ if __name__ == "__main__":
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
     parser.add_argument('windowsize_FFT', type=int, 
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_meanreturnaftermovingFFT_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT)
+    plot_meanreturnaftermovingFFT_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT, args.estimator)
@@ -16,7 +16,7 @@ import meanFFT_sorteddP
 import meanmovingFFT_sorteddP
 from Dispersion_Relation import Params
 
-def process_returnafterratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
+def process_returnafterratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データにおける気圧残差を求め、
@@ -27,6 +27,7 @@ def process_returnafterratiolist_dP(dP_Ulimit, timerange, interval, windowsize_F
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     # 記録用配列の作成
     moving_fft_xlist, ratiolist = [], []
@@ -61,7 +62,7 @@ def process_returnafterratiolist_dP(dP_Ulimit, timerange, interval, windowsize_F
             '''
                 
             # FFT によるパワースペクトルとその移動平均の導出
-            fft_x, fft_y, moving_fft_x, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT)      
+            fft_x, fft_y, moving_fft_x, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT, estimator)      
             
             # パワースペクトル比の算出
             moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT) 
@@ -76,7 +77,7 @@ def process_returnafterratiolist_dP(dP_Ulimit, timerange, interval, windowsize_F
             
     return moving_fft_xlist, ratiolist
 
-def plot_meanreturnafterratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT):
+def plot_meanreturnafterratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT, estimator='periodogram'):
     '''
     dP_Ulimit > dP を満たす全ての ID に対応する、
     MUTC (ダストデビル発生時刻) 直後の時系列データにおける気圧残差を求め、
@@ -90,11 +91,12 @@ def plot_meanreturnafterratio_dP(dP_Ulimit, timerange, interval, windowsize_FFT)
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
 
     try:
         # 各ケースにおけるパワースペクトル比をまとめたリストを導出
-        moving_fft_xlist, ratiolist = process_returnafterratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT)
+        moving_fft_xlist, ratiolist = process_returnafterratiolist_dP(dP_Ulimit, timerange, interval, windowsize_FFT, estimator)
         
         # パワースペクトル比のケース平均の導出
         moving_fft_x = meanmovingFFT_sorteddP.process_arrays(moving_fft_xlist, np.nanmean)
@@ -140,5 +142,7 @@ if __name__ == "__main__":
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
     parser.add_argument('windowsize_FFT', type=int, 
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_meanreturnafterratio_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT)
\ No newline at end of file
+    plot_meanreturnafterratio_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT, args.estimator)
\ No newline at end of file
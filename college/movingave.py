@@ -0,0 +1,116 @@
+import numpy as np
+import precision
+
+def pad_sizes(windowsize):
+    '''
+    移動平均が計算できない (NaN となる) 先頭側・末尾側の要素数を返す関数。
+    ※奇数の窓数では左右対称 ((windowsize - 1) // 2 ずつ)、
+    偶数の窓数では末尾側が1つ多くなる。
+
+    windowsize : 移動平均に用いる窓数 (int)
+    '''
+    if windowsize < 1:
+        raise ValueError("windowsize must be a positive integer.")
+    return (windowsize - 1) // 2, windowsize // 2
+
+def valid_slice(n, windowsize):
+    '''
+    長さ n の配列のうち、移動平均が計算できる範囲のスライスを返す関数。
+
+    n : 配列の長さ (int)
+    windowsize : 移動平均に用いる窓数 (int)
+    '''
+    head, tail = pad_sizes(windowsize)
+    return slice(head, max(n - tail, head))
+
+def pad_like(x, windowsize, axis=-1):
+    '''
+    移動平均と形状を揃えるため、
+    移動平均が計算できない範囲を NaN に変更した x のコピーを返す関数。
+
+    x : x軸データ (array)
+    windowsize : 移動平均に用いる窓数 (int)
+    axis : 移動平均をとる軸 (int)
+    '''
+    x = np.asarray(x, dtype=float)
+    padded = np.full(x.shape, np.nan)
+    index = [slice(None)] * x.ndim
+    index[axis] = valid_slice(x.shape[axis], windowsize)
+    padded[tuple(index)] = x[tuple(index)]
+    return padded
+
+def prefix_sums(y):
+    '''
+    最終軸方向の累積和 (先頭に 0 を付与) と、非有限値 (NaN, ±inf) の個数の累積和を返す関数。
+    ※同じデータに対して複数の窓数の移動平均を求める場合は、
+    この返り値を window_mean に繰り返し渡すことで累積和を使い回せる。
+
+    y : 移動平均の対象となるデータ (ndarray, 最終軸が移動平均をとる軸)
+    '''
+    y = np.asarray(y, dtype=precision.ACCUMULATE_DTYPE)
+
+    # 非有限値は 0 として累積し、その個数を別に数える
+    finite = np.isfinite(y)
+    zeros = np.zeros(y.shape[:-1] + (1,))
+    cumsum = np.concatenate([zeros, np.cumsum(np.where(finite, y, 0), axis=-1)], axis=-1)
+    n_bad = np.concatenate([zeros, np.cumsum(~finite, axis=-1)], axis=-1)
+
+    return cumsum, n_bad
+
+def window_mean(prefix, windowsize):
+    '''
+    prefix_sums の返り値から、最終軸方向の移動平均を算出する関数。
+    ※形状を維持するため、移動平均が計算できない範囲は NaN とする。
+    また、NaN や ±inf を含む窓の移動平均は NaN とする。
+
+    prefix : prefix_sums の返り値 (累積和, 非有限値の個数の累積和)
+    windowsize : 移動平均に用いる窓数 (int)
+    '''
+    cumsum, n_bad = prefix
+    n = cumsum.shape[-1] - 1
+    head, _ = pad_sizes(windowsize)
+    moving_y = np.full(cumsum.shape[:-1] + (n,), np.nan)
+    if n < windowsize:
+        return moving_y
+
+    # 各窓の総和と非有限値の個数
+    window_sum = cumsum[..., windowsize:] - cumsum[..., :-windowsize]
+    window_bad = n_bad[..., windowsize:] - n_bad[..., :-windowsize]
+
+    moving_y[..., head:head + n - windowsize + 1] = np.where(window_bad > 0, np.nan, window_sum / windowsize)
+
+    return moving_y
+
+def moving_average(y, windowsize, axis=-1):
+    '''
+    累積和を用いて、指定された軸方向の移動平均を算出する関数。
+    窓数によらず1点あたりの計算量は一定で、
+    2D 配列 (ケース数 × 周波数) であれば全ケースを一括で処理する。
+
+    ※形状を維持するため、移動平均が計算できない範囲は NaN とする。
+    (np.convolve(..., mode='valid') を pad_sizes の範囲に埋めたものと同じ)
+    また、NaN や ±inf を含む窓の移動平均は NaN とする。
+
+    y : 移動平均の対象となるデータ (array)
+    windowsize : 移動平均に用いる窓数 (int)
+    axis : 移動平均をとる軸 (int)
+    '''
+    y = np.moveaxis(np.asarray(y), axis, -1)
+
+    # 累積和は float64 で行い、入力の精度 (float32 / float64) で返す
+    moving_y = window_mean(prefix_sums(y), windowsize).astype(precision.result_dtype(y))
+
+    return np.moveaxis(moving_y, -1, axis)
+
+def log_moving_average(y, windowsize, axis=-1):
+    '''
+    y の常用対数を移動平均したのち、逆変換して返す関数。
+    (nearmovingFFT.movingFFT などで用いる対数領域での平滑化)
+
+    y : 移動平均の対象となるデータ (array, > 0)
+    windowsize : 移動平均に用いる窓数 (int)
+    axis : 移動平均をとる軸 (int)
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log10_y = np.log10(y)
+    return 10**moving_average(log10_y, windowsize, axis)
@@ -8,6 +8,7 @@ import argparse as argparse
 import dailychange_p
 import neardevil
 import nearFFT
+import batchFFT
 from Dispersion_Relation import Params
 
 def AS(data):
@@ -19,26 +20,8 @@ def AS(data):
     # サンプリング周波数の定義
     sampling_freq = 1 / np.mean(np.diff(data['countdown']))
 
-    # フーリエ変換
-    Y = scipy.fft.fft(data['residual'].to_numpy(), norm='forward')
-
-    # データ数の取得
-    N = len(data['residual'])
-    
-    # 周波数軸の作成
-    AS_x = scipy.fft.fftfreq(N, d=sampling_freq)
-
-    # 対称性を利用した調整
-    Y = Y[:N//2]
-    AS_x = AS_x[:N//2]
-    Y = 2*Y
-
-    # 過大評価を防ぐための操作(データ長が奇数である場合のみ)
-    if N % 2 == 1:
-        Y[0] = Y[0]/2
-
-    # 振幅スペクトルの算出
-    AS_y = np.abs(Y)
+    # 実FFT による振幅スペクトルの算出
+    AS_x, AS_y = batchFFT.AS_batch(data['residual'].to_numpy(), sampling_freq)
 
     return AS_x, AS_y
 
@@ -14,7 +14,7 @@ import nearmovingAS
 import meanFFT_sortedseason
 from Dispersion_Relation import Params
 
-def process_ASmovingratio_resample(ID, timerange, interval, windowsize_FFT, windowsize_ratio):
+def process_ASmovingratio_resample(ID, timerange, interval, windowsize_FFT, windowsize_ratio, method='mean'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データ(0.5秒間隔でリサンプリング済)における気圧残差を求め、
@@ -25,6 +25,7 @@ def process_ASmovingratio_resample(ID, timerange, interval, windowsize_FFT, wind
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : 振幅スペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : 振幅スペクトル比の移動平均に用いる窓数(int)
+    method : resample の方法 ('mean' : 区間平均, 'polyphase' : polyphase FIR による間引き) (str)
     '''
     try:
         # ID に対応する sol および MUTC を取得
@@ -41,7 +42,7 @@ def process_ASmovingratio_resample(ID, timerange, interval, windowsize_FFT, wind
             raise ValueError("No data available after filtering.")
 
         # 0.5秒間隔でresample
-        near_devildata = meanFFT_sortedseason.data_resample(near_devildata, 0.5)
+        near_devildata = meanFFT_sortedseason.data_resample(near_devildata, 0.5, method)
 
         # 残差計算を実施
         near_devildata = nearFFT.calculate_residual(near_devildata)
@@ -67,7 +68,7 @@ def process_ASmovingratio_resample(ID, timerange, interval, windowsize_FFT, wind
         print(f"An error occurred: {e}")
         return None
 
-def plot_ASmovingratio_resample(ID, timerange, interval, windowsize_FFT, windowsize_ratio):
+def plot_ASmovingratio_resample(ID, timerange, interval, windowsize_FFT, windowsize_ratio, method='mean'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データ(0.5秒間隔でリサンプリング済)における気圧残差を求め、
@@ -81,10 +82,11 @@ def plot_ASmovingratio_resample(ID, timerange, interval, windowsize_FFT, windows
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : 振幅スペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : 振幅スペクトル比の移動平均に用いる窓数(int)
+    method : resample の方法 ('mean' : 区間平均, 'polyphase' : polyphase FIR による間引き) (str)
     '''
     try:
         # 修正振幅スペクトルの導出
-        moving_AS_x, moving_ratio, sol = process_ASmovingratio_resample(ID, timerange, interval, windowsize_FFT, windowsize_ratio)
+        moving_AS_x, moving_ratio, sol = process_ASmovingratio_resample(ID, timerange, interval, windowsize_FFT, windowsize_ratio, method)
 
         # 特定の周波数より高周波の情報をnanに変更
         #moving_fft_x, ratio = nearratio.filter_xUlimit(moving_fft_x, ratio, 0.8)
@@ -129,5 +131,7 @@ if __name__ == "__main__":
                         help="The [windowsize] used to calculate the moving average of FFT") # 振幅スペクトルの移動平均に用いる窓数
     parser.add_argument('windowsize_ratio', type=int, 
                         help="The [windowsize] used to calculate the moving average of ratio") # 振幅スペクトル比の移動平均に用いる窓数
+    parser.add_argument('--method', type=str, default='mean', choices=['mean', 'polyphase'],
+                        help="Resampling method") # resampleの方法
     args = parser.parse_args()
-    plot_ASmovingratio_resample(args.ID, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio)
\ No newline at end of file
+    plot_ASmovingratio_resample(args.ID, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio, args.method)
\ No newline at end of file
@@ -12,7 +12,7 @@ import nearAS
 import meanFFT_sortedseason
 from Dispersion_Relation import Params
 
-def process_nearAS_resample(ID, timerange, interval):
+def process_nearAS_resample(ID, timerange, interval, method='mean'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データ(0.5秒間隔でリサンプリング済)における気圧残差を求め、
@@ -21,6 +21,7 @@ def process_nearAS_resample(ID, timerange, interval):
     ID : ダストデビルの識別番号 (int)
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    method : resample の方法 ('mean' : 区間平均, 'polyphase' : polyphase FIR による間引き) (str)
     '''
     try:
         # ID に対応する sol および MUTC を取得
@@ -37,7 +38,7 @@ def process_nearAS_resample(ID, timerange, interval):
             raise ValueError("No data available after filtering.")
 
         # 0.5秒間隔でresample
-        near_devildata = meanFFT_sortedseason.data_resample(near_devildata, 0.5)
+        near_devildata = meanFFT_sortedseason.data_resample(near_devildata, 0.5, method)
         
         # 残差計算を実施
         near_devildata = nearFFT.calculate_residual(near_devildata)
@@ -57,7 +58,7 @@ def process_nearAS_resample(ID, timerange, interval):
         print(f"An error occurred: {e}")
         return None
 
-def plot_nearAS_resample(ID, timerange, interval):
+def plot_nearAS_resample(ID, timerange, interval, method='mean'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データ(0.5秒間隔でresample)における気圧残差を求め、
@@ -69,10 +70,11 @@ def plot_nearAS_resample(ID, timerange, interval):
     ID : ダストデビルの識別番号 (int)
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    method : resample の方法 ('mean' : 区間平均, 'polyphase' : polyphase FIR による間引き) (str)
     '''
     try:
         # 振幅スペクトルの導出
-        AS_x, AS_y, sol = process_nearAS_resample(ID, timerange, interval)
+        AS_x, AS_y, sol = process_nearAS_resample(ID, timerange, interval, method)
 
         # 音波と重力波の境界に該当する周波数
         params = Params()
@@ -110,5 +112,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('ID', type=int, help="ID") # IDの指定
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    parser.add_argument('--method', type=str, default='mean', choices=['mean', 'polyphase'],
+                        help="Resampling method") # resampleの方法
     args = parser.parse_args()
-    plot_nearAS_resample(args.ID, args.timerange, 20)
\ No newline at end of file
+    plot_nearAS_resample(args.ID, args.timerange, 20, args.method)
\ No newline at end of file
@@ -6,6 +6,8 @@ import os
 import argparse as argparse
 import dailychange_p
 import neardevil
+import batchFFT
+import precision
 from Dispersion_Relation import Params
 
 def calculate_residual(data):
@@ -27,26 +29,27 @@ def calculate_residual(data):
     a, b = np.polyfit(t, p, 1)
     new_data["p-pred"] = a * t + b
 
-    # 残差の計算
-    new_data["residual"] = p - new_data['p-pred']
+    # 残差の計算 (回帰は float64 で行い、残差はパイプラインの精度に変換)
+    new_data["residual"] = precision.as_dtype(p - new_data['p-pred'].values)
 
     return new_data
 
-def FFT(data):
+def FFT(data, estimator='periodogram'):
     '''
     残差 "residual" に対して FFT を適用し、パワースペクトルを算出する関数。
 
     data : フィルタリング済みの時系列データ (DataFrame)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     # サンプリング周波数の計算
     sampling_freq = 1 / np.mean(np.diff(data['countdown']))
 
     # FFT によるパワースペクトルの導出
-    fft_x, fft_y = signal.periodogram(data['residual'].values, fs=sampling_freq)
+    fft_x, fft_y = batchFFT.spectrum_batch(data['residual'].values, sampling_freq, estimator)
 
     return fft_x, fft_y
 
-def process_nearFFT(ID, timerange, interval):
+def process_nearFFT(ID, timerange, interval, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データにおける気圧残差を求め、
@@ -55,6 +58,7 @@ def process_nearFFT(ID, timerange, interval):
     ID : ダストデビルの識別番号 (int)
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # ID に対応する sol および MUTC を取得
@@ -80,7 +84,7 @@ def process_nearFFT(ID, timerange, interval):
         '''
 
         # FFT によるパワースペクトルの導出
-        fft_x, fft_y = FFT(near_devildata)
+        fft_x, fft_y = FFT(near_devildata, estimator)
 
         return fft_x, fft_y, sol
 
@@ -88,7 +92,7 @@ def process_nearFFT(ID, timerange, interval):
         print(f"An error occurred: {e}")
         return None
         
-def plot_nearFFT(ID, timerange, interval):
+def plot_nearFFT(ID, timerange, interval, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データにおける気圧残差を求め、
@@ -100,10 +104,11 @@ def plot_nearFFT(ID, timerange, interval):
     ID : ダストデビルの識別番号 (int)
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # パワースペクトルの導出
-        fft_x, fft_y, sol = process_nearFFT(ID, timerange, interval)
+        fft_x, fft_y, sol = process_nearFFT(ID, timerange, interval, estimator)
 
         # 音波と重力波の境界周波数を取得
         params = Params()
@@ -142,5 +147,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('ID', type=int, help="ID") # IDの指定
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_nearFFT(args.ID, args.timerange, 20)
\ No newline at end of file
+    plot_nearFFT(args.ID, args.timerange, 20, args.estimator)
\ No newline at end of file
@@ -0,0 +1,378 @@
+import numpy as np
+import datetime as datetime
+import matplotlib.pyplot as plt
+from math import factorial
+import os
+import argparse as argparse
+import dailychange_p
+import neardevil
+import nearFFT
+from Dispersion_Relation import Params
+
+def extirpolate(x, y, N, M=4):
+    '''
+    不等間隔の点 x (実数の格子座標) 上の値 y を、
+    Lagrange 補間の逆操作 (extirpolation) により
+    長さ N の等間隔格子へ配分する関数。(Press & Rybicki 1989)
+    ※各行 (窓) を独立に処理し、NaN の要素は無視する。
+
+    x : 格子座標 (0 ≦ x < N) (2D ndarray, 窓数 × データ数)
+    y : x 上の値 (2D ndarray, 窓数 × データ数)
+    N : 格子点数 (int)
+    M : 配分に用いる格子点数 (int)
+    '''
+    x, y = np.broadcast_arrays(np.atleast_2d(x), np.atleast_2d(y))
+    n_rows = x.shape[0]
+
+    # 各行の格子を1本の配列に並べるためのオフセット
+    offset = (np.arange(n_rows) * N)[:, np.newaxis] * np.ones(x.shape, dtype=int)
+
+    # NaN (窓長を揃えるための埋め草) を除外
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y, offset = x[valid], y[valid], offset[valid]
+
+    result = np.zeros(n_rows * N, dtype=y.dtype)
+
+    # 格子点上にある点はそのまま加算
+    integers = (x % 1 == 0)
+    np.add.at(result, offset[integers] + x[integers].astype(int), y[integers])
+    x, y, offset = x[~integers], y[~integers], offset[~integers]
+
+    # 残りの点は M 個の格子点へ Lagrange 係数で配分
+    ilo = np.clip((x - M // 2).astype(int), 0, N - M)
+    numerator = y * np.prod(x - ilo - np.arange(M)[:, np.newaxis], 0)
+    denominator = factorial(M - 1)
+    for j in range(M):
+        if j > 0:
+            denominator *= j / (j - M)
+        ind = ilo + (M - 1 - j)
+        np.add.at(result, offset + ind, numerator / (denominator * (x - ind)))
+
+    return result.reshape(n_rows, N)
+
+def trig_sum(t, h, df, Nf, freq_factor=1, oversampling=10, Mfft=8):
+    '''
+    周波数 f_k = k * df * freq_factor (k = 0, …, Nf-1) における
+    Σ h sin(2πf_k t), Σ h cos(2πf_k t) を extirpolation と FFT で
+    O(N log N) で一括計算する関数。
+
+    t : 時刻 (秒) (2D ndarray, 窓数 × データ数)
+    h : 重み付きデータ (2D ndarray, 窓数 × データ数)
+    df : 周波数刻み (Hz) (float)
+    Nf : 周波数点数 (int)
+    freq_factor : 周波数刻みの倍率 (int)
+    oversampling : FFT 格子の過剰サンプリング率 (int)
+    Mfft : extirpolation に用いる格子点数 (int)
+    '''
+    df = df * freq_factor
+
+    # FFT 格子点数 (2のべき乗に切り上げ)
+    Nfft = 1 << int(np.ceil(np.log2(Nf * oversampling)))
+
+    # 時刻を各窓の先頭を基準に、周波数刻みの周期で正規化
+    t0 = np.nanmin(t, axis=1, keepdims=True)
+    tnorm = ((t - t0) * df) % 1
+
+    # 等間隔格子への配分と逆FFT
+    grid = extirpolate(tnorm * Nfft, h, Nfft, Mfft)
+    fftgrid = np.fft.ifft(grid, axis=1)[:, :Nf]
+
+    # 基準時刻のずれを位相として補正
+    f = df * np.arange(Nf)
+    fftgrid = fftgrid * np.exp(2j * np.pi * t0 * f)
+
+    C = Nfft * fftgrid.real
+    S = Nfft * fftgrid.imag
+
+    return S, C
+
+def sampling_frequency(t):
+    '''
+    各窓の平均サンプリング周波数 (Hz) を、時刻とサンプル番号の最小二乗直線の傾きから求める関数。
+    ※両端の2点だけで決まる (N-1)/(時間幅) と異なり、時刻の揺らぎ (jitter) の影響を受けにくい。
+    等間隔のデータでは 1 / (サンプリング間隔) に一致する。
+
+    t : 時刻 (秒) (2D ndarray, 窓数 × データ数) ※NaN は除外
+    '''
+    t = np.atleast_2d(np.asarray(t, dtype=float))
+    k = np.where(np.isnan(t), np.nan, np.arange(t.shape[1], dtype=float))
+    k = k - np.nanmean(k, axis=1, keepdims=True)
+    t = t - np.nanmean(t, axis=1, keepdims=True)
+    return np.nansum(k**2, axis=1, keepdims=True) / np.nansum(k * t, axis=1, keepdims=True)
+
+def fast_lombscargle(t, y, df, Nf, oversampling=10, Mfft=8, sampling_freq=None):
+    '''
+    不等間隔の時系列データに対し、Press & Rybicki の高速アルゴリズムで
+    Lomb–Scargle パワースペクトルを窓ごとに一括で算出する関数。
+    ※等間隔のデータでは signal.periodogram (既定値) と一致するよう、
+    片側パワースペクトル密度 (Pa^2/Hz) に規格化している。
+    (signal.lombscargle の出力 P に対して 2P / sampling_freq)
+    ※extirpolation による近似誤差は oversampling と Mfft で決まる。
+    既定値 (10, 8) では、等間隔の窓 (N = 240〜1201) で signal.periodogram との相対誤差が
+    全周波数で 3e-5 以下 (中央値 1e-8)、不等間隔の窓で同じ sampling_freq で規格化した
+    signal.lombscargle との相対誤差が 4e-5 以下。
+    (oversampling=5, Mfft=4 ではナイキスト周波数付近で 20% 程度の誤差が生じる)
+    ※規格化に用いる sampling_freq の推定誤差は、そのままスペクトル全体の定数倍の誤差になる。
+    省略時の sampling_frequency (最小二乗) は、公称 2 Hz に ±0.2 間隔の一様な揺らぎを加えた窓
+    (N = 240〜1201) で公称値との差が 3e-4 以下。(両端から求める (N-1)/(時間幅) では 1e-3 程度ずれる)
+    ※長さの異なる窓は、末尾を NaN で埋めて行を揃えること。
+
+    t : 時刻 (秒) (2D ndarray, 窓数 × データ数)
+    y : 気圧の残差 (2D ndarray, 窓数 × データ数)
+    df : 周波数刻み (Hz) (float)
+    Nf : 周波数点数 (int)
+    oversampling : FFT 格子の過剰サンプリング率 (int)
+    Mfft : extirpolation に用いる格子点数 (int)
+    sampling_freq : 規格化に用いるサンプリング周波数 (Hz) (float or 窓数 × 1 の ndarray)
+                    ※None の場合は窓ごとに sampling_frequency で推定する
+    '''
+    t = np.atleast_2d(np.asarray(t, dtype=float))
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    valid = ~(np.isnan(t) | np.isnan(y))
+
+    # 各窓のデータ数とサンプリング周波数
+    n = valid.sum(axis=1, keepdims=True)
+    if sampling_freq is None:
+        sampling_freq = sampling_frequency(np.where(valid, t, np.nan))
+
+    # 一様な重みと平均の除去
+    w = np.where(valid, 1.0, 0.0) / n
+    y = np.where(valid, y, 0.0)
+    y = y - np.sum(w * y, axis=1, keepdims=True)
+    t = np.where(valid, t, np.nan)
+
+    # 三角関数和の計算
+    Sh, Ch = trig_sum(t, w * y, df, Nf, 1, oversampling, Mfft)
+    S2, C2 = trig_sum(t, w, df, Nf, 2, oversampling, Mfft)
+
+    # 位相 τ の決定
+    tan_2omega_tau = S2 / np.where(C2 == 0, np.finfo(float).tiny, C2)
+    S2w = tan_2omega_tau / np.sqrt(1 + tan_2omega_tau**2)
+    C2w = 1 / np.sqrt(1 + tan_2omega_tau**2)
+    Cw = np.sqrt(0.5) * np.sqrt(1 + C2w)
+    Sw = np.sqrt(0.5) * np.sign(S2w) * np.sqrt(1 - C2w)
+
+    YC = Ch * Cw + Sh * Sw
+    YS = Sh * Cw - Ch * Sw
+    CC = 0.5 * (1 + C2 * C2w + S2 * S2w)
+    SS = 0.5 * (1 - C2 * C2w - S2 * S2w)
+
+    # 直流成分およびナイキスト周波数では sin 項が消えるため除外
+    eps = 1e-10
+    power = np.where(CC > eps, YC**2 / np.where(CC > eps, CC, 1), 0.0) \
+        + np.where(SS > eps, YS**2 / np.where(SS > eps, SS, 1), 0.0)
+
+    # periodogram と同じ片側パワースペクトル密度に換算
+    power = power * n / sampling_freq
+
+    # 平均除去済みのため直流成分は0
+    power[:, 0] = 0.0
+
+    return power
+
+def LS_grid(N, sampling_freq):
+    '''
+    signal.periodogram と同じ周波数軸 (刻み, 点数) を返す関数。
+
+    N : データ数 (int)
+    sampling_freq : サンプリング周波数 (Hz) (float)
+    '''
+    return sampling_freq / N, N // 2 + 1
+
+def LS(data):
+    '''
+    残差 "residual" に対して Lomb–Scargle 法を適用し、
+    resample を行わずにパワースペクトルを算出する関数。
+    ※周波数軸は、等間隔のデータでは nearFFT.FFT と同一。
+
+    data : フィルタリング済みの時系列データ (DataFrame)
+    '''
+    # サンプリング周波数の計算
+    t = data['countdown'].values
+    sampling_freq = sampling_frequency(t)[0, 0]
+
+    # periodogram と同じ周波数軸
+    df, Nf = LS_grid(len(t), sampling_freq)
+    LS_x = df * np.arange(Nf)
+
+    # Lomb–Scargle によるパワースペクトルの導出
+    LS_y = fast_lombscargle(t, data['residual'].values, df, Nf, sampling_freq=sampling_freq)[0]
+
+    return LS_x, LS_y
+
+def LS_batch(datalist):
+    '''
+    複数の窓に対し、周波数軸 (データ数, サンプリング周波数) が
+    一致するものをまとめて Lomb–Scargle パワースペクトルを算出する関数。
+    結果は datalist と同じ順序で返す。
+
+    datalist : フィルタリング済みの時系列データ (DataFrame) のリスト
+    '''
+    # 周波数軸ごとに窓をまとめる (周波数軸には各グループ先頭の窓のサンプリング周波数を用いる)
+    groups = {}
+    for i, data in enumerate(datalist):
+        t = data['countdown'].values
+        sampling_freq = sampling_frequency(t)[0, 0]
+        key = (len(t), round(sampling_freq, 9))
+        groups.setdefault(key, (sampling_freq, []))[1].append(i)
+
+    LS_xlist, LS_ylist = [None] * len(datalist), [None] * len(datalist)
+    for (N, _), (sampling_freq, indices) in groups.items():
+        df, Nf = LS_grid(N, sampling_freq)
+        t = np.array([datalist[i]['countdown'].values for i in indices])
+        y = np.array([datalist[i]['residual'].values for i in indices])
+        power = fast_lombscargle(t, y, df, Nf, sampling_freq=sampling_freq)
+        for row, i in enumerate(indices):
+            LS_xlist[i] = df * np.arange(Nf)
+            LS_ylist[i] = power[row]
+
+    return LS_xlist, LS_ylist
+
+def process_residualdata(ID, timerange, interval):
+    '''
+    指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
+    時系列データ(resample なし)における気圧残差を求める関数。
+    返り値は (残差を追加した時系列データ, sol)。
+    ※取得できない場合は ValueError を送出する。
+
+    ID : ダストデビルの識別番号 (int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    '''
+    # ID に対応する sol および MUTC を取得
+    sol, MUTC = neardevil.get_sol_MUTC(ID)
+
+    # 該当 sol 周辺の時系列データを取得
+    data = dailychange_p.process_surround_dailydata(sol)
+    if data is None:
+        raise ValueError("Failed to retrieve time-series data.")
+
+    # MUTC 付近のデータを抽出
+    near_devildata = neardevil.filter_neardevildata(data, MUTC, timerange, interval)
+    if near_devildata is None or near_devildata.empty:
+        raise ValueError("No data available after filtering.")
+
+    # 残差計算を実施
+    near_devildata = nearFFT.calculate_residual(near_devildata)
+    '''
+    追加カラム:
+    - countdown: 経過時間 (秒) (countdown ≦ 0)
+    - p-pred: 線形回帰による気圧予測値 (Pa)
+    - residual: 気圧の残差
+    '''
+
+    return near_devildata, sol
+
+def process_nearLS(ID, timerange, interval):
+    '''
+    指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
+    時系列データ(resample なし)における気圧残差を求め、
+    それに対する Lomb–Scargle パワースペクトルを算出する関数。
+
+    ID : ダストデビルの識別番号 (int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    '''
+    try:
+        # 気圧残差の導出
+        near_devildata, sol = process_residualdata(ID, timerange, interval)
+
+        # Lomb–Scargle 法によるパワースペクトルの導出
+        LS_x, LS_y = LS(near_devildata)
+
+        return LS_x, LS_y, sol
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+def process_nearLSlist(IDlist, timerange, interval):
+    '''
+    複数の ID について気圧残差を求め、周波数軸が一致する窓をまとめて (LS_batch)
+    Lomb–Scargle パワースペクトルを算出する関数。
+    返り値は {ID: (周波数軸, パワースペクトル, sol)} の辞書。(取得できない ID は除外)
+
+    IDlist : ダストデビルの識別番号のリスト
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    '''
+    IDs, datalist, sols = [], [], []
+    for ID in IDlist:
+        try:
+            near_devildata, sol = process_residualdata(ID, timerange, interval)
+        except ValueError as e:
+            print(f"An error occurred: {e}")
+            continue
+        IDs.append(ID)
+        datalist.append(near_devildata)
+        sols.append(sol)
+
+    # 周波数軸ごとに一括で算出
+    LS_xlist, LS_ylist = LS_batch(datalist)
+
+    return {ID: (LS_x, LS_y, sol) for ID, LS_x, LS_y, sol in zip(IDs, LS_xlist, LS_ylist, sols)}
+
+def plot_nearLS(ID, timerange, interval, result=None):
+    '''
+    指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
+    時系列データ(resample なし)における気圧残差を求め、
+    それに対する Lomb–Scargle パワースペクトルを算出し、プロットを保存する関数。
+
+    - X軸 : 振動数 (Hz)
+    - Y軸 : スペクトル強度 (Pa^2)
+
+    ID : ダストデビルの識別番号 (int)
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    result : 算出済みの (周波数軸, パワースペクトル, sol) ※None の場合はこの関数で算出する
+    '''
+    try:
+        # パワースペクトルの導出
+        if result is None:
+            result = process_nearLS(ID, timerange, interval)
+        LS_x, LS_y, sol = result
+
+        # 音波と重力波の境界周波数を取得
+        params = Params()
+        w = params.border_Hz()
+
+        # 描画の設定
+        plt.xscale('log')
+        plt.yscale('log')
+        plt.ylim(1e-11, 1e2)
+        plt.plot(LS_x, LS_y, label='Lomb-Scargle')
+        plt.axvline(x=w, color='r', label='border')
+        plt.title(f'LS_ID={ID}, sol={sol}, timerange={timerange}s')
+        plt.xlabel('Vibration Frequency [Hz]', fontsize=15)
+        plt.ylabel(f'Pressure Power [$Pa^2$]', fontsize=15)
+        plt.grid(True)
+        plt.legend(fontsize=15)
+        plt.tight_layout()
+
+        # 画像の保存
+        output_dir = f'nearLS_{timerange}s'
+        os.makedirs(output_dir, exist_ok=True)
+        filename = f"ID={str(ID).zfill(5)}, sol={str(sol).zfill(4)}.png"
+        plt.savefig(os.path.join(output_dir, filename))
+        plt.clf()
+        plt.close()
+        print(f"Save completed: {filename}")
+
+        return LS_x, LS_y
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('ID', type=int, nargs='+', help="ID") # IDの指定 (複数指定した場合はまとめて算出)
+    parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    args = parser.parse_args()
+    if len(args.ID) == 1:
+        plot_nearLS(args.ID[0], args.timerange, 20)
+    else:
+        results = process_nearLSlist(args.ID, args.timerange, 20)
+        for ID, result in results.items():
+            plot_nearLS(ID, args.timerange, 20, result)
@@ -7,9 +7,10 @@ import argparse as argparse
 import dailychange_p
 import neardevil
 import nearFFT
+import movingave
 from Dispersion_Relation import Params
 
-def movingFFT(data, windowsize_FFT):
+def movingFFT(data, windowsize_FFT, estimator='periodogram'):
     """
     フィルタリング済みデータにFFTを適用し、
     パワースペクトルとその移動平均を算出する関数。
@@ -22,35 +23,21 @@ def movingFFT(data, windowsize_FFT):
     
     data : フィルタリング済みの時系列データ(DattaFrame
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     """
 
     # パワースペクトルを計算
-    fft_x, fft_y = nearFFT.FFT(data)
+    fft_x, fft_y = nearFFT.FFT(data, estimator)
 
-    # パワーの常用対数を計算
-    log10_fft_y = np.log10(fft_y)
-
-    # 移動平均用のフィルターを作成
-    filter_frame = np.ones(windowsize_FFT) / windowsize_FFT
-
-    # 欠損が発生する要素数の計算
-    pad_size = (windowsize_FFT - 1) // 2
-
-    # 形状を維持するため、全ての要素をNanに変更(初期化)
-    moving_fft_x = np.full(fft_x.shape, np.nan)
-    log10_moving_fft_y = np.full(fft_y.shape, np.nan)
-
-    # 有効な範囲の抽出及び計算
-    moving_fft_x[pad_size:-pad_size] = fft_x[pad_size:-pad_size]
-    log10_moving_fft_y[pad_size:-pad_size] = np.convolve(log10_fft_y, filter_frame, mode="valid")
-
-    # 対数を戻してパワーに変換
-    moving_fft_y = 10**(log10_moving_fft_y)
+    # 常用対数を累積和により移動平均し、逆変換
+    # (移動平均が計算できない範囲は NaN として形状を維持)
+    moving_fft_x = movingave.pad_like(fft_x, windowsize_FFT)
+    moving_fft_y = movingave.log_moving_average(fft_y, windowsize_FFT)
 
     return fft_x, fft_y, moving_fft_x, moving_fft_y
 
 
-def process_movingFFT(ID, timerange, interval, windowsize_FFT):
+def process_movingFFT(ID, timerange, interval, windowsize_FFT, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データにおける気圧残差を求め、
@@ -60,6 +47,7 @@ def process_movingFFT(ID, timerange, interval, windowsize_FFT):
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT :パワースペクトルの移動平均を計算する際に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # ID に対応する sol および MUTC を取得
@@ -85,7 +73,7 @@ def process_movingFFT(ID, timerange, interval, windowsize_FFT):
         '''
         
         # FFT によるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, moving_fft_x, moving_fft_y = movingFFT(near_devildata, windowsize_FFT)
+        fft_x, fft_y, moving_fft_x, moving_fft_y = movingFFT(near_devildata, windowsize_FFT, estimator)
 
         return  fft_x, fft_y, moving_fft_x, moving_fft_y, sol
     
@@ -94,7 +82,7 @@ def process_movingFFT(ID, timerange, interval, windowsize_FFT):
         return None
 
 
-def plot_movingFFT(ID, timerange, interval, windowsize_FFT):
+def plot_movingFFT(ID, timerange, interval, windowsize_FFT, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データにおける気圧残差を求め、
@@ -107,10 +95,11 @@ def plot_movingFFT(ID, timerange, interval, windowsize_FFT):
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # パワースペクトルとその移動平均の導出
-        fft_x, fft_y, moving_fft_x, moving_fft_y, sol = process_movingFFT(ID, timerange, interval, windowsize_FFT)
+        fft_x, fft_y, moving_fft_x, moving_fft_y, sol = process_movingFFT(ID, timerange, interval, windowsize_FFT, estimator)
         
         # 音波と重力波の境界に該当する周波数
         params = Params()
@@ -152,5 +141,7 @@ if __name__ == "__main__":
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
     parser.add_argument('windowsize_FFT', type=int, 
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_movingFFT(args.ID, args.timerange, 20, args.windowsize_FFT)
\ No newline at end of file
+    plot_movingFFT(args.ID, args.timerange, 20, args.windowsize_FFT, args.estimator)
\ No newline at end of file
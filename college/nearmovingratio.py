@@ -8,6 +8,7 @@ import neardevil
 import nearFFT
 import nearmovingFFT
 import nearratio
+import movingave
 from Dispersion_Relation import Params
 
 def calculate_movingave(x, y, windowsize_ratio):
@@ -23,24 +24,14 @@ def calculate_movingave(x, y, windowsize_ratio):
     windowsize_ratio : yの移動平均に用いる窓数
     '''
 
-    # 移動平均用のフィルターを作成
-    filter_frame = np.ones(windowsize_ratio) / windowsize_ratio
-
-    # 欠損が発生する要素数の計算
-    pad_size = (windowsize_ratio - 1) // 2
-
-    # 形状を維持するため、配列を全てNanに変更(初期化)
-    moving_x = np.full(x.shape, np.nan)
-    moving_y = np.full(y.shape, np.nan)
-
-    # 有効な範囲の抽出及び計算
-    moving_x[pad_size:-pad_size] = x[pad_size:-pad_size]
-    moving_y[pad_size:-pad_size] = np.convolve(y, filter_frame, mode='valid')
+    # 累積和による移動平均 (計算できない範囲は NaN として形状を維持)
+    moving_x = movingave.pad_like(x, windowsize_ratio)
+    moving_y = movingave.moving_average(y, windowsize_ratio)
     
     return moving_x, moving_y
 
 
-def process_movingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio):
+def process_movingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データにおける気圧残差を求め、
@@ -51,6 +42,7 @@ def process_movingratio(ID, timerange, interval, windowsize_FFT, windowsize_rati
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # IDに対応するsol及びMUTCを取得
@@ -76,7 +68,7 @@ def process_movingratio(ID, timerange, interval, windowsize_FFT, windowsize_rati
         '''
         
         # FFTによるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(near_devildata, windowsize_FFT)
+        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(near_devildata, windowsize_FFT, estimator)
 
         # パワースペクトル比の算出
         moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
@@ -90,7 +82,7 @@ def process_movingratio(ID, timerange, interval, windowsize_FFT, windowsize_rati
         print(f"An error occurred: {e}")
         return None
 
-def plot_movingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio):
+def plot_movingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データにおける気圧残差を求め、
@@ -104,10 +96,11 @@ def plot_movingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio):
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 修正パワースペクトルの算出
-        moving_fft_x, moving_ratio, sol = process_movingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio)
+        moving_fft_x, moving_ratio, sol = process_movingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio, estimator)
 
         # 特定の周波数より高周波の情報をNaNに変更
         #moving_fft_x, ratio = nearratio.filter_xUlimit(moving_fft_x, ratio, 0.8)
@@ -151,5 +144,7 @@ if __name__ == "__main__":
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
     parser.add_argument('windowsize_ratio', type=int, 
                         help="The [windowsize] used to calculate the moving average of ratio") # パワースペクトル比のの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_movingratio(args.ID, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio)
\ No newline at end of file
+    plot_movingratio(args.ID, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio, args.estimator)
\ No newline at end of file
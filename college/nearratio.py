@@ -8,6 +8,7 @@ import dailychange_p
 import neardevil
 import nearFFT
 import nearmovingFFT
+import movingave
 from Dispersion_Relation import Params
 
 def calculate_ratio(x, y, y_movmean, windowsize_FFT):
@@ -21,13 +22,11 @@ def calculate_ratio(x, y, y_movmean, windowsize_FFT):
     windowsize_FFT : y_movmeanに用いた窓数(int)
     """
 
-    # 欠損が発生するデータ数を計算
-    pad_size = (windowsize_FFT - 1) // 2
-
-    # 有効な範囲を抽出
-    x = x[pad_size:-pad_size]
-    y = y[pad_size:-pad_size]
-    y_movmean = y_movmean[pad_size:-pad_size]
+    # 有効な範囲 (移動平均が計算できた範囲) を抽出
+    valid = movingave.valid_slice(len(x), windowsize_FFT)
+    x = x[valid]
+    y = y[valid]
+    y_movmean = y_movmean[valid]
 
     # 比を計算
     ratio = y / y_movmean
@@ -53,7 +52,7 @@ def filter_xUlimit(x, y, xUlimit):
 
     return x, y
 
-def process_ratio(ID, timerange, interval, windowsize_FFT):
+def process_ratio(ID, timerange, interval, windowsize_FFT, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データにおける気圧残差を求め、
@@ -63,6 +62,7 @@ def process_ratio(ID, timerange, interval, windowsize_FFT):
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # ID に対応する sol および MUTC を取得
@@ -88,7 +88,7 @@ def process_ratio(ID, timerange, interval, windowsize_FFT):
         '''
         
         # FFT によるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, _, moving_fft_y = nearmovingFFT.movingFFT(near_devildata, windowsize_FFT)
+        fft_x, fft_y, _, moving_fft_y = nearmovingFFT.movingFFT(near_devildata, windowsize_FFT, estimator)
 
         # パワースペクトル比の算出
         moving_fft_x, ratio = calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
@@ -99,7 +99,7 @@ def process_ratio(ID, timerange, interval, windowsize_FFT):
         print(f"An error occurred: {e}")
         return None
     
-def plot_ratio(ID, timerange, interval, windowsize_FFT):
+def plot_ratio(ID, timerange, interval, windowsize_FFT, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データにおける気圧残差を求め、
@@ -112,10 +112,11 @@ def plot_ratio(ID, timerange, interval, windowsize_FFT):
     timerange : 切り取る時間範囲 (秒) (int)
     interva : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # パワースペクトル比の算出
-        moving_fft_x, ratio, sol = process_ratio(ID, timerange, interval, windowsize_FFT)
+        moving_fft_x, ratio, sol = process_ratio(ID, timerange, interval, windowsize_FFT, estimator)
 
         # 特定の周波数より高周波の情報をNaNに変更
         #moving_fft_x, ratio = filter_xUlimit(moving_fft_x, ratio, 0.8)
@@ -156,5 +157,7 @@ if __name__ == "__main__":
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
     parser.add_argument('windowsize_FFT', type=int, 
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_ratio(args.ID, args.timerange, 20, args.windowsize_FFT)
\ No newline at end of file
+    plot_ratio(args.ID, args.timerange, 20, args.windowsize_FFT, args.estimator)
\ No newline at end of file
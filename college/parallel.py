@@ -0,0 +1,197 @@
+import os
+import time
+import argparse as argparse
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+import DATACATALOG
+import dailychange_p
+import spectracache
+
+def sol_chunks(IDlist, chunk_size=None):
+    '''
+    ID のリストを、同じ sol の事象が同じまとまりに入るように分割する関数。
+    まとまりは sol の昇順、まとまり内の ID は IDlist の順序とする。
+    ※chunk_size を指定した場合は、1つのまとまりが chunk_size 件程度になるよう、
+    続く sol のまとまりを結合する (sol の途中では分割しない)。
+
+    IDlist : ダストデビルの識別番号のリスト
+    chunk_size : 1つのまとまりの目安の件数 (int) ※None の場合は sol ごと
+    '''
+    datacatalog = DATACATALOG.process_datacatalog().set_index('ID')
+    sols = datacatalog.loc[list(IDlist), 'sol'].values
+
+    # sol ごとのまとまり (sol の昇順、まとまり内は元の順序)
+    groups = {}
+    for ID, sol in zip(IDlist, sols):
+        groups.setdefault(sol, []).append(ID)
+    chunks = [groups[sol] for sol in sorted(groups)]
+    if chunk_size is None:
+        return chunks
+
+    # 続く sol のまとまりを chunk_size 件程度まで結合
+    merged = []
+    for chunk in chunks:
+        if merged and len(merged[-1]) + len(chunk) <= chunk_size:
+            merged[-1] = merged[-1] + chunk
+        else:
+            merged.append(list(chunk))
+    return merged
+
+def _run_chunk(job):
+    '''
+    ワーカーで1つのまとまりの事象を処理する関数。
+    返り値は (ID, 結果, エラーメッセージ) のリスト。
+    ※ValueError は従来のループと同じく、その事象のみを除外する (メッセージを返す)。
+    それ以外の例外は呼び出し元へ送出する。
+
+    job : (func, IDs, args)
+    '''
+    func, IDs, args = job
+    outputs = []
+    # 同じ sol の時系列データの読み込みを1回にする
+    with dailychange_p.reuse_surround_dailydata():
+        for ID in IDs:
+            try:
+                outputs.append((ID, func(ID, *args), None))
+            except ValueError as e:
+                outputs.append((ID, None, str(e)))
+    return outputs
+
+def _init_worker(timeline_dir, initializer):
+    '''
+    ワーカーの起動時に、呼び出し元と同じ共有の時系列データを設定する関数。
+
+    timeline_dir : 共有の時系列データのディレクトリ ※None の場合は設定しない
+    initializer : 続けて実行する関数
+    '''
+    if timeline_dir is not None:
+        import timeline
+        timeline.attach(timeline_dir)
+    if initializer is not None:
+        initializer()
+
+def _disable_cache():
+    '''
+    ワーカーのディスクキャッシュを無効にする関数 (benchmark 用の initializer)。
+    '''
+    spectracache.ENABLED = False
+
+def iter_events(func, IDlist, args=(), workers=1, chunk_size=None, desc="Processing IDs", initializer=None):
+    '''
+    各 ID について func(ID, *args) を実行し、結果が得られた事象の (ID, 結果) を順に返すジェネレーター。
+    事象は sol ごとにまとめて (sol_chunks の順序で) 処理するため、
+    順序はプロセス数によらず一定で、同じ sol の読み込みは1回になる。
+    workers > 1 の場合は、まとまりをプロセスプールへ分配する。
+    ※func は pickle 可能なモジュールの関数とし、DataFrame ではなく配列 (のタプル) を返すこと。
+    func が ValueError を送出した事象は、メッセージを表示して除外する (従来のループと同じ)。
+
+    func : 1件の事象を処理する関数
+    IDlist : ダストデビルの識別番号のリスト
+    args : func に渡す ID 以外の引数 (tuple)
+    workers : 並列に実行するプロセス数 (int)
+    chunk_size : 1回に分配する事象数の目安 (int) ※None の場合は sol ごと (並列時は件数とプロセス数から決める)
+    desc : 進捗表示の説明 (str)
+    initializer : ワーカーの起動時に実行する関数
+    '''
+    IDlist = list(IDlist)
+    parallel = workers is not None and workers > 1
+    if parallel and chunk_size is None:
+        chunk_size = max(1, len(IDlist) // (workers * 8))
+    jobs = [(func, chunk, args) for chunk in sol_chunks(IDlist, chunk_size)]
+
+    with tqdm(total=len(IDlist), desc=desc) as progress:
+        if parallel:
+            # 共有の時系列データを設定済みの場合は、ワーカーも同じデータを参照する
+            shared = dailychange_p.shared_timeline()
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                           initargs=(None if shared is None else shared.directory, initializer))
+            futures = [executor.submit(_run_chunk, job) for job in jobs]
+            outputslist = (future.result() for future in futures)
+        else:
+            executor, futures = None, []
+            outputslist = map(_run_chunk, jobs)
+        try:
+            for job, outputs in zip(jobs, outputslist):
+                progress.update(len(job[1]))
+                for ID, result, error in outputs:
+                    if error is not None:
+                        print(error)
+                        continue
+                    yield ID, result
+        finally:
+            # 中断時は未着手のまとまりを取り消す (Python 3.8 でも使えるよう shutdown の cancel_futures は用いない)
+            for future in futures:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+def run_events(func, IDlist, args=(), workers=1, chunk_size=None, desc="Processing IDs", initializer=None):
+    '''
+    iter_events の結果をまとめ、IDlist の順序で返す関数。
+    返り値は (結果が得られた ID のリスト, 結果のリスト)。
+
+    func : 1件の事象を処理する関数
+    IDlist : ダストデビルの識別番号のリスト
+    args : func に渡す ID 以外の引数 (tuple)
+    workers : 並列に実行するプロセス数 (int)
+    chunk_size : 1回に分配する事象数の目安 (int)
+    desc : 進捗表示の説明 (str)
+    initializer : ワーカーの起動時に実行する関数
+    '''
+    IDlist = list(IDlist)
+    outputs = dict(iter_events(func, IDlist, args, workers, chunk_size, desc, initializer))
+    IDs = [ID for ID in IDlist if ID in outputs]
+    return IDs, [outputs[ID] for ID in IDs]
+
+def unzip(results, n):
+    '''
+    run_events の結果 (タプルのリスト) を、要素ごとの n 個のリストに分けて返す関数。
+
+    results : 結果のリスト
+    n : タプルの要素数 (int)
+    '''
+    if not results:
+        return tuple([] for _ in range(n))
+    return tuple(list(values) for values in zip(*results))
+
+def benchmark(func, IDlist, args=(), workerslist=(1, 2, 4, 8, 16, 32)):
+    '''
+    run_events の処理時間をプロセス数ごとに計測し、1プロセスに対する速度向上率を表示する関数。
+    ※ディスクキャッシュは無効にして計測する。
+    返り値は {プロセス数: 処理時間 (秒)} の辞書。
+
+    func : 1件の事象を処理する関数
+    IDlist : ダストデビルの識別番号のリスト
+    args : func に渡す ID 以外の引数 (tuple)
+    workerslist : 計測するプロセス数のリスト
+    '''
+    enabled = spectracache.ENABLED
+    spectracache.ENABLED = False
+    try:
+        elapsed = {}
+        for workers in workerslist:
+            begin = time.perf_counter()
+            IDs, values = run_events(func, IDlist, args, workers, initializer=_disable_cache, desc=f"workers={workers}")
+            elapsed[workers] = time.perf_counter() - begin
+    finally:
+        spectracache.ENABLED = enabled
+
+    base = elapsed[workerslist[0]]
+    print(f"events={len(IDlist)}, cpus={os.cpu_count()}")
+    for workers, seconds in elapsed.items():
+        print(f"workers={workers:>3}: {seconds:8.2f} s, speedup x{base / seconds:5.2f}")
+
+    return elapsed
+
+if __name__ == "__main__":
+    import eventspectra
+    import meanFFT_sorteddP
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dP_Ulimit', type=int,
+                        help="Serves as the standard for the upper limit of dP_ave(Negative int)") # dPの上限の指定(負)
+    parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32],
+                        help="Worker counts to benchmark") # 計測するプロセス数
+    args = parser.parse_args()
+    benchmark(eventspectra.process_residual, meanFFT_sorteddP.process_IDlist_dP(args.dP_Ulimit),
+              (args.timerange, 20), args.workers)
@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+from scipy import signal
+from fractions import Fraction
+from functools import lru_cache
+import time
+import argparse as argparse
+
+@lru_cache(maxsize=None)
+def design_filter(fs_in, fs_out):
+    '''
+    サンプリング周波数 fs_in から fs_out への変換に用いる
+    polyphase FIR フィルター (アンチエイリアス用の低域通過フィルター) を設計する関数。
+    ※設計結果は (fs_in, fs_out) ごとにメモリ上へキャッシュされる。
+
+    fs_in : 入力のサンプリング周波数 (Hz) (float)
+    fs_out : 出力のサンプリング周波数 (Hz) (float)
+    '''
+    # 変換比を既約分数 up/down で表現
+    ratio = Fraction(fs_out / fs_in).limit_denominator(1000)
+    up, down = ratio.numerator, ratio.denominator
+
+    # signal.resample_poly の既定値と同じ設計 (Kaiser 窓, β=5)
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    taps = signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0)) * up
+    taps.setflags(write=False)
+
+    return up, down, taps
+
+def decimate_batch(Y, fs_in, fs_out):
+    '''
+    等間隔の時系列データを、polyphase FIR フィルターで帯域制限しつつ
+    fs_in から fs_out へ変換する関数。(最終軸方向に一括処理)
+
+    Y : 時系列データ (ndarray, 1D または 窓数 × データ数 の 2D)
+    fs_in : 入力のサンプリング周波数 (Hz) (float)
+    fs_out : 出力のサンプリング周波数 (Hz) (float)
+    '''
+    up, down, taps = design_filter(fs_in, fs_out)
+
+    # 端点の過渡応答を抑えるため、直線で外挿して畳み込む
+    return signal.resample_poly(Y, up, down, axis=-1, window=taps, padtype='line')
+
+def estimate_sampling_freq(t):
+    '''
+    時刻列から元のサンプリング周波数を推定する関数。
+    ※欠測による間隔の飛びに影響されないよう、間隔の中央値を用いる。
+
+    t : 時刻 (秒) (array)
+    '''
+    return round(1 / np.median(np.diff(t)), 1)
+
+def split_gaps(t, fs_in, max_gap=3):
+    '''
+    時刻列を、サンプリング間隔の max_gap 倍を超える欠測で区切り、
+    連続した区間ごとの [開始, 終了) のインデックスのリストを返す関数。
+
+    t : 時刻 (秒) (array)
+    fs_in : サンプリング周波数 (Hz) (float)
+    max_gap : 欠測とみなす間隔 (サンプリング間隔の倍数) (float)
+    '''
+    # 丸め誤差で間隔がちょうど max_gap 倍の点を欠測とみなさないよう、わずかな余裕を持たせる
+    breaks = np.flatnonzero(np.diff(t) * fs_in > max_gap + 1e-6) + 1
+    bounds = np.concatenate([[0], breaks, [len(t)]])
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def data_decimate(data, s, max_gap=3):
+    '''
+    与えられた時系列データを、polyphase FIR フィルターによる
+    アンチエイリアス処理を施したうえで s 秒間隔に変換する関数。
+    ※meanFFT_sortedseason.data_resample (区間平均) の代替。
+    ※サンプリング間隔の max_gap 倍を超える欠測がある場合は、欠測の前後の区間を別々に変換し、
+    欠測にかかる時刻は NaN とする。(区間平均と同様に、欠測を補間で埋めない)
+
+    data : フィルタリング済みの時系列データ (DataFrame)
+    s : 秒 (float)
+    max_gap : 欠測とみなす間隔 (サンプリング間隔の倍数) (float)
+    '''
+    new_data = data.copy()
+
+    #「MUTC」カラムをdatetime型に変換し、欠損値を含む行を削除
+    new_data["MUTC"] = pd.to_datetime(new_data["MUTC"], format="%Y-%m-%d %H:%M:%S.%f")
+    new_data = new_data.dropna(subset=['p'])
+    if len(new_data) < 2:
+        raise ValueError("Not enough data to decimate.")
+
+    # 先頭からの経過時間 (秒)
+    start = new_data["MUTC"].iloc[0]
+    t = (new_data["MUTC"] - start).dt.total_seconds().values
+    p = new_data["p"].values
+
+    # 欠測で区切られた区間
+    fs_in = estimate_sampling_freq(t)
+    segments = split_gaps(t, fs_in, max_gap)
+
+    if len(segments) == 1:
+        # 元のサンプリング周波数の等間隔格子へ線形補間
+        t_uniform = np.arange(0, t[-1], 1 / fs_in)
+        p_uniform = np.interp(t_uniform, t, p)
+
+        # polyphase FIR フィルターによる間引き
+        p_decimated = decimate_batch(p_uniform, fs_in, 1 / s)
+    else:
+        # 区間ごとに、出力の時刻 (s 秒の倍数) にそろえた格子で間引き、欠測部分は NaN のまま残す
+        p_decimated = np.full(int(np.ceil(t[-1] / s)), np.nan)
+        for begin, end in segments:
+            t_start = np.ceil(t[begin] / s) * s
+            t_uniform = np.arange(t_start, t[end - 1], 1 / fs_in)
+            if len(t_uniform) < 2:
+                continue
+            segment = decimate_batch(np.interp(t_uniform, t[begin:end], p[begin:end]), fs_in, 1 / s)
+            # 区間の最後の観測時刻より後 (欠測にかかる時刻) は除外
+            first = int(round(t_start / s))
+            n_keep = int(np.floor((t[end - 1] - t_start) / s + 1e-9)) + 1
+            segment = segment[:min(n_keep, len(p_decimated) - first)]
+            p_decimated[first:first + len(segment)] = segment
+
+    # 時刻列の再構成
+    MUTC = start + pd.to_timedelta(np.arange(len(p_decimated)) * s, unit='s')
+    new_data = pd.DataFrame({"MUTC": MUTC, "p": p_decimated})
+
+    return new_data
+
+def make_tone_data(n_windows, timerange, fs_in, tone_Hz, alias_Hz, seed=0):
+    '''
+    ベンチマーク用に、帯域内の正弦波と
+    変換後のナイキスト周波数を超える正弦波を重ねた合成データを作成する関数。
+
+    n_windows : 窓数 (int)
+    timerange : 窓の長さ (秒) (int)
+    fs_in : サンプリング周波数 (Hz) (float)
+    tone_Hz : 帯域内の正弦波の周波数 (Hz) (float)
+    alias_Hz : 折り返しを起こす正弦波の周波数 (Hz) (float)
+    seed : 乱数のシード (int)
+    '''
+    rng = np.random.default_rng(seed)
+    t = np.arange(0, timerange, 1 / fs_in)
+    start = pd.Timestamp("2019-01-01 12:00:00")
+    datalist = []
+    for _ in range(n_windows):
+        phase = rng.uniform(0, 2 * np.pi, 2)
+        p = 700 + np.sin(2 * np.pi * tone_Hz * t + phase[0]) + np.sin(2 * np.pi * alias_Hz * t + phase[1])
+        datalist.append(pd.DataFrame({"MUTC": start + pd.to_timedelta(t, unit='s'), "p": p}))
+    return datalist
+
+def leakage_dB(p, s, tone_Hz, alias_Hz):
+    '''
+    間引き後のデータについて、帯域内の正弦波に対する
+    折り返し成分のパワー比 (dB) を算出する関数。
+
+    p : 間引き後の気圧 (array)
+    s : サンプリング間隔 (秒) (float)
+    tone_Hz : 帯域内の正弦波の周波数 (Hz) (float)
+    alias_Hz : 折り返しを起こす正弦波の周波数 (Hz) (float)
+    '''
+    fs_out = 1 / s
+    alias_at = abs(alias_Hz - fs_out * round(alias_Hz / fs_out))
+    fft_x, fft_y = signal.periodogram(p - np.mean(p), fs=fs_out, window='hann')
+    tone_power = fft_y[np.argmin(np.abs(fft_x - tone_Hz))]
+    alias_power = fft_y[np.argmin(np.abs(fft_x - alias_at))]
+    return 10 * np.log10(alias_power / tone_power)
+
+def benchmark_decimate(n_windows=200, timerange=600, fs_in=10.0, s=0.5, tone_Hz=0.2, alias_Hz=1.7):
+    '''
+    区間平均による resample (meanFFT_sortedseason.data_resample) と
+    polyphase FIR による間引きについて、処理時間と折り返し成分の大きさを比較する関数。
+
+    n_windows : 窓数 (int)
+    timerange : 窓の長さ (秒) (int)
+    fs_in : サンプリング周波数 (Hz) (float)
+    s : 変換後のサンプリング間隔 (秒) (float)
+    tone_Hz : 帯域内の正弦波の周波数 (Hz) (float)
+    alias_Hz : 折り返しを起こす正弦波の周波数 (Hz) (float)
+    '''
+    import meanFFT_sortedseason
+    datalist = make_tone_data(n_windows, timerange, fs_in, tone_Hz, alias_Hz)
+
+    # 区間平均による resample
+    begin = time.perf_counter()
+    mean_list = [meanFFT_sortedseason.data_resample(data, s)['p'].values for data in datalist]
+    mean_time = time.perf_counter() - begin
+
+    # polyphase FIR による間引き (窓ごと)
+    begin = time.perf_counter()
+    poly_list = [data_decimate(data, s)['p'].values for data in datalist]
+    poly_time = time.perf_counter() - begin
+
+    # polyphase FIR による間引き (窓をまとめて一括処理)
+    Y = np.array([data['p'].values for data in datalist])
+    begin = time.perf_counter()
+    decimate_batch(Y, fs_in, 1 / s)
+    batch_time = time.perf_counter() - begin
+
+    mean_leak = np.mean([leakage_dB(p, s, tone_Hz, alias_Hz) for p in mean_list])
+    poly_leak = np.mean([leakage_dB(p, s, tone_Hz, alias_Hz) for p in poly_list])
+
+    print(f"windows={n_windows}, timerange={timerange}s, {fs_in}Hz -> {1/s}Hz")
+    print(f"data_resample   : {mean_time:.3f} s, alias leakage {mean_leak:.1f} dB")
+    print(f"data_decimate   : {poly_time:.3f} s, alias leakage {poly_leak:.1f} dB")
+    print(f"decimate_batch  : {batch_time:.3f} s")
+
+    return {'mean': (mean_time, mean_leak), 'polyphase': (poly_time, poly_leak), 'batch': batch_time}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_windows', type=int, default=200, help="Number of synthetic windows") # 窓数
+    parser.add_argument('--timerange', type=int, default=600, help='timerang(s)') # 窓の長さ(秒)
+    parser.add_argument('--fs_in', type=float, default=10.0, help="Input sampling frequency(Hz)") # 入力のサンプリング周波数
+    args = parser.parse_args()
+    benchmark_decimate(args.n_windows, args.timerange, args.fs_in)
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+import os
+import time
+import contextlib
+import argparse as argparse
+
+# 選択可能な浮動小数点の精度
+DTYPES = {'float64': np.float64, 'float32': np.float32}
+
+# パイプライン全体で用いる精度 (環境変数 EXPLORE_DTYPE で切り替え可能)
+DTYPE = DTYPES[os.environ.get('EXPLORE_DTYPE', 'float64')]
+
+# 総和・累積和など、桁落ちしやすい演算に用いる精度
+ACCUMULATE_DTYPE = np.float64
+
+def set_dtype(name):
+    '''
+    パイプライン全体で用いる精度を設定する関数。
+    (読み込み・残差・FFT・移動平均・ケース平均に反映される)
+
+    name : 'float64' または 'float32' (str)
+    '''
+    global DTYPE
+    if name not in DTYPES:
+        raise ValueError(f"Unknown dtype: {name}")
+    DTYPE = DTYPES[name]
+
+@contextlib.contextmanager
+def use_dtype(name):
+    '''
+    with 文の範囲のみ、パイプライン全体で用いる精度を切り替える関数。
+
+    name : 'float64' または 'float32' (str)
+    '''
+    previous = np.dtype(DTYPE).name
+    set_dtype(name)
+    try:
+        yield
+    finally:
+        set_dtype(previous)
+
+def as_dtype(x):
+    '''
+    配列を現在の精度に変換する関数。
+    ※既に同じ精度であればコピーは作らない。
+
+    x : 変換する配列 (array)
+    '''
+    return np.asarray(x, dtype=DTYPE)
+
+def result_dtype(x):
+    '''
+    計算結果を返す際の精度を返す関数。
+    入力が float32 であれば float32、それ以外は float64 とする。
+
+    x : 入力の配列 (ndarray)
+    '''
+    return np.float32 if np.asarray(x).dtype == np.float32 else np.float64
+
+def make_synthetic_data(n_windows, timerange, sampling_freq=2.0, seed=0):
+    '''
+    精度比較用に、平均 700 Pa のランダムウォークに
+    正弦波を重ねた気圧の合成データを作成する関数。
+
+    n_windows : 窓数 (int)
+    timerange : 窓の長さ (秒) (int)
+    sampling_freq : サンプリング周波数 (Hz) (float)
+    seed : 乱数のシード (int)
+    '''
+    rng = np.random.default_rng(seed)
+    t = np.arange(0, timerange, 1 / sampling_freq)
+    start = pd.Timestamp("2019-01-01 12:00:00")
+    datalist = []
+    for _ in range(n_windows):
+        p = 700 + np.cumsum(rng.normal(0, 0.01, len(t))) + 0.05 * np.sin(2 * np.pi * 0.1 * t + rng.uniform(0, 2 * np.pi))
+        # センサーの分解能 (0.001 Pa) に丸める
+        datalist.append(pd.DataFrame({"MUTC": start + pd.to_timedelta(t, unit='s'), "p": np.round(p, 3)}))
+    return datalist
+
+def run_pipeline(datalist, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
+    '''
+    現在の精度で、残差計算 → FFT → 移動平均 → 比 → ケース平均 を実行する関数。
+    返り値は (周波数軸, パワースペクトル, 修正パワースペクトル のケース平均) と使用メモリ (バイト)。
+    ※使用メモリは窓ごとの配列と、ケース平均のために積み重ねた配列 (ケース数 × 周波数) の合計。
+
+    datalist : フィルタリング済みの時系列データ (DataFrame) のリスト
+    windowsize_FFT : パワースペクトルの移動平均に用いる窓数 (int)
+    windowsize_ratio : パワースペクトル比の移動平均に用いる窓数 (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    '''
+    import nearFFT
+    import nearmovingFFT
+    import nearratio
+    import nearmovingratio
+    import meanmovingFFT_sorteddP
+
+    fft_ylist, moving_ratiolist, nbytes = [], [], 0
+    for data in datalist:
+        data = data.copy()
+        data['p'] = as_dtype(data['p'].values)
+        data = nearFFT.calculate_residual(data)
+        fft_x, fft_y, moving_fft_x, moving_fft_y = nearmovingFFT.movingFFT(data, windowsize_FFT, estimator)
+        moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
+        moving_fft_x, moving_ratio = nearmovingratio.calculate_movingave(moving_fft_x, ratio, windowsize_ratio)
+        fft_ylist.append(fft_y)
+        moving_ratiolist.append(moving_ratio)
+        nbytes += data['residual'].values.nbytes + fft_y.nbytes + moving_fft_y.nbytes + moving_ratio.nbytes
+
+    fft_y = meanmovingFFT_sorteddP.process_arrays(fft_ylist, np.nanmean)
+    moving_ratio = meanmovingFFT_sorteddP.process_arrays(moving_ratiolist, np.nanmean)
+
+    # process_arrays で積み重ねる配列 (入力の精度のまま)
+    nbytes += sum(y.nbytes for y in fft_ylist) + sum(y.nbytes for y in moving_ratiolist)
+
+    return fft_x, fft_y, moving_ratio, nbytes
+
+def relative_error(x, reference):
+    '''
+    基準値 reference に対する x の相対誤差 (最大値, 中央値) を返す関数。
+    ※NaN を含む点は除く。
+
+    x : 比較する配列 (array)
+    reference : 基準となる配列 (array)
+    '''
+    x, reference = np.asarray(x, dtype=np.float64), np.asarray(reference, dtype=np.float64)
+    valid = np.isfinite(x) & np.isfinite(reference) & (reference != 0)
+    error = np.abs(x[valid] - reference[valid]) / np.abs(reference[valid])
+    return error.max(), np.median(error)
+
+def accuracy_report(datalist, windowsize_FFT=21, windowsize_ratio=11, estimator='periodogram'):
+    '''
+    float64 と float32 でパイプラインを実行し、
+    パワースペクトルと修正パワースペクトルの相対誤差、処理時間、使用メモリを比較する関数。
+
+    datalist : フィルタリング済みの時系列データ (DataFrame) のリスト
+    windowsize_FFT : パワースペクトルの移動平均に用いる窓数 (int)
+    windowsize_ratio : パワースペクトル比の移動平均に用いる窓数 (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    '''
+    results = {}
+    for name in ['float64', 'float32']:
+        with use_dtype(name):
+            begin = time.perf_counter()
+            fft_x, fft_y, moving_ratio, nbytes = run_pipeline(datalist, windowsize_FFT, windowsize_ratio, estimator)
+            results[name] = (fft_y, moving_ratio, nbytes, time.perf_counter() - begin)
+
+    fft_y64, ratio64, nbytes64, time64 = results['float64']
+    fft_y32, ratio32, nbytes32, time32 = results['float32']
+    # 直流成分は平均除去後の丸め誤差のみとなるため比較から除く
+    # (修正パワースペクトルは、移動平均の窓が直流成分を含む範囲も除く)
+    skip = windowsize_FFT + windowsize_ratio
+    fft_max, fft_median = relative_error(fft_y32[1:], fft_y64[1:])
+    ratio_max, ratio_median = relative_error(ratio32[skip:], ratio64[skip:])
+
+    print(f"windows={len(datalist)}, estimator={estimator}")
+    print(f"power spectrum : max rel. error {fft_max:.2e}, median {fft_median:.2e}")
+    print(f"moving ratio   : max rel. error {ratio_max:.2e}, median {ratio_median:.2e}")
+    print(f"memory         : float64 {nbytes64 / 1e6:.1f} MB, float32 {nbytes32 / 1e6:.1f} MB")
+    print(f"time           : float64 {time64:.3f} s, float32 {time32:.3f} s")
+
+    return {'fft_y': (fft_max, fft_median), 'moving_ratio': (ratio_max, ratio_median),
+            'nbytes': (nbytes64, nbytes32), 'time': (time64, time32)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_windows', type=int, default=200, help="Number of synthetic windows") # 窓数
+    parser.add_argument('--timerange', type=int, default=600, help='timerang(s)') # 窓の長さ(秒)
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
+    args = parser.parse_args()
+    accuracy_report(make_synthetic_data(args.n_windows, args.timerange), estimator=args.estimator)
@@ -9,6 +9,7 @@ import neardevil
 import afterdevil
 import afterFFT
 import returnafterdevil
+import precision
 from Dispersion_Relation import Params
 import pandas as pd
 
@@ -31,12 +32,12 @@ def calculate_returnafterresidual(data):
     a, b = np.polyfit(t, p, 1)
     new_data["p-pred"] = a*t + b
 
-    # 残差の計算
-    new_data["residual"] = p - new_data['p-pred']
+    # 残差の計算 (回帰は float64 で行い、残差はパイプラインの精度に変換)
+    new_data["residual"] = precision.as_dtype(p - new_data['p-pred'].values)
 
     return new_data
 
-def process_returnafterFFT(ID, timerange, interval):
+def process_returnafterFFT(ID, timerange, interval, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データにおける気圧残差を求め、
@@ -45,6 +46,7 @@ def process_returnafterFFT(ID, timerange, interval):
     ID : ダストデビルの識別番号 (int)
     timerange: 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # ID に対応する sol および MUTC を取得
@@ -70,7 +72,7 @@ def process_returnafterFFT(ID, timerange, interval):
         '''
 
         # FFT によるパワースペクトルの導出
-        fft_x, fft_y = afterFFT.after_FFT(after_devildata)
+        fft_x, fft_y = afterFFT.after_FFT(after_devildata, estimator)
 
         return fft_x, fft_y, sol
     
@@ -78,7 +80,7 @@ def process_returnafterFFT(ID, timerange, interval):
         print(f"An error occurred: {e}")
         return None
 
-def plot_returnafterFFT(ID, timerange, interval):
+def plot_returnafterFFT(ID, timerange, interval, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データにおける気圧残差を求め、
@@ -90,10 +92,11 @@ def plot_returnafterFFT(ID, timerange, interval):
     ID : ダストデビルの識別番号 (int)
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # パワースペクトルの導出
-        fft_x, fft_y, sol = process_returnafterFFT(ID, timerange, interval)
+        fft_x, fft_y, sol = process_returnafterFFT(ID, timerange, interval, estimator)
         
         # 音波と重力波の境界に該当する周波数
         params = Params()
@@ -131,5 +134,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('ID', type=int, help="ID") # IDの指定
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_returnafterFFT(args.ID, args.timerange, 20)
\ No newline at end of file
+    plot_returnafterFFT(args.ID, args.timerange, 20, args.estimator)
\ No newline at end of file
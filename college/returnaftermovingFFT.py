@@ -13,7 +13,7 @@ import aftermovingFFT
 import returnafterFFT
 from Dispersion_Relation import Params
 
-def process_returnaftermovingFFT(ID, timerange, interval, windowsize_FFT):
+def process_returnaftermovingFFT(ID, timerange, interval, windowsize_FFT, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直前の
     時系列データにおける気圧残差を求め、
@@ -23,6 +23,7 @@ def process_returnaftermovingFFT(ID, timerange, interval, windowsize_FFT):
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT :パワースペクトルの移動平均を計算する際に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # ID に対応する sol および MUTC を取得
@@ -48,7 +49,7 @@ def process_returnaftermovingFFT(ID, timerange, interval, windowsize_FFT):
         '''
 
         # FFT によるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, moving_fft_x, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT)
+        fft_x, fft_y, moving_fft_x, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT, estimator)
 
         return  fft_x, fft_y, moving_fft_x, moving_fft_y, sol
     
@@ -56,7 +57,7 @@ def process_returnaftermovingFFT(ID, timerange, interval, windowsize_FFT):
         print(f"An error occurred: {e}")
         return None
 
-def plot_returnaftermovingFFT(ID, timerange, interval, windowsize_FFT):
+def plot_returnaftermovingFFT(ID, timerange, interval, windowsize_FFT, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データにおける気圧残差を求め、
@@ -69,10 +70,11 @@ def plot_returnaftermovingFFT(ID, timerange, interval, windowsize_FFT):
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # パワースペクトルとその移動平均の導出
-        fft_x, fft_y, moving_fft_x, moving_fft_y, sol = process_returnaftermovingFFT(ID, timerange, interval, windowsize_FFT)
+        fft_x, fft_y, moving_fft_x, moving_fft_y, sol = process_returnaftermovingFFT(ID, timerange, interval, windowsize_FFT, estimator)
         
         # 音波と重力波の境界に該当する周波数
         params = Params()
@@ -114,5 +116,7 @@ if __name__ == "__main__":
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
     parser.add_argument('windowsize_FFT', type=int, 
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_returnaftermovingFFT(args.ID, args.timerange, 20, args.windowsize_FFT)
\ No newline at end of file
+    plot_returnaftermovingFFT(args.ID, args.timerange, 20, args.windowsize_FFT, args.estimator)
\ No newline at end of file
@@ -13,7 +13,7 @@ import aftermovingFFT
 import returnafterFFT
 from Dispersion_Relation import Params
 
-def process_returnaftermovingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio):
+def process_returnaftermovingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データにおける気圧残差を求め、
@@ -24,6 +24,7 @@ def process_returnaftermovingratio(ID, timerange, interval, windowsize_FFT, wind
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # ID に対応する sol および MUTC を取得
@@ -49,7 +50,7 @@ def process_returnaftermovingratio(ID, timerange, interval, windowsize_FFT, wind
         '''
 
         # FFT によるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, _, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT)
+        fft_x, fft_y, _, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT, estimator)
         
         # パワースペクトル比の算出
         moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
@@ -63,7 +64,7 @@ def process_returnaftermovingratio(ID, timerange, interval, windowsize_FFT, wind
         print(f"An error occurred: {e}")
         return None
 
-def plot_returnaftermovingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio):
+def plot_returnaftermovingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データにおける気圧残差を求め、
@@ -77,10 +78,11 @@ def plot_returnaftermovingratio(ID, timerange, interval, windowsize_FFT, windows
     interva : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 修正パワースペクトルの算出
-        moving_fft_x, moving_ratio, sol = process_returnaftermovingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio)
+        moving_fft_x, moving_ratio, sol = process_returnaftermovingratio(ID, timerange, interval, windowsize_FFT, windowsize_ratio, estimator)
 
         # 特定の周波数より高周波の情報をnanに変更
         #moving_fft_x, ratio = nearratio.filter_xUlimit(moving_fft_x, ratio, 0.8)
@@ -124,5 +126,7 @@ if __name__ == "__main__":
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
     parser.add_argument('windowsize_ratio', type=int, 
                         help="The [windowsize] used to calculate the moving average of ratio") # パワースペクトル比のの移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_returnaftermovingratio(args.ID, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio)
\ No newline at end of file
+    plot_returnaftermovingratio(args.ID, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio, args.estimator)
\ No newline at end of file
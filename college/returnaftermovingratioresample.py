@@ -14,7 +14,7 @@ import returnafterFFT
 import meanFFT_sortedseason
 from Dispersion_Relation import Params
 
-def process_returnaftermovingratio_resample(ID, timerange, interval, windowsize_FFT, windowsize_ratio):
+def process_returnaftermovingratio_resample(ID, timerange, interval, windowsize_FFT, windowsize_ratio, method='mean', estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データ(0.5秒間隔でリサンプリング済)における気圧残差を求め、
@@ -25,6 +25,8 @@ def process_returnaftermovingratio_resample(ID, timerange, interval, windowsize_
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    method : resample の方法 ('mean' : 区間平均, 'polyphase' : polyphase FIR による間引き) (str)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # ID に対応する sol および MUTC を取得
@@ -41,7 +43,7 @@ def process_returnaftermovingratio_resample(ID, timerange, interval, windowsize_
             raise ValueError("No data available after filtering.")
 
         #0.5秒間隔でresample
-        after_devildata = meanFFT_sortedseason.data_resample(after_devildata, 0.5)
+        after_devildata = meanFFT_sortedseason.data_resample(after_devildata, 0.5, method)
 
         # 残差計算の実施
         after_devildata = returnafterFFT.calculate_returnafterresidual(after_devildata)
@@ -53,7 +55,7 @@ def process_returnaftermovingratio_resample(ID, timerange, interval, windowsize_
         '''
 
         # FFT によるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, _, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT)
+        fft_x, fft_y, _, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT, estimator)
         
         # パワースペクトル比の算出
         moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
@@ -67,7 +69,7 @@ def process_returnaftermovingratio_resample(ID, timerange, interval, windowsize_
         print(f"An error occurred: {e}")
         return None
 
-def plot_returnaftermovingratio_resample(ID, timerange, interval, windowsize_FFT, windowsize_ratio):
+def plot_returnaftermovingratio_resample(ID, timerange, interval, windowsize_FFT, windowsize_ratio, method='mean', estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データ(0.5秒間隔でリサンプリング済)における気圧残差を求め、
@@ -81,10 +83,12 @@ def plot_returnaftermovingratio_resample(ID, timerange, interval, windowsize_FFT
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
     windowsize_ratio : パワースペクトル比の移動平均に用いる窓数(int)
+    method : resample の方法 ('mean' : 区間平均, 'polyphase' : polyphase FIR による間引き) (str)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # 修正パワースペクトルの算出
-        moving_fft_x, moving_ratio, sol = process_returnaftermovingratio_resample(ID, timerange, interval, windowsize_FFT, windowsize_ratio)
+        moving_fft_x, moving_ratio, sol = process_returnaftermovingratio_resample(ID, timerange, interval, windowsize_FFT, windowsize_ratio, method, estimator)
 
         # 特定の周波数より高周波の情報をnanに変更
         #moving_fft_x, ratio = nearratio.filter_xUlimit(moving_fft_x, ratio, 0.8)
@@ -128,5 +132,9 @@ if __name__ == "__main__":
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
     parser.add_argument('windowsize_ratio', type=int, 
                         help="The [windowsize] used to calculate the moving average of ratio") # パワースペクトル比のの移動平均に用いる窓数
+    parser.add_argument('--method', type=str, default='mean', choices=['mean', 'polyphase'],
+                        help="Resampling method") # resampleの方法
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_returnaftermovingratio_resample(args.ID, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio)
\ No newline at end of file
+    plot_returnaftermovingratio_resample(args.ID, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio, args.method, args.estimator)
\ No newline at end of file
@@ -12,7 +12,7 @@ import aftermovingFFT
 import returnafterFFT
 from Dispersion_Relation import Params
 
-def process_returnafterratio(ID, timerange, interval, windowsize_FFT):
+def process_returnafterratio(ID, timerange, interval, windowsize_FFT, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データにおける気圧残差を求め、
@@ -22,6 +22,7 @@ def process_returnafterratio(ID, timerange, interval, windowsize_FFT):
     timerange : 切り取る時間範囲 (秒) (int)
     interval : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # ID に対応する sol および MUTC を取得
@@ -47,7 +48,7 @@ def process_returnafterratio(ID, timerange, interval, windowsize_FFT):
         '''
 
         # FFT によるパワースペクトルとその移動平均の導出
-        fft_x, fft_y, _, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT)
+        fft_x, fft_y, _, moving_fft_y = aftermovingFFT.after_movingFFT(after_devildata, windowsize_FFT, estimator)
 
         #パワースペクトル比の算出
         moving_fft_x, ratio = nearratio.calculate_ratio(fft_x, fft_y, moving_fft_y, windowsize_FFT)
@@ -58,7 +59,7 @@ def process_returnafterratio(ID, timerange, interval, windowsize_FFT):
         print(f"An error occurred: {e}")
         return None
 
-def plot_returnafterratio(ID, timerange, interval, windowsize_FFT):
+def plot_returnafterratio(ID, timerange, interval, windowsize_FFT, estimator='periodogram'):
     '''
     指定された ID に対応する MUTC (ダストデビル発生時刻)直後の
     時系列データにおける気圧残差を求め、
@@ -72,10 +73,11 @@ def plot_returnafterratio(ID, timerange, interval, windowsize_FFT):
     timerange : 切り取る時間範囲 (秒) (int)
     interva : 開始オフセット (秒) (int)
     windowsize_FFT : パワースペクトルの移動平均に用いる窓数(int)
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
     '''
     try:
         # パワースペクトル比を導出
-        moving_fft_x, ratio, sol = process_returnafterratio(ID, timerange, interval, windowsize_FFT)
+        moving_fft_x, ratio, sol = process_returnafterratio(ID, timerange, interval, windowsize_FFT, estimator)
 
         # 特定の周波数より高周波の情報をnanに変更
         #moving_fft_x, ratio = nearrato.filter_xUlimit(moving_fft_x, ratio, 0.8)
@@ -116,5 +118,7 @@ if __name__ == "__main__":
     parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
     parser.add_argument('windowsize_FFT', type=int, 
                         help="The [windowsize] used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
     args = parser.parse_args()
-    plot_returnafterratio(args.ID, args.timerange, 20, args.windowsize_FFT)
\ No newline at end of file
+    plot_returnafterratio(args.ID, args.timerange, 20, args.windowsize_FFT, args.estimator)
\ No newline at end of file
@@ -0,0 +1,354 @@
+import numpy as np
+import json
+import os
+import time
+import argparse as argparse
+import ensemble
+import parallel
+import spectracache
+
+# 分割した集計 (部分結果) の既定の保存先 ※複数ノードで共有するファイルシステム上を指定する
+SHARD_DIR = os.path.expanduser(os.environ.get('EXPLORE_SHARD_DIR', '~/.cache/explore/shards'))
+
+# 途中経過 (チェックポイント) の既定の保存先
+CHECKPOINT_DIR = os.path.expanduser(os.environ.get('EXPLORE_CHECKPOINT_DIR', '~/.cache/explore/checkpoints'))
+
+# 途中経過を保存する間隔 (秒)
+CHECKPOINT_INTERVAL = 300
+
+# 部分結果の形式の版
+VERSION = 1
+
+def parse_shard(text):
+    '''
+    "i/n" 形式の文字列を (i, n) に変換する関数。(0 ≦ i < n)
+    ※argparse の type に指定できるよう、不正な場合は ValueError を送出する。
+
+    text : 分割の指定 (str) 例: "0/4"
+    '''
+    try:
+        index, n_shards = (int(value) for value in text.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must be given as i/n: {text}")
+    if n_shards < 1 or not 0 <= index < n_shards:
+        raise ValueError(f"Shard index must satisfy 0 <= i < n: {text}")
+    return index, n_shards
+
+def select_chunks(IDlist, shard=None):
+    '''
+    ID のリストを sol ごとのまとまり (parallel.sol_chunks) に分け、
+    指定された分割が担当する (まとまりの番号, ID のリスト) のリストを返す関数。
+    ※まとまりを sol の順に n 個おきに割り当てるため、分割は IDlist のみで決まり、
+    各分割の季節・事象数の偏りが小さくなる。
+
+    IDlist : ダストデビルの識別番号のリスト
+    shard : 分割の指定 (i, n) ※None の場合は全てのまとまり
+    '''
+    indexed = list(enumerate(parallel.sol_chunks(list(IDlist))))
+    if shard is None:
+        return indexed
+    index, n_shards = shard
+    return indexed[index::n_shards]
+
+def iter_accumulators(func, IDlist, args=(), workers=1, shard=None, sketch=None, skip=(), desc="Processing IDs"):
+    '''
+    各 ID について func(ID, *args) で (周波数軸, スペクトル) を求め、
+    sol ごとのまとまりの集計 (ensemble.SpectrumAccumulator) を
+    (まとまりの番号, 集計) として sol の順に返すジェネレーター。
+    ※集計はまとまりごとに独立しているため、分割して実行した結果も fold で同じ値に統合できる。
+    スペクトルが1件も得られなかったまとまりは返さない。
+    sketch にはまとまりごとに集計した度数を返す直前に加えるため、
+    返した時点の sketch は返したまとまりまでの集計と一致する (Checkpoint 参照)。
+
+    func : 1件の事象を処理する関数 (parallel.iter_events 参照)
+    IDlist : ダストデビルの識別番号のリスト
+    args : func に渡す ID 以外の引数 (tuple)
+    workers : 並列に実行するプロセス数 (int)
+    shard : 分割の指定 (i, n) ※None の場合は全てのまとまり
+    sketch : 分位点の集計 (ensemble.QuantileSketch) ※指定した場合は各スペクトルを加える
+    skip : 処理済みとして除外するまとまりの番号
+    desc : 進捗表示の説明 (str)
+    '''
+    skip = set(skip)
+    selected = [(index, IDs) for index, IDs in select_chunks(IDlist, shard) if index not in skip]
+    chunk_of = {ID: index for index, IDs in selected for ID in IDs}
+
+    # まとまりごとの分位点の集計 (sketch と同じパラメータ)
+    def new_sketch():
+        if sketch is None:
+            return None
+        return ensemble.QuantileSketch(sketch.relative_accuracy, sketch.min_value, sketch.max_value)
+
+    # まとまりの集計を返す直前に sketch へ加える (長さが一致しない場合は除外)
+    def merge_sketch(chunk_sketch):
+        if sketch is None:
+            return
+        try:
+            sketch.merge(chunk_sketch)
+        except ValueError as e:
+            print(e)
+
+    current, accumulator, chunk_sketch = None, None, None
+    for ID, (fft_x, y) in parallel.iter_events(func, [ID for _, IDs in selected for ID in IDs], args, workers, desc=desc):
+        if chunk_of[ID] != current:
+            if accumulator is not None and accumulator.n_cases > 0:
+                merge_sketch(chunk_sketch)
+                yield current, accumulator
+            current, accumulator, chunk_sketch = chunk_of[ID], ensemble.SpectrumAccumulator(), new_sketch()
+        try:
+            # 結果を集計 (周波数軸が一致しない場合は ValueError)
+            accumulator.add(y, fft_x)
+            if chunk_sketch is not None:
+                chunk_sketch.add(y)
+        except ValueError as e:
+            print(e)
+            continue
+    if accumulator is not None and accumulator.n_cases > 0:
+        merge_sketch(chunk_sketch)
+        yield current, accumulator
+
+def fold(accumulators, total=None):
+    '''
+    まとまりごとの集計を、与えられた順 (まとまりの番号の順) に1つへ統合する関数。
+    ※統合の順序が同じであれば、1ノードでの実行と分割した実行の結果は一致する。
+    周波数軸が一致しないまとまりは除外する。
+
+    accumulators : (まとまりの番号, SpectrumAccumulator) の列
+    total : 統合先の集計 ※None の場合は新たに作成する
+    '''
+    if total is None:
+        total = ensemble.SpectrumAccumulator()
+    for index, accumulator in accumulators:
+        try:
+            total.merge(accumulator)
+        except ValueError as e:
+            print(f"chunk {index}: {e}")
+    return total
+
+def shard_path(directory, shard):
+    '''
+    分割 (i, n) の部分結果のファイルのパスを返す関数。
+
+    directory : 保存先のディレクトリ
+    shard : 分割の指定 (i, n)
+    '''
+    index, n_shards = shard
+    return os.path.join(directory, f"shard_{index}of{n_shards}.npz")
+
+def make_meta(IDlist, **params):
+    '''
+    部分結果が同じ条件で作成されたことを確認するための情報 (dict) を作成する関数。
+
+    IDlist : 分割前の ID のリスト
+    params : 処理のパラメータ
+    '''
+    return {'version': VERSION, 'events': spectracache.make_key('events', np.asarray(list(IDlist))), **params}
+
+def save_partial(file_path, accumulators, sketch, meta, progress=None):
+    '''
+    まとまりごとの集計と分位点の集計を、部分結果として npz ファイルに保存する関数。
+    ※書き込み途中のファイルを読まないよう、一時ファイルを経由して置き換える。
+
+    file_path : 保存先のパス
+    accumulators : (まとまりの番号, SpectrumAccumulator) の列
+    sketch : 分位点の集計 (ensemble.QuantileSketch) ※None も可
+    meta : make_meta で作成した情報 (dict)
+    progress : 途中経過の情報 (dict) ※Checkpoint が用いる
+    '''
+    arrays = {'meta': np.array(json.dumps(meta, sort_keys=True))}
+    if progress is not None:
+        arrays['progress'] = np.array(json.dumps(progress))
+    indices = []
+    for index, accumulator in accumulators:
+        indices.append(index)
+        for name, value in accumulator.state().items():
+            arrays[f"chunk{index}_{name}"] = value
+    arrays['chunks'] = np.array(indices, dtype=np.int64)
+    if sketch is not None and sketch.counts is not None:
+        for name, value in sketch.state().items():
+            arrays[f"sketch_{name}"] = value
+
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    tmp_path = f"{file_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, file_path)
+
+def load_partial(file_path):
+    '''
+    save_partial で保存した部分結果を読み込む関数。
+    返り値は (meta, [(まとまりの番号, SpectrumAccumulator), ...], QuantileSketch または None)。
+
+    file_path : 読み込むファイルのパス
+    '''
+    with np.load(file_path) as partial:
+        meta = json.loads(str(partial['meta']))
+        accumulators = []
+        for index in partial['chunks']:
+            state = {name[len(f"chunk{index}_"):]: partial[name] for name in partial.files
+                     if name.startswith(f"chunk{index}_")}
+            accumulators.append((int(index), ensemble.SpectrumAccumulator.from_state(state)))
+        sketch = None
+        if 'sketch_counts' in partial.files:
+            sketch = ensemble.QuantileSketch.from_state(
+                {name[len("sketch_"):]: partial[name] for name in partial.files if name.startswith("sketch_")})
+    return meta, accumulators, sketch
+
+def merge_partials(directory, meta=None):
+    '''
+    ディレクトリ内の全ての分割の部分結果を読み込み、
+    まとまりの番号の順に統合した (SpectrumAccumulator, QuantileSketch) を返す関数。
+    ※分割数がそろっていない、部分結果が欠けている、条件が異なる場合は ValueError を送出する。
+
+    directory : 部分結果の保存先のディレクトリ
+    meta : 期待する条件 (make_meta で作成した dict) ※None の場合は部分結果どうしの一致のみ確認する
+    '''
+    names = [name for name in os.listdir(directory) if name.startswith('shard_') and name.endswith('.npz')
+             and '.tmp.' not in name] if os.path.isdir(directory) else []
+    n_shardslist = {int(name[:-len('.npz')].split('of')[1]) for name in names}
+    if len(n_shardslist) != 1:
+        raise ValueError(f"Expected partial results of a single shard count in {directory}, found {sorted(n_shardslist)}.")
+    n_shards = n_shardslist.pop()
+
+    missing = [index for index in range(n_shards) if not os.path.exists(shard_path(directory, (index, n_shards)))]
+    if missing:
+        raise ValueError(f"Missing shards {missing} of {n_shards} in {directory}.")
+
+    accumulators, sketch = [], None
+    for index in range(n_shards):
+        shard_meta, shard_accumulators, shard_sketch = load_partial(shard_path(directory, (index, n_shards)))
+        if meta is None:
+            meta = shard_meta
+        if shard_meta != json.loads(json.dumps(meta, sort_keys=True)):
+            raise ValueError(f"Shard {index}/{n_shards} was produced with different parameters.")
+        accumulators.extend(shard_accumulators)
+        if shard_sketch is not None:
+            sketch = shard_sketch if sketch is None else sketch.merge(shard_sketch)
+
+    # 1ノードで実行した場合と同じ順序で統合
+    accumulators.sort(key=lambda item: item[0])
+    indices = [index for index, _ in accumulators]
+    if len(set(indices)) != len(indices):
+        raise ValueError("The same chunk appears in more than one shard.")
+    return fold(accumulators), sketch
+
+class Checkpoint:
+    '''
+    iter_accumulators が返す sol ごとの集計を順に受け取り、
+    一定時間ごとに途中経過 (集計・分位点の集計・処理済みの ID) をファイルへ保存するクラス。
+    ※ファイルが既にある場合は途中経過を復元し、処理済みのまとまりを completed で返す。
+    まとまりは sol の順に処理されるため、最後に受け取ったまとまりまでを処理済みとし、
+    再開後も同じ順序で統合を続ける (結果は中断しなかった場合と一致する)。
+    保存は一時ファイルを経由して置き換えるため、保存中に中断しても途中経過は壊れない。
+
+    file_path : 途中経過の保存先のパス
+    IDlist : 分割前の ID のリスト
+    meta : make_meta で作成した情報 (dict) ※異なる条件の途中経過からは再開しない
+    shard : 分割の指定 (i, n) ※None の場合は全てのまとまり
+    folded : True の場合は統合した集計のみ、False の場合はまとまりごとの集計を保持する (bool)
+    interval : 途中経過を保存する間隔 (秒)
+    '''
+    def __init__(self, file_path, IDlist, meta, shard=None, folded=True, interval=CHECKPOINT_INTERVAL):
+        self.file_path = file_path
+        self.chunks = select_chunks(IDlist, shard)
+        self.meta = {**meta, 'shard': None if shard is None else list(shard), 'folded': folded}
+        self.folded = folded
+        self.interval = interval
+        self.accumulators = []
+        self.total = ensemble.SpectrumAccumulator()
+        self.sketch = ensemble.QuantileSketch()
+        self.last_chunk = -1
+        self._saved_at = time.monotonic()
+        if os.path.exists(file_path):
+            self._restore()
+
+    def _restore(self):
+        '''
+        保存された途中経過を復元する関数。
+        '''
+        meta, accumulators, sketch = load_partial(self.file_path)
+        if meta != json.loads(json.dumps(self.meta, sort_keys=True)):
+            raise ValueError(f"Checkpoint {self.file_path} was produced with different parameters.")
+        with np.load(self.file_path) as partial:
+            self.last_chunk = json.loads(str(partial['progress']))['last_chunk']
+        if self.folded:
+            if accumulators:
+                self.total = accumulators[0][1]
+        else:
+            self.accumulators = accumulators
+        if sketch is not None:
+            self.sketch = sketch
+        print(f"Resuming from {self.file_path}: {len(self.completed_IDs())} IDs completed")
+
+    def completed(self):
+        '''
+        処理済みのまとまりの番号のリストを返す関数。(iter_accumulators の skip に指定する)
+        '''
+        return [index for index, _ in self.chunks if index <= self.last_chunk]
+
+    def completed_IDs(self):
+        '''
+        処理済みの ID のリストを返す関数。
+        '''
+        return [ID for index, IDs in self.chunks if index <= self.last_chunk for ID in IDs]
+
+    def add(self, index, accumulator):
+        '''
+        1つのまとまりの集計を受け取り、前回の保存から interval 秒以上経過していれば途中経過を保存する関数。
+
+        index : まとまりの番号 (int)
+        accumulator : まとまりの集計 (SpectrumAccumulator)
+        '''
+        if self.folded:
+            fold([(index, accumulator)], self.total)
+        else:
+            self.accumulators.append((index, accumulator))
+        self.last_chunk = index
+        if time.monotonic() - self._saved_at >= self.interval:
+            self.save()
+
+    def save(self):
+        '''
+        途中経過をファイルへ保存する関数。
+        '''
+        if self.folded:
+            accumulators = [] if self.total.count is None else [(self.last_chunk, self.total)]
+        else:
+            accumulators = self.accumulators
+        save_partial(self.file_path, accumulators, self.sketch, self.meta,
+                     {'last_chunk': self.last_chunk, 'IDs': [int(ID) for ID in self.completed_IDs()]})
+        self._saved_at = time.monotonic()
+
+    def run(self, accumulators):
+        '''
+        集計の列を最後まで受け取り、結果を返す関数。
+        返り値は folded=True の場合は統合した集計、False の場合はまとまりごとの集計のリスト。
+        ※例外 (KeyboardInterrupt を含む) で中断した場合は、その時点の途中経過を保存して送出する。
+        完了時にも保存するため、結果の保存に失敗した場合も再実行で集計をやり直す必要はない。
+        (途中経過の削除は、結果の保存後に呼び出し元が remove_checkpoint で行う)
+
+        accumulators : (まとまりの番号, SpectrumAccumulator) の列 (iter_accumulators の返り値)
+        '''
+        try:
+            for index, accumulator in accumulators:
+                self.add(index, accumulator)
+        except BaseException:
+            self.save()
+            raise
+        self.save()
+        return self.total if self.folded else list(self.accumulators)
+
+def remove_checkpoint(file_path):
+    '''
+    結果の保存後に途中経過のファイルを削除する関数。
+
+    file_path : 途中経過の保存先のパス ※None の場合は何もしない
+    '''
+    if file_path is not None and os.path.exists(file_path):
+        os.remove(file_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory', type=str, help="Directory of the partial results") # 部分結果の保存先のディレクトリ
+    args = parser.parse_args()
+    accumulator, sketch = merge_partials(args.directory)
+    print(f"{args.directory}: {accumulator.n_cases} cases")
@@ -0,0 +1,263 @@
+import numpy as np
+import datetime as datetime
+import pandas as pd
+import matplotlib.pyplot as plt
+import scipy.fft
+import os
+import argparse as argparse
+import dailychange_p
+import neardevil
+import meanFFT_sortedseason
+import batchFFT
+from Dispersion_Relation import Params
+
+def sliding_DFT(x, N, hop):
+    '''
+    長さ N の窓を hop 点ずつずらしながら、各窓の DFT (片側) を
+    再帰的な更新 (sliding DFT) により算出する関数。
+    ※窓を hop 点ずらすと、DFT は
+    X_{j+1} = e^{2πik·hop/N} (X_j + Σ_m (x[s+N+m] - x[s+m]) e^{-2πikm/N})
+    と更新できるため、先頭の窓以外は FFT を再計算しない。
+    ※1ステップあたり O(hop·N) の計算となる。NumPy 上では要素ごとの複素数演算の負荷が大きく、
+    実測 (len(x)=20000, N=240〜4800, hop=1〜32) では全ての条件で strided_DFT (窓ごとの実FFT) より
+    4〜10 倍遅かった (例: N=1200, hop=1 で 0.55 秒 対 0.13 秒)。
+    そのため sliding_periodogram の既定は strided_DFT とし、本関数は method='sliding' で選択した場合のみ用いる。
+    ※補正項を累積和で足し込むため、丸め誤差が窓数とともに蓄積する。
+    実測 (気圧程度のオフセットを持つ len(x)=2000〜100000, 窓数 100〜20000) では、sliding_periodogram の
+    strided との差は窓ごとの平均パワーの 2e-10 以下、周波数ビンごとの相対誤差は中央値 4e-12 であるが、
+    パワーが 0 に近いビンでは相対誤差が 1e-8〜2e-5 (窓数が多いほど大きい) に達する。
+
+    x : 等間隔の時系列データ (1D ndarray)
+    N : 窓のデータ数 (int)
+    hop : 窓をずらす点数 (int)
+    '''
+    x = np.asarray(x, dtype=float)
+    n_windows = (len(x) - N) // hop + 1
+    if n_windows < 1:
+        raise ValueError("The data is shorter than the window.")
+    k = np.arange(N // 2 + 1)
+
+    # 先頭の窓のみ FFT で計算
+    X0 = scipy.fft.rfft(x[:N])
+    if n_windows == 1:
+        return X0[np.newaxis, :]
+
+    # 1の N 乗根の表 (指数関数の計算を表の参照に置き換える)
+    roots = np.exp(2j * np.pi * np.arange(N) / N)
+
+    # 窓をずらす際に出入りするデータの差 (ステップ数 × hop)
+    steps = np.arange(n_windows - 1) * hop
+    m = np.arange(hop)
+    diff = x[steps[:, np.newaxis] + N + m] - x[steps[:, np.newaxis] + m]
+
+    # 各ステップの補正項 (ステップ数 × 周波数)
+    C = diff @ np.conj(roots[np.outer(m, k) % N])
+
+    # 漸化式 X_{j+1} = φ (X_j + C_j) を累積和で一括して解く
+    # X_j = φ^j (X_0 + Σ_{i<j} φ^{-i} C_i)
+    j = np.arange(n_windows)[:, np.newaxis]
+    phase_j = roots[(k * hop * j) % N]
+    acc = np.cumsum(C * np.conj(phase_j[:-1]), axis=0)
+    X = phase_j * np.vstack([X0, X0 + acc])
+
+    return X
+
+def strided_DFT(x, N, hop):
+    '''
+    長さ N の窓を hop 点ずつずらしながら、各窓の DFT (片側) を
+    窓を並べた行列 (データの複製なしのビュー) に対する実FFT 1回で算出する関数。
+    ※sliding_DFT と同じ結果を返す。(sliding_DFT 側の累積誤差を除く)
+
+    x : 等間隔の時系列データ (1D ndarray)
+    N : 窓のデータ数 (int)
+    hop : 窓をずらす点数 (int)
+    '''
+    x = np.asarray(x, dtype=float)
+    if len(x) < N:
+        raise ValueError("The data is shorter than the window.")
+    windows = np.lib.stride_tricks.sliding_window_view(x, N)[::hop]
+    return scipy.fft.rfft(windows, axis=-1)
+
+def sliding_periodogram(x, N, hop, sampling_freq, method='strided'):
+    '''
+    長さ N の窓を hop 点ずつずらしながら、
+    各窓の線形回帰の残差に対するパワースペクトルを算出する関数。
+    ※線形回帰の除去は DFT 上で行うため、窓ごとに残差を作り直す必要はない。
+    規格化は batchFFT.FFT_batch (signal.periodogram の既定値) と同じ。
+    ※欠測 (NaN) を含む窓の行は NaN とする。
+
+    x : 等間隔の時系列データ (1D ndarray)
+    N : 窓のデータ数 (int)
+    hop : 窓をずらす点数 (int)
+    sampling_freq : サンプリング周波数 (Hz) (float)
+    method : 各窓の DFT の算出方法 (str)
+        'strided' : 窓ごとの実FFT (strided_DFT)
+        'sliding' : 再帰的な更新 (sliding_DFT) ※実測では常に strided より遅い
+    '''
+    if method not in ('strided', 'sliding'):
+        raise ValueError(f"Unknown method: {method}")
+    x = np.asarray(x, dtype=float)
+
+    # 欠測を線形補間し、欠測を含む窓を記録
+    missing = np.isnan(x)
+    if missing.all():
+        raise ValueError("No data available.")
+    if missing.any():
+        index = np.arange(len(x))
+        x = np.interp(index, index[~missing], x[~missing])
+    n_missing = np.concatenate([[0], np.cumsum(missing)])
+
+    # 各窓の DFT
+    X = strided_DFT(x, N, hop) if method == 'strided' else sliding_DFT(x, N, hop)
+    starts = np.arange(X.shape[0]) * hop
+
+    # 窓ごとの Σx, Σnx (n は窓内の添字) を累積和から算出
+    index = np.arange(len(x))
+    S0 = np.concatenate([[0], np.cumsum(x)])
+    S1 = np.concatenate([[0], np.cumsum(index * x)])
+    sum_x = S0[starts + N] - S0[starts]
+    sum_nx = S1[starts + N] - S1[starts] - starts * sum_x
+
+    # 線形回帰の係数 (窓の中心を原点とする)
+    tc = np.arange(N) - (N - 1) / 2
+    a = (sum_nx - (N - 1) / 2 * sum_x) / np.dot(tc, tc)
+    b = sum_x / N
+
+    # DFT 上で回帰直線を差し引く
+    T = scipy.fft.rfft(tc)
+    X = X - a[:, np.newaxis] * T
+    X[:, 0] -= b * N
+
+    # パワースペクトル密度 (片側)
+    fft_y = (X.real**2 + X.imag**2) / (sampling_freq * N)
+    if N % 2 == 0:
+        fft_y[:, 1:-1] *= 2
+    else:
+        fft_y[:, 1:] *= 2
+
+    # 欠測を含む窓を NaN に変更
+    fft_y[(n_missing[starts + N] - n_missing[starts]) > 0] = np.nan
+
+    return batchFFT.FFT_freq(N, sampling_freq), fft_y
+
+def process_slidingFFT(ID, timerange, lag_range, hop, mode='near', s=0.5):
+    '''
+    指定された ID に対応する MUTC (ダストデビル発生時刻)の前 (または後) で、
+    timerange 秒の窓を hop 秒ずつずらしながら気圧残差のパワースペクトルを算出し、
+    (ラグ × 周波数) の行列として返す関数。
+
+    - mode='near' : 窓の終端を MUTC - lag_range 〜 MUTC の範囲でずらす (ラグ ≦ 0)
+    - mode='after' : 窓の始端を MUTC 〜 MUTC + lag_range の範囲でずらす (ラグ ≧ 0)
+    ※ラグは nearFFT / afterFFT の interval に対応する (near では -interval)。
+
+    ID : ダストデビルの識別番号 (int)
+    timerange : 窓の長さ (秒) (int)
+    lag_range : 窓をずらす範囲 (秒) (int)
+    hop : 窓をずらす幅 (秒) (int)
+    mode : 'near' (発生前) または 'after' (発生後) (str)
+    s : resample の間隔 (秒) (float)
+    '''
+    try:
+        # ID に対応する sol および MUTC を取得
+        sol, MUTC = neardevil.get_sol_MUTC(ID)
+
+        # 該当 sol 周辺の時系列データを取得
+        data = dailychange_p.process_surround_dailydata(sol)
+        if data is None:
+            raise ValueError("Failed to retrieve time-series data.")
+
+        # 走査する範囲のデータを抽出
+        if mode == 'near':
+            start = MUTC - datetime.timedelta(seconds=lag_range + timerange)
+            stop = MUTC
+        elif mode == 'after':
+            start = MUTC
+            stop = MUTC + datetime.timedelta(seconds=lag_range + timerange)
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+        scan_data = data.query('@start <= MUTC < @stop').copy()
+        if scan_data.empty:
+            raise ValueError("No data available after filtering.")
+
+        # s秒間隔でresampleし、欠測も含めた等間隔の格子に揃える
+        scan_data = meanFFT_sortedseason.data_resample(scan_data, s)
+        freq = pd.to_timedelta(s, unit='s')
+        grid = pd.date_range(pd.Timestamp(start).floor(freq), stop, freq=freq)
+        grid = grid[grid < stop]
+        p = scan_data.set_index('MUTC')['p'].reindex(grid).values
+
+        # 窓をずらしながらパワースペクトルを算出
+        N, nhop = int(round(timerange / s)), int(round(hop / s))
+        fft_x, fft_y = sliding_periodogram(p, N, nhop, 1 / s)
+
+        # 各窓のラグ (秒) (near : 窓の終端 - MUTC, after : 窓の始端 - MUTC)
+        starts = np.arange(fft_y.shape[0]) * nhop * s
+        if mode == 'near':
+            starts = starts + timerange
+        lags = starts + (grid[0] - pd.Timestamp(MUTC)).total_seconds()
+
+        return lags, fft_x, fft_y, sol
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+def plot_slidingFFT(ID, timerange, lag_range, hop, mode='near'):
+    '''
+    指定された ID に対応する MUTC (ダストデビル発生時刻)の前 (または後) の
+    パワースペクトルの時間変化 (ラグ × 周波数) を算出し、プロットを保存する関数。
+
+    - X軸 : ラグ (s) [窓の終端 (near) または始端 (after) と発生時刻の差]
+    - Y軸 : 振動数 (Hz)
+    - 色 : スペクトル強度の常用対数 (Pa^2)
+
+    ID : ダストデビルの識別番号 (int)
+    timerange : 窓の長さ (秒) (int)
+    lag_range : 窓をずらす範囲 (秒) (int)
+    hop : 窓をずらす幅 (秒) (int)
+    mode : 'near' (発生前) または 'after' (発生後) (str)
+    '''
+    try:
+        # (ラグ × 周波数) のパワースペクトルの導出
+        lags, fft_x, fft_y, sol = process_slidingFFT(ID, timerange, lag_range, hop, mode)
+
+        # 音波と重力波の境界に該当する周波数
+        params = Params()
+        w = params.border_Hz()
+
+        # 描画の設定 (直流成分は除く)
+        plt.pcolormesh(lags, fft_x[1:], np.log10(fft_y[:, 1:]).T, shading='nearest', cmap='viridis')
+        plt.colorbar(label='log10 Pressure Power [$Pa^2$]')
+        plt.yscale('log')
+        plt.axhline(y=w, color='r', label='border')
+        plt.title(f'SPS_ID={ID}, sol={sol}, timerange={timerange}s', fontsize=15)
+        plt.xlabel('Lag [s]', fontsize=15)
+        plt.ylabel('Vibration Frequency [Hz]', fontsize=15)
+        plt.legend(fontsize=15)
+        plt.tight_layout()
+
+        # 画像の保存
+        output_dir = f'{mode}slidingFFT_{timerange}s_hop={hop}s'
+        os.makedirs(output_dir, exist_ok=True)
+        filename = f"ID={str(ID).zfill(5)}, sol={str(sol).zfill(4)}.png"
+        plt.savefig(os.path.join(output_dir, filename))
+        plt.clf()
+        plt.close()
+        print(f"Save completed: {filename}")
+
+        return lags, fft_x, fft_y
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('ID', type=int, help="ID") # IDの指定
+    parser.add_argument('timerange', type=int, help='timerang(s)') # 窓の長さ(秒)
+    parser.add_argument('lag_range', type=int, help='Range of lags to scan(s)') # 窓をずらす範囲(秒)
+    parser.add_argument('hop', type=int, help='Hop between windows(s)') # 窓をずらす幅(秒)
+    parser.add_argument('--mode', type=str, default='near', choices=['near', 'after'],
+                        help="Scan before (near) or after the devil") # 発生前(near)・発生後(after)
+    args = parser.parse_args()
+    plot_slidingFFT(args.ID, args.timerange, args.lag_range, args.hop, args.mode)
@@ -0,0 +1,183 @@
+import numpy as np
+import hashlib
+import os
+import argparse as argparse
+
+# 中間生成物のディスクキャッシュの保存先
+CACHE_DIR = os.path.expanduser(os.environ.get('EXPLORE_CACHE_DIR', '~/.cache/explore/products'))
+
+# キャッシュの容量の上限 (バイト) ※超えた場合は古く参照されていないものから削除
+MAX_BYTES = int(float(os.environ.get('EXPLORE_CACHE_BYTES', 5e9)))
+
+# キャッシュの有効・無効 (環境変数 EXPLORE_CACHE=0 で無効)
+ENABLED = os.environ.get('EXPLORE_CACHE', '1') != '0'
+
+# キャッシュ形式の版 (保存内容を変更した場合は更新し、古いキャッシュを使わないようにする)
+VERSION = 1
+
+# 容量の確認を行う保存回数の間隔
+EVICT_EVERY = 100
+_n_saved = 0
+
+def file_stamp(file_path):
+    '''
+    ファイルの同一性を表す (パス, サイズ, 更新時刻) を返す関数。
+    ※ファイルが存在しない場合は FileNotFoundError を送出する。
+
+    file_path : ファイルのパス
+    '''
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+def sol_stamps(sols):
+    '''
+    複数の sol のファイルの file_stamp をまとめて返す関数。
+    ※ファイルが存在しない sol は None とする。
+
+    sols : 火星日のリスト
+    '''
+    import dailychange_p
+    stamps = []
+    for sol in sols:
+        try:
+            stamps.append(file_stamp(dailychange_p.get_file_path(sol)))
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+def make_key(kind, *parts):
+    '''
+    生成物の種類と、入力・パラメータから、内容に基づくキー (SHA-256) を作成する関数。
+    ※配列は dtype・形状・内容のバイト列から、それ以外は repr から求める。
+
+    kind : 生成物の種類 (str)
+    parts : 入力およびパラメータ
+    '''
+    digest = hashlib.sha256(f"{kind}:v{VERSION}".encode())
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part)
+            digest.update(f"{part.dtype.str}{part.shape}".encode())
+            digest.update(part.tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b'|')
+    return digest.hexdigest()
+
+def cache_path(kind, key):
+    '''
+    キーに対応するキャッシュファイルのパスを返す関数。
+
+    kind : 生成物の種類 (str)
+    key : make_key で作成したキー (str)
+    '''
+    return os.path.join(CACHE_DIR, kind, key[:2], f"{key}.npz")
+
+def load(kind, key):
+    '''
+    キャッシュから配列の辞書を読み込む関数。
+    存在しない (または読み込めない) 場合は None を返す。
+    ※参照時刻を更新し、容量超過時に削除されにくくする。
+
+    kind : 生成物の種類 (str)
+    key : make_key で作成したキー (str)
+    '''
+    if not ENABLED:
+        return None
+    file_path = cache_path(kind, key)
+    try:
+        with np.load(file_path) as cache:
+            arrays = {name: cache[name] for name in cache.files}
+        os.utime(file_path)
+        return arrays
+    except (FileNotFoundError, OSError, ValueError, KeyError):
+        return None
+
+def save(kind, key, **arrays):
+    '''
+    配列をキャッシュへ保存する関数。
+    ※書き込み途中のファイルを読まないよう、一時ファイルを経由して置き換える。
+
+    kind : 生成物の種類 (str)
+    key : make_key で作成したキー (str)
+    arrays : 保存する配列 (名前=配列)
+    '''
+    global _n_saved
+    if not ENABLED:
+        return
+    file_path = cache_path(kind, key)
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = f"{file_path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, file_path)
+    except OSError as e:
+        print(f"Failed to save cache: {e}")
+        return
+
+    # 一定回数ごとに容量を確認
+    _n_saved += 1
+    if _n_saved % EVICT_EVERY == 1:
+        evict()
+
+def cache_files():
+    '''
+    キャッシュファイルの (参照時刻, サイズ, パス) のリストを返す関数。
+    '''
+    entries = []
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if not name.endswith('.npz') or '.tmp.' in name:
+                continue
+            file_path = os.path.join(root, name)
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file_path))
+    return entries
+
+def evict(max_bytes=None):
+    '''
+    キャッシュの合計サイズが max_bytes を超えている場合、
+    参照時刻の古いものから削除して上限の 9 割以下にする関数。
+    返り値は削除したファイル数。
+
+    max_bytes : 容量の上限 (バイト) (int) ※None の場合は MAX_BYTES
+    '''
+    if max_bytes is None:
+        max_bytes = MAX_BYTES
+    entries = cache_files()
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return 0
+
+    n_removed = 0
+    for _, size, file_path in sorted(entries):
+        if total <= 0.9 * max_bytes:
+            break
+        try:
+            os.remove(file_path)
+            total -= size
+            n_removed += 1
+        except FileNotFoundError:
+            continue
+    return n_removed
+
+def clear():
+    '''
+    キャッシュを全て削除する関数。
+    '''
+    return evict(max_bytes=-1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clear', action='store_true', help="Remove every cached product") # キャッシュを全て削除
+    parser.add_argument('--max_bytes', type=float, default=None, help="Evict down to this size(bytes)") # 容量の上限(バイト)
+    args = parser.parse_args()
+    if args.clear:
+        print(f"Removed {clear()} files")
+    else:
+        n_removed = evict(None if args.max_bytes is None else int(args.max_bytes))
+        entries = cache_files()
+        print(f"{CACHE_DIR}: {len(entries)} files, {sum(size for _, size, _ in entries) / 1e6:.1f} MB (removed {n_removed})")
@@ -0,0 +1,243 @@
+import numpy as np
+import datetime as datetime
+import json
+import os
+import argparse as argparse
+from tqdm import tqdm
+import dailychange_p
+import meanFFT_sortedseason
+import batchFFT
+
+# スペクトログラムキューブの既定の保存先
+CUBE_DIR = os.path.expanduser('~/.cache/explore/spectrogram_cube')
+
+def detrend_segments(segments):
+    '''
+    各区間 (行) から線形回帰による予測値を差し引き、残差を返す関数。
+    ※nearFFT.calculate_residual と同じ一次の回帰を、全区間まとめて行う。
+
+    segments : 等間隔の気圧データ (2D ndarray, 区間数 × データ数)
+    '''
+    n = segments.shape[-1]
+    t = np.arange(n) - (n - 1) / 2
+
+    # 説明変数を中心化しているため、傾きと切片は独立に求まる
+    a = segments @ t / np.dot(t, t)
+    b = segments.mean(axis=-1)
+
+    return segments - a[:, np.newaxis] * t - b[:, np.newaxis]
+
+def solSTFT(sol, segment, hop, s=0.5):
+    '''
+    指定された sol の気圧データを s 秒間隔に resample し、
+    segment 秒の区間を hop 秒ずつずらしながら、
+    線形回帰の残差に対するパワースペクトルを算出する関数。
+    ※欠測を含む区間は除外する。
+
+    sol : 火星日(探査機到着後からの経過日数)(int)
+    segment : 区間の長さ (秒) (int)
+    hop : 区間をずらす幅 (秒) (int)
+    s : resample の間隔 (秒) (float)
+    '''
+    data = dailychange_p.process_dailydata_p(sol)
+    if data is None or data.empty:
+        raise ValueError(f"No data available for sol={sol}")
+
+    # s秒間隔でresample
+    data = meanFFT_sortedseason.data_resample(data, s)
+    p = data['p'].values
+    MUTC = data['MUTC'].values
+
+    # 区間の切り出し (コピーを作らないビュー)
+    nperseg, nhop = int(round(segment / s)), int(round(hop / s))
+    if len(p) < nperseg:
+        raise ValueError(f"sol={sol} is shorter than the segment.")
+    segments = np.lib.stride_tricks.sliding_window_view(p, nperseg)[::nhop]
+    starts = MUTC[:len(p) - nperseg + 1][::nhop]
+
+    # 欠測を含む区間の除外
+    valid = ~np.isnan(segments).any(axis=1)
+    segments, starts = segments[valid], starts[valid]
+
+    # 線形回帰の残差に対するパワースペクトル
+    fft_x, fft_y = batchFFT.FFT_batch(detrend_segments(segments), 1 / s)
+
+    # 区間の中心時刻
+    centers = starts + np.timedelta64(int(segment * 1e9 / 2), 'ns')
+
+    return fft_x, fft_y.astype(np.float32), centers
+
+def build_cube(sollist, segment, hop, s=0.5, cube_dir=CUBE_DIR):
+    '''
+    sol ごとのスペクトログラム (時刻 × 周波数, float32) を
+    メモリマップ可能なファイルとして保存し、全 sol の索引を作成する関数。
+
+    sollist : 対象とする sol のリスト
+    segment : 区間の長さ (秒) (int)
+    hop : 区間をずらす幅 (秒) (int)
+    s : resample の間隔 (秒) (float)
+    cube_dir : 保存先のディレクトリ
+    '''
+    os.makedirs(cube_dir, exist_ok=True)
+    fft_x = None
+    times, sols, rows = [], [], []
+
+    for sol in tqdm(sollist, desc="Building spectrogram cube"):
+        if not os.path.exists(dailychange_p.get_file_path(sol)):
+            continue
+        try:
+            sol_x, sol_y, centers = solSTFT(sol, segment, hop, s)
+        except ValueError as e:
+            print(e)
+            continue
+        if fft_x is None:
+            fft_x = sol_x
+
+        # sol ごとのチャンクとして保存
+        chunk = np.lib.format.open_memmap(os.path.join(cube_dir, f"sol={str(sol).zfill(4)}.npy"),
+                                          mode='w+', dtype=np.float32, shape=sol_y.shape)
+        chunk[:] = sol_y
+        chunk.flush()
+        del chunk
+
+        times.append(centers.astype('datetime64[ns]').astype(np.int64))
+        sols.append(np.full(len(centers), sol))
+        rows.append(np.arange(len(centers)))
+
+    if fft_x is None:
+        raise ValueError("No sol was available to build the cube.")
+
+    # 全 sol の索引 (時刻順)
+    times, sols, rows = np.concatenate(times), np.concatenate(sols), np.concatenate(rows)
+    order = np.argsort(times, kind='stable')
+    np.savez(os.path.join(cube_dir, 'index.npz'),
+             times=times[order], sols=sols[order], rows=rows[order], fft_x=fft_x)
+    with open(os.path.join(cube_dir, 'meta.json'), 'w') as f:
+        json.dump({'segment': segment, 'hop': hop, 's': s}, f)
+
+    print(f"Save completed: {cube_dir}")
+    return cube_dir
+
+class SpectrogramCube:
+    '''
+    build_cube で作成したスペクトログラムキューブを読み込み、
+    任意の時刻に最も近い区間のスペクトルを返すクラス。
+    ※各 sol のチャンクはメモリマップで開くため、参照した部分のみ読み込まれる。
+
+    cube_dir : キューブの保存先のディレクトリ
+    '''
+    def __init__(self, cube_dir=CUBE_DIR):
+        self.cube_dir = cube_dir
+        with np.load(os.path.join(cube_dir, 'index.npz')) as index:
+            self.times = index['times']
+            self.sols = index['sols']
+            self.rows = index['rows']
+            self.fft_x = index['fft_x']
+        with open(os.path.join(cube_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        self.segment, self.hop, self.s = meta['segment'], meta['hop'], meta['s']
+        self.chunks = {}
+
+    def chunk(self, sol):
+        '''
+        sol に対応するチャンク (時刻 × 周波数) をメモリマップで返す関数。
+
+        sol : 火星日 (int)
+        '''
+        if sol not in self.chunks:
+            file_path = os.path.join(self.cube_dir, f"sol={str(sol).zfill(4)}.npy")
+            self.chunks[sol] = np.load(file_path, mmap_mode='r')
+        return self.chunks[sol]
+
+    def to_ns(self, MUTC):
+        '''
+        datetime (または datetime64) を索引と同じ整数 (ns) に変換する関数。
+
+        MUTC : 火星地方時 (datetime)
+        '''
+        return np.datetime64(MUTC, 'ns').astype(np.int64)
+
+    def nearest(self, MUTC):
+        '''
+        MUTC に中心時刻が最も近い区間のスペクトルを返す関数。
+        返り値は (周波数軸, スペクトル, 中心時刻とのずれ(秒))。
+
+        MUTC : 火星地方時 (datetime)
+        '''
+        t = self.to_ns(MUTC)
+        if len(self.times) == 1:
+            # 区間が1つのみの場合は比較する隣の区間が無い
+            i = 0
+        else:
+            i = np.clip(np.searchsorted(self.times, t), 1, len(self.times) - 1)
+            i = i - 1 if abs(t - self.times[i - 1]) <= abs(self.times[i] - t) else i
+        spectrum = np.asarray(self.chunk(self.sols[i])[self.rows[i]])
+        return self.fft_x, spectrum, abs(int(self.times[i]) - int(t)) / 1e9
+
+    def window(self, start, stop):
+        '''
+        中心時刻が start 〜 stop に含まれる全区間のスペクトルを返す関数。
+        返り値は (周波数軸, スペクトル (区間数 × 周波数))。
+
+        start : 開始時刻 (datetime)
+        stop : 終了時刻 (datetime)
+        '''
+        lo = np.searchsorted(self.times, self.to_ns(start), side='left')
+        hi = np.searchsorted(self.times, self.to_ns(stop), side='right')
+        if lo >= hi:
+            return self.fft_x, np.empty((0, len(self.fft_x)), dtype=np.float32)
+
+        # 同じ sol の連続した行はまとめてスライスする
+        spectra = []
+        sols, rows = self.sols[lo:hi], self.rows[lo:hi]
+        for sol in np.unique(sols):
+            spectra.append(np.asarray(self.chunk(sol)[rows[sols == sol]]))
+        return self.fft_x, np.concatenate(spectra)
+
+    def neardevil(self, MUTClist, interval, max_offset=None):
+        '''
+        各 MUTC (ダストデビル発生時刻) の interval 秒前を終端とする区間に
+        最も近いスペクトルを重ねた配列を返す関数。
+        返り値は (周波数軸, スペクトル (件数 × 周波数), 採用された MUTC の添字)。
+
+        MUTClist : ダストデビル発生時刻 (datetime) のリスト
+        interval : 開始オフセット (秒) (int)
+        max_offset : 許容する中心時刻のずれ (秒) (float) ※None の場合は hop
+        '''
+        if max_offset is None:
+            max_offset = self.hop
+        half = datetime.timedelta(seconds=self.segment / 2 + interval)
+
+        spectra, indices = [], []
+        for i, MUTC in enumerate(MUTClist):
+            _, spectrum, offset = self.nearest(MUTC - half)
+            if offset <= max_offset:
+                spectra.append(spectrum)
+                indices.append(i)
+
+        return self.fft_x, np.array(spectra).reshape(-1, len(self.fft_x)), indices
+
+    def focus(self, sol, MUTC_h, timerange):
+        '''
+        sol の MUTC_h 時から timerange 秒間に含まれる区間のスペクトルを返す関数。
+        (focusFFT / meanfocusFFT の背景スペクトルに相当)
+
+        sol : 火星日(探査機到着後からの経過日数)(int)
+        MUTC_h : 火星地方時(0 ≦ MUTC_h ≦ 23)(int)
+        timerange : 切り取る時間範囲 (秒) (int)
+        '''
+        date = datetime.date(2018, 11, 26) + datetime.timedelta(days=sol)
+        start = datetime.datetime.combine(date, datetime.time(MUTC_h, 0, 0))
+        stop = start + datetime.timedelta(seconds=timerange)
+        return self.window(start + datetime.timedelta(seconds=self.segment / 2),
+                           stop - datetime.timedelta(seconds=self.segment / 2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('segment', type=int, help='Segment length(s)') # 区間の長さ(秒)
+    parser.add_argument('hop', type=int, help='Hop length(s)') # 区間をずらす幅(秒)
+    parser.add_argument('--first_sol', type=int, default=0, help="First sol") # 最初のsol
+    parser.add_argument('--last_sol', type=int, default=1219, help="Last sol") # 最後のsol
+    parser.add_argument('--cube_dir', type=str, default=CUBE_DIR, help="Output directory") # 保存先
+    args = parser.parse_args()
+    build_cube(range(args.first_sol, args.last_sol + 1), args.segment, args.hop, 0.5, args.cube_dir)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import batchFFT
+
+def reference_AS(x):
+    '''
+    np.fft.fft による片側振幅スペクトル (AS_batch の独立な参照実装)。
+
+    x : 時系列データ (1D array)
+    '''
+    N = len(x)
+    amplitude = np.abs(np.fft.fft(x))[:N // 2 + 1] / N
+    last = N // 2 if N % 2 == 0 else N // 2 + 1
+    amplitude[1:last] *= 2
+    return amplitude
+
+@pytest.mark.parametrize('N', [600, 601])
+def test_AS_batch_1d(N):
+    x = np.random.default_rng(N).normal(size=N)
+    AS_x, AS_y = batchFFT.AS_batch(x, 2.0)
+    np.testing.assert_allclose(AS_y, reference_AS(x), rtol=1e-12, atol=1e-15)
+
+@pytest.mark.parametrize('N', [600, 601])
+def test_AS_batch_2d(N):
+    X = np.random.default_rng(N).normal(size=(5, N))
+    AS_x, AS_y = batchFFT.AS_batch(X, 2.0)
+    assert AS_y.shape == (5, N // 2 + 1)
+    for row, x in zip(AS_y, X):
+        np.testing.assert_allclose(row, reference_AS(x), rtol=1e-12, atol=1e-15)
+
+@pytest.mark.parametrize('N', [600, 601])
+@pytest.mark.parametrize('fs', [2.0, 20.0, 1.9987])
+def test_AS_batch_freq(N, fs):
+    AS_x, AS_y = batchFFT.AS_batch(np.zeros(N), fs)
+    np.testing.assert_array_equal(AS_x, np.fft.rfftfreq(N, d=1 / fs))
+
+@pytest.mark.parametrize('N', [600, 601])
+def test_AS_batch_tone_amplitude(N):
+    fs = 2.0
+    t = np.arange(N) / fs
+    k = 37
+    x = 0.8 * np.sin(2 * np.pi * (k * fs / N) * t)
+    AS_x, AS_y = batchFFT.AS_batch(x, fs)
+    assert AS_y[k] == pytest.approx(0.8, rel=1e-9)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+import ensemble
+
+def synthetic_spectra(n_cases, n_freq, seed, nan_fraction=0.1):
+    '''
+    NaN を含む対数正規分布の合成スペクトル (ケース数 × 周波数)。
+    '''
+    rng = np.random.default_rng(seed)
+    Y = rng.lognormal(mean=-2, sigma=1.5, size=(n_cases, n_freq))
+    Y[rng.random(Y.shape) < nan_fraction] = np.nan
+    return Y
+
+def test_welford_matches_nan_statistics():
+    Y = synthetic_spectra(300, 40, 0)
+    accumulator = ensemble.SpectrumAccumulator()
+    for y in Y:
+        accumulator.add(y)
+    np.testing.assert_allclose(accumulator.mean, np.nanmean(Y, axis=0), rtol=1e-12)
+    np.testing.assert_allclose(accumulator.var, np.nanvar(Y, axis=0, ddof=1), rtol=1e-10)
+    np.testing.assert_array_equal(accumulator.min, np.nanmin(Y, axis=0))
+    np.testing.assert_array_equal(accumulator.max, np.nanmax(Y, axis=0))
+    np.testing.assert_array_equal(accumulator.count, np.sum(np.isfinite(Y), axis=0))
+
+@pytest.mark.parametrize('bounds', [[0, 300], [0, 1, 2, 300], [0, 100, 101, 250, 300]])
+def test_chan_merge_matches_one_pass(bounds):
+    Y = synthetic_spectra(300, 40, 1)
+    one_pass = ensemble.SpectrumAccumulator()
+    for y in Y:
+        one_pass.add(y)
+
+    # 分割した部分集計 (1件ずつ・一括の両方) を統合
+    merged = ensemble.SpectrumAccumulator()
+    for k, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+        part = ensemble.SpectrumAccumulator()
+        if k % 2 == 0:
+            part.add_batch(Y[lo:hi])
+        else:
+            for y in Y[lo:hi]:
+                part.add(y)
+        merged.merge(part)
+
+    assert merged.n_cases == one_pass.n_cases
+    np.testing.assert_array_equal(merged.count, one_pass.count)
+    np.testing.assert_allclose(merged.mean, one_pass.mean, rtol=1e-12)
+    np.testing.assert_allclose(merged.var, one_pass.var, rtol=1e-10)
+    np.testing.assert_array_equal(merged.min, one_pass.min)
+    np.testing.assert_array_equal(merged.max, one_pass.max)
+
+def test_accumulator_state_roundtrip(tmp_path):
+    accumulator = ensemble.SpectrumAccumulator(np.linspace(0, 1, 40)).add_batch(synthetic_spectra(50, 40, 2))
+    accumulator.save(tmp_path / 'accumulator.npz')
+    loaded = ensemble.SpectrumAccumulator.load(tmp_path / 'accumulator.npz')
+    np.testing.assert_array_equal(loaded.mean, accumulator.mean)
+    np.testing.assert_array_equal(loaded.var, accumulator.var)
+    np.testing.assert_array_equal(loaded.fft_x, accumulator.fft_x)
+    assert loaded.n_cases == accumulator.n_cases
+
+@pytest.mark.parametrize('q', [0.1, 0.5, 0.9])
+def test_sketch_within_one_percent(q):
+    Y = synthetic_spectra(2000, 50, 3)
+    sketch = ensemble.QuantileSketch(relative_accuracy=0.01).add_batch(Y)
+    np.testing.assert_allclose(sketch.quantile(q), np.nanpercentile(Y, 100 * q, axis=0), rtol=0.01)
+
+def test_sketch_add_matches_add_batch_and_merge():
+    Y = synthetic_spectra(500, 30, 4)
+    Y[:5, :3] = [[0, -1e-3, 1e-3]] * 5
+    one_by_one = ensemble.QuantileSketch()
+    for y in Y:
+        one_by_one.add(y)
+    batch = ensemble.QuantileSketch().add_batch(Y)
+    merged = ensemble.QuantileSketch().add_batch(Y[:123]).merge(ensemble.QuantileSketch().add_batch(Y[123:]))
+    np.testing.assert_array_equal(one_by_one.counts, batch.counts)
+    np.testing.assert_array_equal(merged.counts, batch.counts)
+    assert merged.n_cases == batch.n_cases == len(Y)
+    np.testing.assert_array_equal(batch.counts.sum(axis=1), np.sum(np.isfinite(Y), axis=0))
+
+def test_sketch_state_roundtrip(tmp_path):
+    sketch = ensemble.QuantileSketch().add_batch(synthetic_spectra(100, 20, 5))
+    sketch.save(tmp_path / 'sketch.npz')
+    loaded = ensemble.QuantileSketch.load(tmp_path / 'sketch.npz')
+    np.testing.assert_array_equal(loaded.median, sketch.median)
+    assert loaded.n_cases == sketch.n_cases
@@ -0,0 +1,46 @@
+import os
+import numpy as np
+import pytest
+import eventspectra
+import windowsweep
+import meanFFT_sorteddP
+import meanFFT_sortedseason
+import meanFFT_sortedATandWs
+
+def test_common_length():
+    IDs = [3, 5, 7, 9]
+    fft_xlist = [np.arange(n) for n in (11, 13, 11, 11)]
+    fft_ylist = [np.full(n, ID, dtype=float) for n, ID in zip((11, 13, 11, 11), IDs)]
+    kept, fft_x, fft_y, dropped = eventspectra.common_length(IDs, fft_xlist, fft_ylist)
+    np.testing.assert_array_equal(kept, [3, 7, 9])
+    np.testing.assert_array_equal(dropped, [5])
+    np.testing.assert_array_equal(fft_x, np.arange(11))
+    np.testing.assert_array_equal(fft_y[:, 0], [3, 7, 9])
+
+def test_common_length_nothing_dropped():
+    kept, fft_x, fft_y, dropped = eventspectra.common_length([1, 2], [np.arange(5)] * 2, [np.ones(5)] * 2)
+    np.testing.assert_array_equal(kept, [1, 2])
+    assert dropped.size == 0
+    assert fft_y.shape == (2, 5)
+
+@pytest.fixture
+def short_event(surround_data, monkeypatch):
+    '''
+    ID=3 の窓のみデータ数を短くする。
+    '''
+    process_residual = eventspectra.process_residual
+    def residual(ID, timerange, interval, s=0.5):
+        residual, sampling_freq = process_residual(ID, timerange, interval, s)
+        return (residual[:-10] if ID == 3 else residual), sampling_freq
+    monkeypatch.setattr(eventspectra, 'process_residual', residual)
+
+@pytest.mark.parametrize('plot, file_path', [
+    (lambda: windowsweep.plot_sweep_dP(0, 60, 20, [1, 3], [1, 3]), os.path.join('sweepmovingratio_dP_60s', 'dP is More 0.npz')),
+    (lambda: meanFFT_sorteddP.plot_sweep_dP(0, 60, 20), os.path.join('sweepFFT_dP_60s', 'dP is More 0.npz')),
+    (lambda: meanFFT_sortedseason.plot_allseasons(60, 20), os.path.join('meanFFT_sortedseason_60s', 'all seasons,width=30.npz')),
+    (lambda: meanFFT_sortedATandWs.plot_gridATandWs(60, 20), os.path.join('meanFFT_sortedATandWs_60s', 'grid,AT_step=5,Ws_step=1.npz')),
+])
+def test_dropped_ID_saved(short_event, plot, file_path):
+    plot()
+    with np.load(file_path) as result:
+        np.testing.assert_array_equal(result['dropped_ID'], [3])
@@ -0,0 +1,51 @@
+import numpy as np
+import eventspectra
+import meanFFT_sortedATandWs
+
+def test_group_sum_matches_direct():
+    rng = np.random.default_rng(0)
+    fft_y = rng.lognormal(size=(200, 30))
+    fft_y[rng.random(fft_y.shape) < 0.1] = np.nan
+    group = rng.integers(-1, 7, size=200)
+    total, count, n_cases = eventspectra.group_sum(group, fft_y, 6)
+    mean, _ = eventspectra.group_mean(group, fft_y, 6)
+    for g in range(6):
+        members = fft_y[group == g]
+        np.testing.assert_allclose(total[g], np.nansum(members, axis=0), rtol=1e-12)
+        np.testing.assert_array_equal(count[g], np.sum(np.isfinite(members), axis=0))
+        np.testing.assert_allclose(mean[g], np.nanmean(members, axis=0), rtol=1e-12)
+        assert n_cases[g] == len(members)
+
+def test_cumulative_ATandWs_matches_direct():
+    rng = np.random.default_rng(1)
+    AT = rng.choice(np.arange(200, 230, 2.5), size=300)
+    Ws = rng.choice(np.arange(0, 8, 0.5), size=300)
+    fft_y = rng.lognormal(size=(300, 20))
+    fft_y[rng.random(fft_y.shape) < 0.05] = np.nan
+    AT_edges, Ws_edges = np.arange(195, 235, 5.0), np.arange(0, 10, 1.0)
+    n_AT, n_Ws = len(AT_edges) - 1, len(Ws_edges) - 1
+
+    group = meanFFT_sortedATandWs.grid_index(AT, Ws, AT_edges, Ws_edges)
+    total, count, _ = eventspectra.group_sum(group, fft_y, n_AT * n_Ws)
+    cumulative = meanFFT_sortedATandWs.cumulative_ATandWs(total.reshape(n_AT, n_Ws, -1), count.reshape(n_AT, n_Ws, -1))
+
+    # 境界上の値 (AT = AT_edges[i], Ws = Ws_edges[j]) を含む全ての閾値で、直接の絞り込みと一致する
+    assert np.isin(AT, AT_edges).any() and np.isin(Ws, Ws_edges).any()
+    for i, AT_Llimit in enumerate(AT_edges):
+        for j, Ws_Ulimit in enumerate(Ws_edges):
+            members = fft_y[(AT > AT_Llimit) & (Ws < Ws_Ulimit)]
+            n_valid = np.sum(np.isfinite(members), axis=0)
+            expected = np.nansum(members, axis=0) / np.where(n_valid > 0, n_valid, np.nan)
+            np.testing.assert_allclose(cumulative[i, j], expected, rtol=1e-12)
+
+def test_gridATandWs_matches_IDlist(surround_data):
+    AT_edges, Ws_edges, fft_x, mean, n_cases, cumulative, dropped = meanFFT_sortedATandWs.process_gridATandWs(60, 20)
+    IDs, _, fft_y, _ = eventspectra.process_eventspectra(list(range(10)), 60, 20)
+    assert n_cases.sum() == len(IDs)
+    for i, AT_Llimit in enumerate(AT_edges):
+        for j, Ws_Ulimit in enumerate(Ws_edges):
+            members = np.isin(IDs, meanFFT_sortedATandWs.process_IDlist_ATandWs(AT_Llimit, Ws_Ulimit))
+            if members.any():
+                np.testing.assert_allclose(cumulative[i, j], fft_y[members].mean(axis=0), rtol=1e-12)
+            else:
+                assert np.isnan(cumulative[i, j]).all()
@@ -0,0 +1,35 @@
+import os
+import numpy as np
+import pytest
+import logbin
+import meanmovingFFT_sorteddP
+
+def spectra(lengths):
+    '''
+    データ数の異なる窓の (周波数軸, パワースペクトル, 移動平均の周波数軸, 移動平均) のリスト。
+
+    lengths : 各窓の周波数点数のリスト
+    '''
+    fft_xlist = [np.linspace(0, 1, n) for n in lengths]
+    fft_ylist = [1 + fft_x for fft_x in fft_xlist]
+    return fft_xlist, fft_ylist, [fft_x[2:-2] for fft_x in fft_xlist], [fft_y[2:-2] for fft_y in fft_ylist]
+
+@pytest.mark.parametrize('lengths, n_bins', [([121, 121, 121], None), ([121, 151, 121], logbin.N_BINS)])
+def test_default_path_mixed_lengths(monkeypatch, lengths, n_bins):
+    monkeypatch.setattr(meanmovingFFT_sorteddP, 'process_movingFFTlist_dP', lambda *args: spectra(lengths))
+    moving_fft_x, moving_fft_y = meanmovingFFT_sorteddP.plot_meanmovingFFT_dP(-1, 60, 20, 5)
+    if n_bins is None:
+        np.testing.assert_allclose(moving_fft_x, spectra(lengths)[2][0])
+        np.testing.assert_allclose(moving_fft_y, spectra(lengths)[3][0])
+        assert os.path.exists(os.path.join('meanmovingFFT_dP_60s', 'dP is More 1,windowsize_FFT=5.png'))
+    else:
+        assert len(moving_fft_x) == n_bins
+        covered = ~np.isnan(moving_fft_y)
+        np.testing.assert_allclose(moving_fft_y[covered], 1 + moving_fft_x[covered], rtol=0.05)
+        assert os.path.exists(os.path.join('meanmovingFFT_dP_60s', f'dP is More 1,windowsize_FFT=5,n_bins={n_bins}.png'))
+
+def test_process_arrays_float32_accumulates():
+    arrays = [np.full(5, 0.1, dtype=np.float32) for _ in range(100000)]
+    result = meanmovingFFT_sorteddP.process_arrays(arrays, np.nanmean)
+    assert result.dtype == np.float32
+    np.testing.assert_array_equal(result, np.float32(0.1))
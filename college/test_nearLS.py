@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import signal
+import nearLS
+
+def jittered_time(N, fs, seed):
+    '''
+    公称サンプリング周波数 fs に ±0.2 間隔の一様な揺らぎを加えた時刻 (countdown ≦ 0)。
+
+    N : データ数 (int)
+    fs : 公称サンプリング周波数 (Hz) (float)
+    seed : 乱数の種 (int)
+    '''
+    t = -np.arange(N)[::-1] / fs + np.random.default_rng(seed).uniform(-0.2, 0.2, N) / fs
+    return np.sort(t)
+
+@pytest.mark.parametrize('N', [240, 241, 1200, 1201])
+def test_fast_lombscargle_uniform_matches_periodogram(N):
+    fs = 2.0
+    t = -np.arange(N)[::-1] / fs
+    y = np.random.default_rng(N).normal(size=N) + np.sin(2 * np.pi * 0.3 * t)
+    df, Nf = nearLS.LS_grid(N, fs)
+    power = nearLS.fast_lombscargle(t, y, df, Nf)[0]
+    f, Pxx = signal.periodogram(y - y.mean(), fs)
+    np.testing.assert_allclose(power[1:], Pxx[1:], rtol=3e-5)
+
+@pytest.mark.parametrize('N', [240, 241, 1200, 1201])
+def test_fast_lombscargle_jittered_matches_lombscargle(N):
+    fs = 2.0
+    t = jittered_time(N, fs, N)
+    y = np.random.default_rng(N + 1).normal(size=N)
+    df, Nf = nearLS.LS_grid(N, fs)
+    power = nearLS.fast_lombscargle(t, y, df, Nf, sampling_freq=fs)[0]
+    f = df * np.arange(Nf)[1:-1]
+    reference = 2 * signal.lombscargle(t, y - y.mean(), 2 * np.pi * f) / fs
+    np.testing.assert_allclose(power[1:-1], reference, rtol=4e-5)
+
+@pytest.mark.parametrize('N', [240, 1201])
+def test_sampling_frequency_jittered(N):
+    fs = 2.0
+    t = jittered_time(N, fs, N)
+    assert nearLS.sampling_frequency(t)[0, 0] == pytest.approx(fs, rel=3e-4)
+    np.testing.assert_allclose(nearLS.sampling_frequency(-np.arange(N)[::-1] / fs), fs, rtol=1e-12)
+
+def test_fast_lombscargle_padded_rows():
+    fs = 2.0
+    t = [jittered_time(N, fs, N) for N in (300, 240)]
+    y = [np.random.default_rng(N).normal(size=N) for N in (300, 240)]
+    df, Nf = nearLS.LS_grid(240, fs)
+    padded_t = np.full((2, 300), np.nan)
+    padded_y = np.full((2, 300), np.nan)
+    for row in range(2):
+        padded_t[row, :len(t[row])] = t[row]
+        padded_y[row, :len(y[row])] = y[row]
+    power = nearLS.fast_lombscargle(padded_t, padded_y, df, Nf)
+    for row in range(2):
+        np.testing.assert_allclose(power[row], nearLS.fast_lombscargle(t[row], y[row], df, Nf)[0], rtol=1e-12, atol=1e-300)
+
+def test_LS_batch_matches_LS():
+    fs = 2.0
+    t = {240: jittered_time(240, fs, 0), 300: jittered_time(300, fs, 1)}
+    datalist = [pd.DataFrame({'countdown': t[N], 'residual': np.random.default_rng(seed).normal(size=N)})
+                for N, seed in [(240, 0), (300, 1), (240, 2)]]
+    LS_xlist, LS_ylist = nearLS.LS_batch(datalist)
+    for data, LS_x, LS_y in zip(datalist, LS_xlist, LS_ylist):
+        x, y = nearLS.LS(data)
+        np.testing.assert_allclose(LS_x, x, rtol=1e-8)
+        np.testing.assert_allclose(LS_y, y, rtol=1e-12)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import dailychange_p
+import parallel
+import meanmovingratio_sorteddP
+from conftest import SOLS
+
+ARGS = (60, 20, 5, 3, 'periodogram')
+# ID=0 (dP=-0.5) は窓の端が標本時刻と一致して周波数軸が他と異なるため、集計の比較では除外する
+DP_ULIMIT = -0.75
+
+@pytest.fixture
+def missing_sol(surround_data, monkeypatch):
+    '''
+    sol=103 (ID=6) の時系列データのみ取得できないようにする。
+    '''
+    process_surround_dailydata = dailychange_p.process_surround_dailydata
+    monkeypatch.setattr(dailychange_p, 'process_surround_dailydata',
+                        lambda sol: None if sol == 103 else process_surround_dailydata(sol))
+
+def test_sol_chunks():
+    chunks = parallel.sol_chunks(list(range(10))[::-1])
+    assert [sorted({SOLS[ID] for ID in chunk}) for chunk in chunks] == [[sol] for sol in sorted(set(SOLS))]
+    assert sorted(ID for chunk in chunks for ID in chunk) == list(range(10))
+
+@pytest.mark.parametrize('workers, chunk_size', [(2, None), (3, 1), (4, 3)])
+def test_run_events_workers_identical(missing_sol, workers, chunk_size):
+    IDlist = [9, 0, 4, 6, 2, 7, 1, 3, 8, 5]
+    IDs, results = parallel.run_events(meanmovingratio_sorteddP.process_movingratio, IDlist, ARGS, 1)
+    parallel_IDs, parallel_results = parallel.run_events(meanmovingratio_sorteddP.process_movingratio, IDlist, ARGS,
+                                                         workers, chunk_size)
+    # 取得できない事象は除外し、IDlist の順序で返す
+    assert IDs == parallel_IDs == [ID for ID in IDlist if ID != 6]
+    for (x, y), (parallel_x, parallel_y) in zip(results, parallel_results):
+        np.testing.assert_array_equal(parallel_x, x)
+        np.testing.assert_array_equal(parallel_y, y)
+
+def test_stream_workers_identical(missing_sol):
+    accumulator, sketch = meanmovingratio_sorteddP.process_movingratiostream_dP(DP_ULIMIT, *ARGS[:4], workers=1)
+    parallel_accumulator, parallel_sketch = meanmovingratio_sorteddP.process_movingratiostream_dP(DP_ULIMIT, *ARGS[:4], workers=3)
+    assert parallel_accumulator.n_cases == accumulator.n_cases == 8
+    for key, value in accumulator.state().items():
+        np.testing.assert_array_equal(parallel_accumulator.state()[key], value)
+    np.testing.assert_array_equal(parallel_sketch.counts, sketch.counts)
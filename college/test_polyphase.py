@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+import polyphase
+import meanFFT_sortedseason
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_data_decimate_alias_rejection(seed):
+    data = polyphase.make_tone_data(1, 600, 10.0, 0.2, 1.7, seed)[0]
+    poly = polyphase.data_decimate(data, 0.5)['p'].values
+    mean = meanFFT_sortedseason.data_resample(data, 0.5)['p'].values
+    assert polyphase.leakage_dB(poly, 0.5, 0.2, 1.7) < -60
+    assert polyphase.leakage_dB(mean, 0.5, 0.2, 1.7) > -20
+
+def test_data_decimate_gap():
+    data = polyphase.make_tone_data(1, 600, 10.0, 0.2, 1.7)[0]
+    full = polyphase.data_decimate(data, 0.5)
+
+    # 200〜210 秒 (サンプリング間隔の 100 倍) の欠測
+    gapped = polyphase.data_decimate(data.drop(index=range(2000, 2100)), 0.5)
+    t = np.arange(len(gapped)) * 0.5
+    missing = gapped['p'].isna().values
+    assert len(gapped) == len(full)
+    np.testing.assert_array_equal(missing, (t >= 200) & (t < 210))
+
+    # 欠測から離れた時刻は、欠測の無い場合と一致する
+    away = ((t > 20) & (t < 180)) | ((t > 230) & (t < 580))
+    np.testing.assert_allclose(gapped['p'].values[away], full['p'].values[away], atol=1e-6)
+
+def test_data_decimate_short_gap_is_interpolated():
+    data = polyphase.make_tone_data(1, 600, 10.0, 0.2, 1.7)[0]
+    decimated = polyphase.data_decimate(data.drop(index=[3000, 3001]), 0.5)
+    assert not decimated['p'].isna().any()
+
+def test_split_gaps():
+    t = np.concatenate([np.arange(0, 10, 0.1), np.arange(20, 30, 0.1)])
+    assert polyphase.split_gaps(t, 10.0) == [(0, 100), (100, 200)]
+    assert polyphase.split_gaps(np.arange(0, 10, 0.1), 10.0) == [(0, 100)]
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+import pytest
+import shard
+import meanmovingratio_sorteddP
+
+# ID=0 (dP=-0.5) は周波数軸が他と異なるため除外する (test_parallel.py 参照)
+DP_ULIMIT = -0.75
+ARGS = (60, 20, 5, 3)
+
+def assert_identical(result, expected):
+    '''
+    (SpectrumAccumulator, QuantileSketch) の組がビット単位で一致することを確認する。
+    '''
+    (accumulator, sketch), (expected_accumulator, expected_sketch) = result, expected
+    assert accumulator.n_cases == expected_accumulator.n_cases
+    for key, value in expected_accumulator.state().items():
+        np.testing.assert_array_equal(accumulator.state()[key], value)
+    np.testing.assert_array_equal(sketch.counts, expected_sketch.counts)
+    assert sketch.n_cases == expected_sketch.n_cases
+
+@pytest.mark.parametrize('n_shards', [1, 2, 4])
+def test_shard_merge_identical(surround_data, tmp_path, n_shards):
+    expected = meanmovingratio_sorteddP.process_movingratiostream_dP(DP_ULIMIT, *ARGS)
+    for index in range(n_shards):
+        meanmovingratio_sorteddP.save_movingratioshard_dP(DP_ULIMIT, *ARGS, (index, n_shards), directory=tmp_path / 'shards')
+    merged = meanmovingratio_sorteddP.merge_movingratioshards_dP(DP_ULIMIT, *ARGS, directory=tmp_path / 'shards')
+    assert_identical(merged, expected)
+
+def test_merge_rejects_missing_shard(surround_data, tmp_path):
+    meanmovingratio_sorteddP.save_movingratioshard_dP(DP_ULIMIT, *ARGS, (0, 3), directory=tmp_path / 'shards')
+    meanmovingratio_sorteddP.save_movingratioshard_dP(DP_ULIMIT, *ARGS, (2, 3), directory=tmp_path / 'shards')
+    with pytest.raises(ValueError, match=r'Missing shards \[1\]'):
+        meanmovingratio_sorteddP.merge_movingratioshards_dP(DP_ULIMIT, *ARGS, directory=tmp_path / 'shards')
+
+def test_merge_rejects_different_parameters(surround_data, tmp_path):
+    meanmovingratio_sorteddP.save_movingratioshard_dP(DP_ULIMIT, *ARGS, (0, 2), directory=tmp_path / 'shards')
+    meanmovingratio_sorteddP.save_movingratioshard_dP(DP_ULIMIT, *ARGS, (1, 2), directory=tmp_path / 'shards')
+    with pytest.raises(ValueError, match='different parameters'):
+        meanmovingratio_sorteddP.merge_movingratioshards_dP(DP_ULIMIT, *ARGS, estimator='welch', directory=tmp_path / 'shards')
+
+def test_select_chunks_partition():
+    IDlist = list(range(10))
+    chunks = shard.select_chunks(IDlist)
+    parts = [shard.select_chunks(IDlist, (index, 3)) for index in range(3)]
+    assert sorted(item for part in parts for item in part) == chunks
+
+@pytest.fixture
+def interrupt(surround_data, monkeypatch):
+    '''
+    sol=104 (ID=7) の処理で KeyboardInterrupt を送出させる。(返り値の関数を呼ぶと元に戻す)
+    '''
+    process_movingratio = meanmovingratio_sorteddP.process_movingratio
+    def interrupted(ID, *args):
+        if ID == 7:
+            raise KeyboardInterrupt
+        return process_movingratio(ID, *args)
+    monkeypatch.setattr(meanmovingratio_sorteddP, 'process_movingratio', interrupted)
+    return lambda: monkeypatch.setattr(meanmovingratio_sorteddP, 'process_movingratio', process_movingratio)
+
+@pytest.mark.parametrize('checkpoint_interval', [0, 3600])
+def test_checkpoint_resume_identical(interrupt, tmp_path, checkpoint_interval):
+    file_path = meanmovingratio_sorteddP.checkpoint_path(DP_ULIMIT, 60, 5, 3, directory=tmp_path / 'checkpoints')
+    with pytest.raises(KeyboardInterrupt):
+        meanmovingratio_sorteddP.process_movingratiostream_dP(DP_ULIMIT, *ARGS, checkpoint=file_path,
+                                                              checkpoint_interval=checkpoint_interval)
+
+    # 中断時にも保存し、sol=103 (ID=6) のまとまりは sol=104 の結果を受け取るまで完了しない
+    IDlist, meta = meanmovingratio_sorteddP.movingratio_meta(DP_ULIMIT, *ARGS)
+    progress = shard.Checkpoint(file_path, IDlist, meta)
+    assert progress.completed_IDs() == [1, 2, 3, 4, 5]
+
+    interrupt()
+    resumed = meanmovingratio_sorteddP.process_movingratiostream_dP(DP_ULIMIT, *ARGS, checkpoint=file_path)
+    expected = meanmovingratio_sorteddP.process_movingratiostream_dP(DP_ULIMIT, *ARGS)
+    assert_identical(resumed, expected)
+
+    # 完了後も結果の保存までは残す
+    assert os.path.exists(file_path)
+    shard.remove_checkpoint(file_path)
+    assert not os.path.exists(file_path)
+
+def test_checkpoint_shard_resume_identical(interrupt, tmp_path):
+    for index in range(2):
+        try:
+            meanmovingratio_sorteddP.save_movingratioshard_dP(DP_ULIMIT, *ARGS, (index, 2), directory=tmp_path / 'shards',
+                                                              checkpoint_dir=tmp_path / 'checkpoints', checkpoint_interval=0)
+        except KeyboardInterrupt:
+            interrupted = index
+    checkpoint = meanmovingratio_sorteddP.checkpoint_path(DP_ULIMIT, 60, 5, 3, (interrupted, 2), tmp_path / 'checkpoints')
+    assert os.path.exists(checkpoint)
+
+    interrupt()
+    meanmovingratio_sorteddP.save_movingratioshard_dP(DP_ULIMIT, *ARGS, (interrupted, 2), directory=tmp_path / 'shards',
+                                                      checkpoint_dir=tmp_path / 'checkpoints')
+    assert not os.path.exists(checkpoint)
+    merged = meanmovingratio_sorteddP.merge_movingratioshards_dP(DP_ULIMIT, *ARGS, directory=tmp_path / 'shards')
+    assert_identical(merged, meanmovingratio_sorteddP.process_movingratiostream_dP(DP_ULIMIT, *ARGS))
+
+def test_checkpoint_rejects_different_parameters(surround_data, tmp_path):
+    file_path = meanmovingratio_sorteddP.checkpoint_path(DP_ULIMIT, 60, 5, 3, directory=tmp_path / 'checkpoints')
+    meanmovingratio_sorteddP.process_movingratiostream_dP(DP_ULIMIT, *ARGS, checkpoint=file_path)
+    with pytest.raises(ValueError, match='different parameters'):
+        meanmovingratio_sorteddP.process_movingratiostream_dP(DP_ULIMIT, *ARGS, estimator='welch', checkpoint=file_path)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from scipy import signal
+import slidingFFT
+
+def pressure_like(L, seed):
+    '''
+    気圧程度のオフセットと緩やかな変動を持つ合成データ。
+
+    L : データ数 (int)
+    seed : 乱数の種 (int)
+    '''
+    rng = np.random.default_rng(seed)
+    return 700 + np.cumsum(rng.normal(0, 0.01, L)) + rng.normal(0, 0.02, L)
+
+@pytest.mark.parametrize('N, hop', [(240, 1), (241, 3), (1200, 8)])
+def test_sliding_periodogram_matches_detrended_periodogram(N, hop):
+    x = pressure_like(3000, N)
+    f, P = slidingFFT.sliding_periodogram(x, N, hop, 2.0)
+    for row in (0, 1, P.shape[0] - 1):
+        start = row * hop
+        fx, Pxx = signal.periodogram(x[start:start + N], 2.0, detrend='linear')
+        np.testing.assert_allclose(f, fx, rtol=1e-12)
+        np.testing.assert_allclose(P[row], Pxx, rtol=1e-6, atol=1e-9 * Pxx[1:].mean())
+
+@pytest.mark.parametrize('N, hop', [(240, 1), (1200, 8), (4800, 32)])
+def test_sliding_method_bound(N, hop):
+    x = pressure_like(20000, N)
+    _, strided = slidingFFT.sliding_periodogram(x, N, hop, 1.0)
+    _, sliding = slidingFFT.sliding_periodogram(x, N, hop, 1.0, method='sliding')
+    error = np.abs(sliding - strided)[:, 1:]
+
+    # 窓ごとの平均パワーに対して 2e-10 以下 (docstring の実測値)
+    assert np.max(error / strided[:, 1:].mean(axis=1, keepdims=True)) < 2e-10
+
+    # 周波数ビンごとの相対誤差は中央値で 1e-11 以下
+    assert np.median(error / strided[:, 1:]) < 1e-11
+
+def test_sliding_periodogram_missing():
+    x = pressure_like(1000, 0)
+    x[500] = np.nan
+    _, P = slidingFFT.sliding_periodogram(x, 240, 10, 1.0)
+    starts = np.arange(P.shape[0]) * 10
+    contains = (starts <= 500) & (500 < starts + 240)
+    assert np.isnan(P[contains]).all()
+    assert np.isfinite(P[~contains]).all()
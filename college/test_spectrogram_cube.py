@@ -0,0 +1,57 @@
+import datetime as datetime
+import numpy as np
+import pytest
+import dailychange_p
+import nodevil
+import meanfocusFFT
+import spectrogram_cube
+from conftest import synthetic_surround_dailydata
+
+@pytest.fixture
+def cube_data(monkeypatch, tmp_path):
+    '''
+    合成データの sol を時系列データとして読み込むようにする。
+    '''
+    monkeypatch.setattr(dailychange_p, 'process_dailydata_p', synthetic_surround_dailydata)
+    monkeypatch.setattr(dailychange_p, 'get_file_path', lambda sol: str(tmp_path))
+    monkeypatch.setattr(nodevil, 'process_nodevilsollist', lambda: [100, 101])
+
+def test_nearest_single_segment(cube_data, monkeypatch, tmp_path):
+    def short_data(sol):
+        data = synthetic_surround_dailydata(sol)
+        return data.iloc[:241]
+    monkeypatch.setattr(dailychange_p, 'process_dailydata_p', short_data)
+    cube_dir = spectrogram_cube.build_cube([100], 60, 30, cube_dir=str(tmp_path / 'cube'))
+    cube = spectrogram_cube.SpectrogramCube(cube_dir)
+    assert len(cube.times) == 1
+
+    fft_x, spectrum, offset = cube.nearest(datetime.datetime(2019, 3, 6, 9, 0, 30))
+    _, fft_y, _ = spectrogram_cube.solSTFT(100, 60, 30)
+    np.testing.assert_array_equal(spectrum, fft_y[0])
+    assert offset == pytest.approx(0.0, abs=1)
+
+def test_nearest_picks_closest(cube_data, tmp_path):
+    cube_dir = spectrogram_cube.build_cube([100, 101], 120, 60, cube_dir=str(tmp_path / 'cube'))
+    cube = spectrogram_cube.SpectrogramCube(cube_dir)
+    fft_x, fft_y, centers = spectrogram_cube.solSTFT(101, 120, 60)
+    target = centers[10] + np.timedelta64(20, 's')
+    _, spectrum, offset = cube.nearest(target)
+    np.testing.assert_array_equal(spectrum, fft_y[10])
+    assert offset == pytest.approx(20.0)
+
+def test_meanfocusFFT_from_cube(cube_data, tmp_path):
+    cube_dir = spectrogram_cube.build_cube([100, 101], 120, 60, cube_dir=str(tmp_path / 'cube'))
+    fft_x, fft_y = meanfocusFFT.process_focusFFTcube(12, 600, cube_dir)
+
+    # 各 sol の 12 時〜12 時 10 分に中心が含まれる区間の単純平均
+    spectra = []
+    for sol in [100, 101]:
+        _, sol_y, centers = spectrogram_cube.solSTFT(sol, 120, 60)
+        day = np.datetime64('2018-11-26') + np.timedelta64(sol, 'D')
+        start, stop = day + np.timedelta64(12 * 3600 + 60, 's'), day + np.timedelta64(12 * 3600 + 540, 's')
+        spectra.append(sol_y[(centers >= start) & (centers <= stop)])
+    expected = np.concatenate(spectra).astype(np.float64).mean(axis=0)
+    np.testing.assert_allclose(fft_y, expected, rtol=1e-12)
+
+    with pytest.raises(ValueError):
+        meanfocusFFT.process_focusFFTcube(12, 60, cube_dir)
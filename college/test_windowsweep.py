@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+import nearFFT
+import nearmovingFFT
+import nearratio
+import nearmovingratio
+import windowsweep
+
+def pipeline(fft_x, fft_y, windowsize_FFT, windowsize_ratio, monkeypatch):
+    '''
+    nearmovingFFT.movingFFT → nearratio.calculate_ratio → nearmovingratio.calculate_movingave を
+    1件ずつ適用し、元の周波数軸にそろえた修正パワースペクトルを返す (sweep_movingratio の参照実装)。
+    '''
+    monkeypatch.setattr(nearFFT, 'FFT', lambda data, estimator='periodogram': (fft_x, data))
+    result = np.full(fft_y.shape, np.nan)
+    for row, y in enumerate(fft_y):
+        x, y, moving_x, moving_y = nearmovingFFT.movingFFT(y, windowsize_FFT)
+        ratio_x, ratio = nearratio.calculate_ratio(x, y, moving_y, windowsize_FFT)
+        moving_ratio_x, moving_ratio = nearmovingratio.calculate_movingave(ratio_x, ratio, windowsize_ratio)
+        valid = ~np.isnan(moving_ratio_x)
+        result[row, np.searchsorted(fft_x, moving_ratio_x[valid])] = moving_ratio[valid]
+    return result
+
+@pytest.mark.parametrize('n_freq', [120, 121])
+def test_sweep_matches_pipeline(monkeypatch, n_freq):
+    rng = np.random.default_rng(n_freq)
+    fft_x = np.linspace(0, 1, n_freq)
+    fft_y = rng.lognormal(size=(7, n_freq)) * (1 + fft_x)**-2
+    windowsize_FFTlist, windowsize_ratiolist = [1, 4, 9], [1, 2, 5]
+
+    mean_cube, sem_cube = windowsweep.sweep_movingratio(fft_y, windowsize_FFTlist, windowsize_ratiolist)
+
+    for i, windowsize_FFT in enumerate(windowsize_FFTlist):
+        for j, windowsize_ratio in enumerate(windowsize_ratiolist):
+            reference = pipeline(fft_x, fft_y, windowsize_FFT, windowsize_ratio, monkeypatch)
+            np.testing.assert_array_equal(np.isnan(mean_cube[i, j]), np.isnan(reference).all(axis=0))
+            np.testing.assert_allclose(mean_cube[i, j], np.mean(reference, axis=0), rtol=1e-10)
+            np.testing.assert_allclose(sem_cube[i, j], np.std(reference, axis=0, ddof=1) / np.sqrt(len(fft_y)), rtol=1e-8)
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+import argparse as argparse
+from tqdm import tqdm
+import dailychange_p
+import precision
+
+# 時系列データを共有する既定の保存先 (/dev/shm が使える場合はメモリ上に置く)
+TIMELINE_DIR = os.environ.get('EXPLORE_TIMELINE') or (
+    '/dev/shm/explore_timeline' if os.path.isdir('/dev/shm') else os.path.expanduser('~/.cache/explore/timeline'))
+
+# 全 sol 数 (nodevil.nodevil_sols と同じ範囲)
+N_SOLS = 1219 + 1
+
+def build_timeline(directory=TIMELINE_DIR, sols=None):
+    '''
+    全ての sol の CSV を1度だけ読み込み、時刻 (MUTC, UTC) と気圧 (p) を
+    それぞれ1本の連続した配列としてファイルに書き出す関数。
+    各 sol の行の範囲は offsets (sol 数 × 2 の [開始, 終了)) に記録する。
+    ※1 sol ずつ追記するため、全データをメモリに保持しない。
+
+    directory : 保存先のディレクトリ
+    sols : 対象の sol のリスト ※None の場合は全ての sol
+    '''
+    if sols is None:
+        sols = range(N_SOLS)
+    os.makedirs(directory, exist_ok=True)
+    dtype = np.dtype(precision.DTYPE)
+
+    offsets = np.zeros((N_SOLS, 2), dtype=np.int64)
+    n_rows = 0
+    paths = {name: os.path.join(directory, f"{name}.bin.tmp") for name in ['MUTC', 'UTC', 'p']}
+    files = {name: open(path, 'wb') for name, path in paths.items()}
+    try:
+        for sol in tqdm(sols, desc="Processing sol"):
+            if not os.path.exists(dailychange_p.get_file_path(sol)):
+                offsets[sol] = n_rows
+                continue
+            data = dailychange_p.load_data(dailychange_p.get_file_path(sol))
+            if data is None or data.empty:
+                offsets[sol] = n_rows
+                continue
+
+            files['MUTC'].write(data['MUTC'].values.astype('datetime64[ns]').view(np.int64).tobytes())
+            files['UTC'].write(data['UTC'].values.astype('datetime64[ns]').view(np.int64).tobytes())
+            files['p'].write(np.asarray(data['p'].values, dtype=dtype).tobytes())
+            offsets[sol] = (n_rows, n_rows + len(data))
+            n_rows += len(data)
+    finally:
+        for file in files.values():
+            file.close()
+
+    # 書き込みが完了してから置き換える
+    for name, path in paths.items():
+        os.replace(path, os.path.join(directory, f"{name}.bin"))
+    np.save(os.path.join(directory, "offsets.npy"), offsets)
+    with open(os.path.join(directory, "meta.json"), 'w') as file:
+        json.dump({'n_rows': n_rows, 'dtype': dtype.str}, file)
+
+    return n_rows
+
+class Timeline:
+    '''
+    build_timeline で書き出した時系列データをメモリマップで参照するクラス。
+    ※複数のプロセスが同じファイルを参照しても、データはページキャッシュ上で共有され、
+    プロセスごとの複製は作られない (必要な範囲のみが読み込まれる)。
+
+    directory : build_timeline の保存先のディレクトリ
+    '''
+    def __init__(self, directory=TIMELINE_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as file:
+            meta = json.load(file)
+        n_rows = meta['n_rows']
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"))
+        self.MUTC = self._memmap('MUTC', 'datetime64[ns]', n_rows)
+        self.UTC = self._memmap('UTC', 'datetime64[ns]', n_rows)
+        self.p = self._memmap('p', meta['dtype'], n_rows)
+
+    def _memmap(self, name, dtype, n_rows):
+        '''
+        読み込み専用のメモリマップを作成する関数。(0 行の場合は空の配列)
+
+        name : 配列の名前 (str)
+        dtype : データ型
+        n_rows : 行数 (int)
+        '''
+        if n_rows == 0:
+            return np.array([], dtype=dtype)
+        return np.memmap(os.path.join(self.directory, f"{name}.bin"), dtype=dtype, mode='r', shape=(n_rows,))
+
+    def __len__(self):
+        return len(self.p)
+
+    def sol_slice(self, sol):
+        '''
+        指定された sol の行の範囲 (slice) を返す関数。
+
+        sol : 火星日(探査機到着後からの経過日数)(int)
+        '''
+        if sol < 0 or sol >= len(self.offsets):
+            return slice(0, 0)
+        start, stop = self.offsets[sol]
+        return slice(int(start), int(stop))
+
+    def surround(self, sol):
+        '''
+        指定された sol とその前後1sol (sol-1, sol, sol+1) の時系列データを結合し、
+        MUTC の重複を削除した DataFrame を返す関数。
+        (dailychange_p.process_surround_dailydata と同じ行を返す。データが無い場合は None)
+        ※時刻・気圧以外の列 (LMST, LTST, Local Time) は持たない。
+
+        sol : 火星日(探査機到着後からの経過日数)(int)
+        '''
+        slices = [self.sol_slice(sol_offset) for sol_offset in [sol - 1, sol, sol + 1]]
+        slices = [s for s in slices if s.stop > s.start]
+        if not slices:
+            return None
+
+        MUTC = np.concatenate([self.MUTC[s] for s in slices])
+        UTC = np.concatenate([self.UTC[s] for s in slices])
+        p = np.concatenate([self.p[s] for s in slices])
+
+        # 重複を削除 (最初の行を残す)
+        keep = ~pd.Index(MUTC).duplicated(keep='first')
+        return pd.DataFrame({"MUTC": MUTC[keep], "UTC": UTC[keep], "p": p[keep]})
+
+def attach(directory=TIMELINE_DIR):
+    '''
+    共有の時系列データを dailychange_p.process_surround_dailydata の読み込み元に設定する関数。
+    ※環境変数 EXPLORE_TIMELINE にディレクトリを指定した場合は、
+    各プロセスで最初の読み込み時に自動で設定される。
+
+    directory : build_timeline の保存先のディレクトリ
+    '''
+    dailychange_p._timeline = Timeline(directory)
+    return dailychange_p._timeline
+
+def detach():
+    '''
+    共有の時系列データの設定を解除し、CSV からの読み込みに戻す関数。
+    '''
+    dailychange_p._timeline = None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--directory', type=str, default=TIMELINE_DIR, help="Output directory") # 保存先のディレクトリ
+    args = parser.parse_args()
+    n_rows = build_timeline(args.directory)
+    print(f"Save completed: {args.directory} ({n_rows} rows)")
+    print(f"Set EXPLORE_TIMELINE={args.directory} to let every process read from it.")
@@ -0,0 +1,194 @@
+import numpy as np
+import matplotlib.pyplot as plt
+import os
+import argparse as argparse
+import meanFFT_sorteddP
+import eventspectra
+import movingave
+from Dispersion_Relation import Params
+
+def sweep_movingratio(fft_y, windowsize_FFTlist, windowsize_ratiolist):
+    '''
+    パワースペクトル (ケース数 × 周波数) から、
+    windowsize_FFT × windowsize_ratio の全ての組み合わせについて
+    修正パワースペクトル (移動平均との比の移動平均) を一括で算出し、
+    ケース平均とその標準誤差を返す関数。
+    返り値はいずれも (windowsize_FFT 数 × windowsize_ratio 数 × 周波数) の配列で、
+    周波数の添字は元のパワースペクトルと揃えている (計算できない範囲は NaN)。
+
+    ※常用対数の累積和は全ての windowsize_FFT で、
+    比の累積和は同じ windowsize_FFT の全ての windowsize_ratio で使い回すため、
+    窓数の組み合わせが増えてもスペクトルの再計算は行わない。
+    結果は nearmovingFFT.movingFFT → nearratio.calculate_ratio →
+    nearmovingratio.calculate_movingave の順に適用したものと一致する。
+
+    fft_y : パワースペクトル (ndarray, ケース数 × 周波数)
+    windowsize_FFTlist : パワースペクトルの移動平均に用いる窓数のリスト
+    windowsize_ratiolist : パワースペクトル比の移動平均に用いる窓数のリスト
+    '''
+    fft_y = np.atleast_2d(np.asarray(fft_y, dtype=float))
+    shape = (len(windowsize_FFTlist), len(windowsize_ratiolist), fft_y.shape[-1])
+    mean_cube, sem_cube = np.full(shape, np.nan), np.full(shape, np.nan)
+
+    # パワーの常用対数の累積和 (全ての windowsize_FFT で共通)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_prefix = movingave.prefix_sums(np.log10(fft_y))
+
+    for i, windowsize_FFT in enumerate(windowsize_FFTlist):
+        # パワースペクトルの移動平均との比 (計算できない範囲は NaN)
+        ratio = fft_y / 10**movingave.window_mean(log_prefix, windowsize_FFT)
+
+        # 比の累積和 (同じ windowsize_FFT の全ての windowsize_ratio で共通)
+        ratio_prefix = movingave.prefix_sums(ratio)
+
+        for j, windowsize_ratio in enumerate(windowsize_ratiolist):
+            moving_ratio = movingave.window_mean(ratio_prefix, windowsize_ratio)
+
+            # ケース平均と標準誤差
+            count = np.sum(np.isfinite(moving_ratio), axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                total = np.nansum(moving_ratio, axis=0)
+                mean = total / count
+                var = np.nansum((moving_ratio - mean)**2, axis=0) / (count - 1)
+                mean_cube[i, j] = mean
+                sem_cube[i, j] = np.sqrt(var / count)
+
+    return mean_cube, sem_cube
+
+def sweep_metrics(fft_x, mean_cube, sem_cube, f_min=None):
+    '''
+    sweep_movingratio の結果から、窓数の組み合わせごとの要約指標を算出する関数。
+    返り値は各指標の (windowsize_FFT 数 × windowsize_ratio 数) の配列をまとめた辞書。
+
+    - peak_ratio : 修正パワースペクトルのケース平均の最大値
+    - peak_Hz : 最大値をとる周波数 (Hz)
+    - peak_snr : 最大値における (比 - 1) / 標準誤差
+    - roughness : ケース平均の隣接差の標準偏差 (小さいほど滑らか)
+    - coverage : 修正パワースペクトルが計算できた周波数の割合
+
+    fft_x : 周波数軸 (array)
+    mean_cube : 修正パワースペクトルのケース平均 (ndarray)
+    sem_cube : 修正パワースペクトルの標準誤差 (ndarray)
+    f_min : 指標の算出に用いる最小の周波数 (Hz) (float) ※None の場合は全周波数
+    '''
+    fft_x = np.asarray(fft_x, dtype=float)
+    band = np.isfinite(fft_x) if f_min is None else fft_x >= f_min
+    mean_cube, sem_cube, fft_x = mean_cube[..., band], sem_cube[..., band], fft_x[band]
+
+    # 全てが NaN の組み合わせは指標も NaN とする
+    valid = np.isfinite(mean_cube)
+    has_data = valid.any(axis=-1)
+    peak = np.argmax(np.where(valid, mean_cube, -np.inf), axis=-1)
+    peak_ratio = np.take_along_axis(mean_cube, peak[..., np.newaxis], axis=-1)[..., 0]
+    peak_sem = np.take_along_axis(sem_cube, peak[..., np.newaxis], axis=-1)[..., 0]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        metrics = {
+            'peak_ratio': np.where(has_data, peak_ratio, np.nan),
+            'peak_Hz': np.where(has_data, fft_x[peak], np.nan),
+            'peak_snr': np.where(has_data, (peak_ratio - 1) / peak_sem, np.nan),
+            'roughness': np.nanstd(np.diff(mean_cube, axis=-1), axis=-1),
+            'coverage': valid.mean(axis=-1),
+        }
+
+    return metrics
+
+def process_sweep_dP(dP_Ulimit, timerange, interval, windowsize_FFTlist, windowsize_ratiolist, estimator='periodogram'):
+    '''
+    dP_Ulimit > dP を満たす全ての ID に対応する、
+    MUTC (ダストデビル発生時刻) 直前の気圧残差のパワースペクトルを1度だけ求め、
+    全ての窓数の組み合わせに対する修正パワースペクトルのケース平均と要約指標を返す関数。
+    返り値は (周波数軸, ケース平均, 標準誤差, 要約指標の辞書, データ数が異なり除外した ID の配列)。
+    ※データ数の異なる窓が混在する場合は、最も件数の多いデータ数の窓のみを用いる。(eventspectra.common_length 参照)
+
+    dP_Ulimit:上限となる気圧降下量(Pa) (int)
+    ※dP, dP_Ulimit < 0
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    windowsize_FFTlist : パワースペクトルの移動平均に用いる窓数のリスト
+    windowsize_ratiolist : パワースペクトル比の移動平均に用いる窓数のリスト
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    '''
+    # 各ケースのパワースペクトル (最も件数の多いデータ数の窓にそろえる)
+    IDs, fft_x, fft_y, dropped = eventspectra.process_eventspectra(meanFFT_sorteddP.process_IDlist_dP(dP_Ulimit),
+                                                                  timerange, interval, estimator)
+
+    # 全ての窓数の組み合わせについて修正パワースペクトルを算出
+    mean_cube, sem_cube = sweep_movingratio(fft_y, windowsize_FFTlist, windowsize_ratiolist)
+
+    # 音波と重力波の境界より高周波側で要約指標を算出
+    params = Params()
+    metrics = sweep_metrics(fft_x, mean_cube, sem_cube, params.border_Hz())
+
+    return fft_x, mean_cube, sem_cube, metrics, dropped
+
+def plot_sweep_dP(dP_Ulimit, timerange, interval, windowsize_FFTlist, windowsize_ratiolist, estimator='periodogram'):
+    '''
+    dP_Ulimit > dP を満たす全ての ID について、窓数の組み合わせごとの
+    修正パワースペクトルを一括で算出し、結果 (npz) と
+    要約指標 (peak_snr) のヒートマップを保存する関数。
+
+    - X軸 : windowsize_ratio
+    - Y軸 : windowsize_FFT
+    - 色 : 境界より高周波側での修正パワースペクトルの最大値の (比 - 1) / 標準誤差
+
+    dP_Ulimit:上限となる気圧降下量(Pa) (int)
+    ※dP, dP_Ulimit < 0
+    timerange : 切り取る時間範囲 (秒) (int)
+    interval : 開始オフセット (秒) (int)
+    windowsize_FFTlist : パワースペクトルの移動平均に用いる窓数のリスト
+    windowsize_ratiolist : パワースペクトル比の移動平均に用いる窓数のリスト
+    estimator : スペクトル推定法 ('periodogram', 'welch', 'multitaper') (str)
+    '''
+    try:
+        fft_x, mean_cube, sem_cube, metrics, dropped = process_sweep_dP(dP_Ulimit, timerange, interval,
+                                                                        windowsize_FFTlist, windowsize_ratiolist, estimator)
+
+        # 保存の設定
+        output_dir = f'sweepmovingratio_dP_{timerange}s'
+        os.makedirs(output_dir, exist_ok=True)
+        np.savez(os.path.join(output_dir, f"dP is More {-dP_Ulimit}.npz"),
+                 fft_x=fft_x, mean=mean_cube, sem=sem_cube, dropped_ID=dropped,
+                 windowsize_FFT=np.asarray(windowsize_FFTlist), windowsize_ratio=np.asarray(windowsize_ratiolist),
+                 **metrics)
+
+        # プロットの設定
+        plt.pcolormesh(np.asarray(windowsize_ratiolist), np.asarray(windowsize_FFTlist), metrics['peak_snr'],
+                       shading='nearest', cmap='viridis')
+        plt.colorbar(label='peak SNR')
+        plt.title(f'Sweep_dP>{-dP_Ulimit},timerange={timerange}s', fontsize=15)
+        plt.xlabel('windowsize_ratio', fontsize=15)
+        plt.ylabel('windowsize_FFT', fontsize=15)
+        plt.tight_layout()
+
+        filename = f"dP is More {-dP_Ulimit}.png"
+        plt.savefig(os.path.join(output_dir, filename))
+        plt.clf()
+        plt.close()
+        print(f"Save completed: {filename}")
+
+        # 要約指標の表示
+        for i, windowsize_FFT in enumerate(windowsize_FFTlist):
+            for j, windowsize_ratio in enumerate(windowsize_ratiolist):
+                print(f"windowsize_FFT={windowsize_FFT}, windowsize_ratio={windowsize_ratio}: "
+                      f"peak={metrics['peak_ratio'][i, j]:.3f} at {metrics['peak_Hz'][i, j]:.4f}Hz, "
+                      f"snr={metrics['peak_snr'][i, j]:.2f}, roughness={metrics['roughness'][i, j]:.4f}")
+
+        return fft_x, mean_cube, metrics
+
+    except ValueError as e:
+        print(f"An error occurred: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dP_Ulimit', type=int,
+                        help="Serves as the standard for the upper limit of dP_ave(Negative int)") # dPの上限の指定(負)
+    parser.add_argument('timerange', type=int, help='timerang(s)') # 切り取る時間範囲(秒)
+    parser.add_argument('--windowsize_FFT', type=int, nargs='+', default=[11, 21, 31, 41, 51],
+                        help="The [windowsize] list used to calculate the moving average of FFT") # パワースペクトルの移動平均に用いる窓数
+    parser.add_argument('--windowsize_ratio', type=int, nargs='+', default=[5, 11, 21, 31],
+                        help="The [windowsize] list used to calculate the moving average of ratio") # パワースペクトル比の移動平均に用いる窓数
+    parser.add_argument('--estimator', type=str, default='periodogram', choices=['periodogram', 'welch', 'multitaper'],
+                        help="Spectral estimator") # スペクトル推定法
+    args = parser.parse_args()
+    plot_sweep_dP(args.dP_Ulimit, args.timerange, 20, args.windowsize_FFT, args.windowsize_ratio, args.estimator)